@@ -0,0 +1,28 @@
+"""add leg holding index
+
+Revision ID: 0e5a9f3c7d12
+Revises: d41c8a6e2b57
+Create Date: 2026-10-19 15:21:07.934260
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0e5a9f3c7d12'
+down_revision: Union[str, Sequence[str], None] = 'd41c8a6e2b57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_leg_user_acct_prop', 'leg', ['user_id', 'acct_id', 'prop_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_leg_user_acct_prop', table_name='leg')
@@ -0,0 +1,28 @@
+"""add leg prop type index
+
+Revision ID: 3c9e5b71a2d8
+Revises: 6a3e0b8d1f45
+Create Date: 2026-10-19 18:02:44.519307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9e5b71a2d8'
+down_revision: Union[str, Sequence[str], None] = '6a3e0b8d1f45'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_leg_user_prop_type', 'leg', ['user_id', 'prop_id', 'leg_type'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_leg_user_prop_type', table_name='leg')
@@ -0,0 +1,59 @@
+"""add position snapshot
+
+Revision ID: 6a3e0b8d1f45
+Revises: 0e5a9f3c7d12
+Create Date: 2026-10-19 16:02:44.518733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a3e0b8d1f45'
+down_revision: Union[str, Sequence[str], None] = '0e5a9f3c7d12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('position_snapshot',
+        sa.Column('user_id', sa.String(length=15), nullable=False),
+        sa.Column('acct_id', sa.String(length=18), nullable=False),
+        sa.Column('prop_id', sa.String(length=18), nullable=False),
+        sa.Column('snap_dt', sa.Date(), nullable=False),
+        sa.Column('quantity', sa.DECIMAL(precision=20, scale=5, asdecimal=False), nullable=False),
+        sa.Column('invested', sa.DECIMAL(precision=20, scale=2, asdecimal=False), nullable=False),
+        sa.Column('cash_balance', sa.DECIMAL(precision=20, scale=2, asdecimal=False), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], onupdate='CASCADE', ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['acct_id'], ['account.acct_id'], onupdate='CASCADE', ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['prop_id'], ['property.prop_id'], onupdate='CASCADE', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'acct_id', 'prop_id', 'snap_dt')
+    )
+    # backfill from existing legs, leg_type: 1 = BUY, 2 = SELL, see CF_DIRECTIONS for cash flow signs
+    op.execute("""
+        INSERT INTO position_snapshot (user_id, acct_id, prop_id, snap_dt, quantity, invested, cash_balance)
+        SELECT 
+            user_id, acct_id, prop_id, snap_dt,
+            SUM(quantity) OVER w, SUM(invested) OVER w, SUM(cash_balance) OVER w
+        FROM (
+            SELECT 
+                l.user_id, l.acct_id, l.prop_id, DATE(t.trans_dt) AS snap_dt,
+                SUM(CASE l.leg_type WHEN 1 THEN l.quantity WHEN 2 THEN -l.quantity ELSE 0 END) AS quantity,
+                SUM(CASE l.leg_type WHEN 1 THEN ROUND(l.quantity * l.price, 2) 
+                    WHEN 2 THEN -ROUND(l.quantity * l.price, 2) ELSE 0 END) AS invested,
+                SUM(CASE WHEN l.leg_type IN (2, 4, 5, 6) THEN 1 WHEN l.leg_type IN (1, 3, 7) THEN -1 ELSE 0 END 
+                    * ROUND(l.quantity * l.price, 2)) AS cash_balance
+            FROM leg l JOIN transaction t ON t.trans_id = l.trans_id
+            GROUP BY l.user_id, l.acct_id, l.prop_id, DATE(t.trans_dt)
+        ) AS daily
+        WINDOW w AS (PARTITION BY user_id, acct_id, prop_id ORDER BY snap_dt)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('position_snapshot')
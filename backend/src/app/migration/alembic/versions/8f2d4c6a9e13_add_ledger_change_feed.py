@@ -0,0 +1,45 @@
+"""add ledger change feed
+
+Revision ID: 8f2d4c6a9e13
+Revises: 3c9e5b71a2d8
+Create Date: 2026-10-19 18:41:09.127355
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f2d4c6a9e13'
+down_revision: Union[str, Sequence[str], None] = '3c9e5b71a2d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ledger_change',
+        sa.Column('change_id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.String(length=15), nullable=False),
+        sa.Column('acct_id', sa.String(length=18), nullable=False),
+        sa.Column('prop_id', sa.String(length=18), nullable=False),
+        sa.Column('from_dt', sa.Date(), nullable=False),
+        sa.Column('changed_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], onupdate='CASCADE', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('change_id')
+    )
+    op.create_index('idx_ledger_change_user', 'ledger_change', ['user_id', 'change_id'], unique=False)
+    op.create_table('ledger_consumer',
+        sa.Column('consumer', sa.String(length=50), nullable=False),
+        sa.Column('last_change_id', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('consumer')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ledger_consumer')
+    op.drop_index('idx_ledger_change_user', table_name='ledger_change')
+    op.drop_table('ledger_change')
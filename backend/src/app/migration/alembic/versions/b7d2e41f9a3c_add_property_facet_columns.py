@@ -0,0 +1,42 @@
+"""add property facet columns
+
+Revision ID: b7d2e41f9a3c
+Revises: 85dff55dfb95
+Create Date: 2026-10-19 10:12:31.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e41f9a3c'
+down_revision: Union[str, Sequence[str], None] = '85dff55dfb95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FACETS = ['exchange', 'sector', 'industry', 'country']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for facet in FACETS:
+        op.add_column('property', sa.Column(
+            facet, 
+            sa.String(length=100), 
+            sa.Computed(
+                f"LEFT(NULLIF(JSON_UNQUOTE(JSON_EXTRACT(custom_props, '$.{facet}')), 'null'), 100)", 
+                persisted=True
+            ), 
+            nullable=True
+        ))
+        op.create_index(f'idx_property_{facet}', 'property', [facet, 'symbol'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for facet in reversed(FACETS):
+        op.drop_index(f'idx_property_{facet}', table_name='property')
+        op.drop_column('property', facet)
@@ -0,0 +1,30 @@
+"""add transaction list indexes
+
+Revision ID: d41c8a6e2b57
+Revises: b7d2e41f9a3c
+Create Date: 2026-10-19 14:03:48.611207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41c8a6e2b57'
+down_revision: Union[str, Sequence[str], None] = 'b7d2e41f9a3c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_transaction_user_dt', 'transaction', ['user_id', 'trans_dt'], unique=False)
+    op.create_index('idx_leg_trans_id', 'leg', ['trans_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_leg_trans_id', table_name='leg')
+    op.drop_index('idx_transaction_user_dt', table_name='transaction')
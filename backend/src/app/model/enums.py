@@ -98,4 +98,16 @@ class RiskLevel(str, Enum):
 class LiquidityType(str, Enum):
     HIGH = "high"
     MEDIUM = "medium"
-    LOW = "low"
\ No newline at end of file
+    LOW = "low"
+    
+@unique
+class ImportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson" # one JSON object per line
+    
+@unique
+class ImportStatus(str, Enum):
+    INSERTED = "inserted"
+    UPDATED = "updated"
+    SKIPPED = "skipped"
+    FAILED = "failed"
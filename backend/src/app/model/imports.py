@@ -0,0 +1,57 @@
+from pydantic import BaseModel, Field
+from src.app.model.enums import ImportStatus
+
+
+class ImportRowResult(BaseModel):
+    row: int = Field(
+        description='The row number in the uploaded file (1-based, header excluded).',
+    )
+    key: str | None = Field(
+        default=None,
+        description='The business key of the row, e.g., symbol of the property.',
+    )
+    status: ImportStatus = Field(
+        description='The import status of the row.',
+    )
+    message: str | None = Field(
+        default=None,
+        description='The reason if the row is skipped or failed.',
+    )
+    
+class ImportResult(BaseModel):
+    total: int = Field(
+        default=0,
+        description='The number of rows processed.',
+    )
+    inserted: int = Field(
+        default=0,
+        description='The number of rows inserted.',
+    )
+    updated: int = Field(
+        default=0,
+        description='The number of rows updated.',
+    )
+    skipped: int = Field(
+        default=0,
+        description='The number of rows skipped.',
+    )
+    failed: int = Field(
+        default=0,
+        description='The number of rows failed.',
+    )
+    rows: list[ImportRowResult] = Field(
+        default_factory=list,
+        description='The per row status.',
+    )
+    
+    def add(self, row_result: ImportRowResult):
+        self.rows.append(row_result)
+        self.total += 1
+        if row_result.status == ImportStatus.INSERTED:
+            self.inserted += 1
+        elif row_result.status == ImportStatus.UPDATED:
+            self.updated += 1
+        elif row_result.status == ImportStatus.SKIPPED:
+            self.skipped += 1
+        else:
+            self.failed += 1
@@ -0,0 +1,39 @@
+from datetime import date
+from pydantic import BaseModel, Field
+
+
+class LedgerChange(BaseModel):
+    change_id: int | None = Field(
+        default=None,
+        description='Position in the feed, assigned by the database.',
+    )
+    user_id: str = Field(
+        description='The ID of the user whose ledger changed.',
+    )
+    acct_id: str = Field(
+        description='The ID of the account whose legs changed.',
+    )
+    prop_id: str = Field(
+        description='The ID of the property whose legs changed.',
+    )
+    from_dt: date = Field(
+        description='The earliest transaction date affected, derived data before it is unchanged.',
+    )
+    
+class LedgerChangeBatch(BaseModel):
+    consumer: str = Field(
+        description='The consumer the batch was read for.',
+    )
+    last_change_id: int = Field(
+        description='The last change in the batch, acknowledge it once the batch is applied.',
+    )
+    changes: list[LedgerChange] = Field(
+        description='Changes coalesced per (user, account, property), keeping the earliest date.',
+    )
+    
+    def from_dts(self) -> dict[str, date]:
+        """Earliest affected date per user, for consumers that recompute per user."""
+        from_dts: dict[str, date] = {}
+        for change in self.changes:
+            from_dts[change.user_id] = min(change.from_dt, from_dts.get(change.user_id, change.from_dt))
+        return from_dts
@@ -0,0 +1,216 @@
+from datetime import date
+from typing import Literal
+from pydantic import BaseModel, Field
+from src.app.model.enums import CurType, LegType, PropertyType
+
+
+class Holding(BaseModel):
+    acct_id: str = Field(
+        description='The ID of the account holding the property.',
+    )
+    prop_id: str = Field(
+        description='The ID of the property held.',
+    )
+    quantity: float = Field(
+        description='Net quantity held, bought minus sold.',
+    )
+    invested: float = Field(
+        description='Net amount invested, bought minus sold amount.',
+    )
+    cash_balance: float = Field(
+        description='Net cash flow of all legs, including fees, taxes and income (positive = cash in).',
+    )
+    
+    
+class Lot(BaseModel):
+    trans_dt: date = Field(
+        description='The date the lot was bought.',
+    )
+    quantity: float = Field(
+        description='The quantity of the lot not sold yet (FIFO).',
+    )
+    unit_cost: float = Field(
+        description='The cost per unit of the lot, including fees.',
+    )
+    
+class CostBasis(BaseModel):
+    acct_id: str = Field(
+        description='The ID of the account holding the property.',
+    )
+    prop_id: str = Field(
+        description='The ID of the property held.',
+    )
+    quantity: float = Field(
+        description='Quantity held.',
+    )
+    acb: float = Field(
+        description='Adjusted cost base of the quantity held (average cost method, fees included).',
+    )
+    avg_cost: float = Field(
+        description='Average cost per unit held.',
+    )
+    realized_gain_avg: float = Field(
+        description='Realized gain of all sells using average cost.',
+    )
+    fifo_cost: float = Field(
+        description='Cost of the remaining lots using FIFO.',
+    )
+    realized_gain_fifo: float = Field(
+        description='Realized gain of all sells using FIFO.',
+    )
+    lots: list[Lot] = Field(
+        description='Remaining lots using FIFO, oldest first.',
+    )
+    
+    
+class PositionValue(BaseModel):
+    acct_id: str = Field(
+        description='The ID of the account holding the property.',
+    )
+    prop_id: str = Field(
+        description='The ID of the property held.',
+    )
+    symbol: str = Field(
+        description='The symbol of the property.',
+    )
+    prop_type: PropertyType = Field(
+        description='The type of the property.',
+    )
+    currency: CurType = Field(
+        description='The currency the property is priced in.',
+    )
+    quantity: float = Field(
+        description='Quantity held.',
+    )
+    price: float | None = Field(
+        description='Price per unit in the property currency, None if no price is available.',
+    )
+    price_source: Literal['cash', 'market', 'last_trade', 'none'] = Field(
+        description='Where the price comes from: cash (1 per unit), market close, or the last trade of the user.',
+    )
+    market_value: float = Field(
+        description='Market value in the property currency.',
+    )
+    report_value: float = Field(
+        description='Market value in the report currency.',
+    )
+    
+class Valuation(BaseModel):
+    as_of: date = Field(
+        description='The valuation date.',
+    )
+    report_currency: CurType = Field(
+        description='The currency of the totals.',
+    )
+    total: float = Field(
+        description='Total market value in the report currency, positions without a price are left out.',
+    )
+    by_account: dict[str, float] = Field(
+        description='Total market value per acct_id.',
+    )
+    by_prop_type: dict[str, float] = Field(
+        description='Total market value per property type name.',
+    )
+    by_currency: dict[str, float] = Field(
+        description='Total market value (in report currency) per property currency name.',
+    )
+    positions: list[PositionValue] = Field(
+        description='Value of each position.',
+    )
+    missing_prices: list[str] = Field(
+        default_factory=list,
+        description='Symbols held without any price (price_source none), left out of the totals.',
+    )
+    
+    
+class NetWorthPoint(BaseModel):
+    cur_dt: date = Field(
+        description='The date, values are at the end of the day.',
+    )
+    net_worth: float = Field(
+        description='Market value of all positions in the report currency.',
+    )
+    priced: bool = Field(
+        default=True,
+        description='False if a held property had no market price that day (valued at its last trade price, if any).',
+    )
+    
+class NetWorthSeries(BaseModel):
+    report_currency: CurType = Field(
+        description='The currency of the values.',
+    )
+    points: list[NetWorthPoint] = Field(
+        description='Net worth of every day in the range, oldest first.',
+    )
+    missing_prices: list[str] = Field(
+        default_factory=list,
+        description='Symbols held without a market price on some day of the range.',
+    )
+    
+    
+class ScopeReturn(BaseModel):
+    scope: Literal['overall', 'plan_type', 'account'] = Field(
+        description='What the return is measured on: the whole portfolio, all accounts of a plan type, or one account.',
+    )
+    key: str = Field(
+        description='ALL for overall, the plan type name, or the acct_id.',
+    )
+    start_value: float = Field(
+        description='Value at the end of the start date, in the report currency.',
+    )
+    end_value: float = Field(
+        description='Value at the end of the end date, in the report currency.',
+    )
+    net_contribution: float = Field(
+        description='Money put in minus money taken out after the start date, in the report currency.',
+    )
+    twr: float | None = Field(
+        description='Time-weighted return over the period (not annualized), None if prices are missing.',
+    )
+    irr: float | None = Field(
+        description='Money-weighted return (XIRR), annualized, None if it does not exist or prices are missing.',
+    )
+    
+class Performance(BaseModel):
+    start_dt: date = Field(
+        description='The start date, returns are measured from its end.',
+    )
+    end_dt: date = Field(
+        description='The end date.',
+    )
+    report_currency: CurType = Field(
+        description='The currency of the values.',
+    )
+    returns: list[ScopeReturn] = Field(
+        description='Returns overall, per plan type and per account.',
+    )
+    missing_prices: list[str] = Field(
+        default_factory=list,
+        description='Symbols held without a market price on some day, returns of the scopes holding them are None.',
+    )
+    
+    
+class IncomeExpense(BaseModel):
+    period: str = Field(
+        description='The month (YYYY-MM) or year (YYYY).',
+    )
+    acct_id: str = Field(
+        description='The ID of the account.',
+    )
+    leg_type: LegType = Field(
+        description='The leg type, i.e., dividend, interest, rent, fee, tax or other.',
+    )
+    amount: float = Field(
+        description='Total amount in the report currency, converted at the FX rate of each transaction date.',
+    )
+    
+class IncomeExpenseSummary(BaseModel):
+    period_type: Literal['month', 'year'] = Field(
+        description='How amounts are bucketed.',
+    )
+    report_currency: CurType = Field(
+        description='The currency of the amounts.',
+    )
+    items: list[IncomeExpense] = Field(
+        description='Totals per period, account and leg type, oldest period first.',
+    )
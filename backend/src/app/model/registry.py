@@ -90,6 +90,26 @@ class Property(BaseModel):
         return self
     
     
+class FacetCount(BaseModel):
+    value: str | None = Field(
+        description='The facet value, e.g., a sector name. None if not available.',
+    )
+    count: int = Field(
+        description='The number of properties with this value.',
+    )
+    
+class PropertyBrowsePage(BaseModel):
+    items: list[Property] = Field(
+        description='The properties on this page, ordered by symbol.',
+    )
+    facets: dict[str, list[FacetCount]] = Field(
+        description='Counts per facet value, each facet counted under all other filters.',
+    )
+    next_after: str | None = Field(
+        description='Pass as `after` to get the next page, None if this is the last page.',
+    )
+    
+    
 class PrivatePropOwnership(BaseModel):
     """ all properties that are not public should be owned by a user, and registered in this model """
     
@@ -6,6 +6,18 @@ from src.app.utils.tools import id_generator
 from src.app.model.enums import CurType, PropertyType, PlanType, LegType
 
 
+# cash flow direction of each leg type, 1 = cash in, -1 = cash out, 0 = no cash flow
+CF_DIRECTIONS: dict[LegType, int] = {
+    LegType.BUY: -1,
+    LegType.SELL: 1,
+    LegType.FEE: -1,
+    LegType.INTEREST: 1,
+    LegType.DIVIDEND: 1,
+    LegType.RENT: 1,
+    LegType.TAX: -1,
+    LegType.OTHER: 0,
+}
+
 class LegCreate(BaseModel):
 
     leg_type: LegType = Field(
@@ -32,12 +44,7 @@ class LegCreate(BaseModel):
     @computed_field
     @property
     def cf_direction(self) -> int:
-        if self.leg_type in [LegType.SELL, LegType.INTEREST, LegType.DIVIDEND, LegType.RENT]:
-            return 1
-        elif self.leg_type in [LegType.BUY, LegType.FEE, LegType.TAX]:
-            return -1
-        else: # OTHER
-            return 0
+        return CF_DIRECTIONS[self.leg_type]
 
     
 class Leg(LegCreate):
@@ -111,4 +118,13 @@ class Transaction(TransactionWOLegs):
         for leg in self.legs:
             if leg.user_id != self.user_id:
                 raise ValueError(f'Leg user ID {leg.user_id} must be the same as the transaction user ID {self.user_id}.')
-        return self
\ No newline at end of file
+        return self
+    
+    
+class TransactionPage(BaseModel):
+    items: list[Transaction] = Field(
+        description='The transactions on this page, latest first.',
+    )
+    next_after: str | None = Field(
+        description='Pass as `after` to get the next page, None if this is the last page.',
+    )
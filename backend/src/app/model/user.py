@@ -1,5 +1,6 @@
 from functools import partial
-from pydantic import Field, computed_field
+from pydantic import Field
+from pydantic.json_schema import SkipJsonSchema
 from src.app.utils.tools import id_generator, pwd_context
 from src.app.utils.base import EnhancedBaseModel
 
@@ -38,15 +39,8 @@ class UserInternalRead(User):
     
 class UserCreate(User):
     password: str = Field(min_length=8, max_length=20)
-    
-    @computed_field
-    def hashed_password(self) -> str:
-        """Hash the password.
-        
-        Returns:
-            str: The hashed password.
-        """
-        return pwd_context.hash(self.password)
+    # set once by the password hasher before saving, never taken from or returned to clients
+    hashed_password: SkipJsonSchema[str | None] = Field(default=None, exclude=True)
     
 class UserRegister(EnhancedBaseModel):
     username: str = Field(max_length=20)
@@ -1,4 +1,8 @@
 import os
+import logging
+from typing import NamedTuple
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
 from yokedcache import YokedCache
 
 # Use environment variable for Redis host, defaulting to localhost for local development
@@ -7,3 +11,46 @@ redis_host = os.environ.get("REDIS_HOST", "localhost")
 redis_url = f"redis://{redis_host}:6379"
 
 cache = YokedCache(redis_url=redis_url)
+# raw client for batched (MGET/pipeline) and atomic operations yokedcache does not expose
+redis_client = Redis.from_url(redis_url, decode_responses=True)
+
+
+class UserNamespace(NamedTuple):
+    """Key space of one generation of a user's cached data."""
+    user_id: str
+    generation: int
+    
+    def key(self, kind: str, *parts: str) -> str:
+        return ':'.join((kind, self.user_id, f"g{self.generation}", *parts))
+    
+    
+class UserNamespaces:
+    """Per user generation counter embedded in the keys of all user-scoped caches.
+    
+    Writers call `bump` after committing: one atomic INCR moves the user to a new key space, 
+    so every cached entry of the user is invalidated at once and the old ones expire by their TTL.
+    Readers must get the namespace before loading from the database and write back under that same 
+    namespace, so data loaded before a concurrent write can never be served after it.
+    """
+    
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"cache_generation:{user_id}"
+    
+    async def get(self, user_id: str) -> UserNamespace | None:
+        """Current namespace of the user, None if redis is unavailable (skip caching)."""
+        try:
+            generation = await redis_client.get(self._key(user_id))
+        except RedisError as e:
+            logging.warning(f"Cache generation unavailable: {e}")
+            return None
+        return UserNamespace(user_id, int(generation or 0))
+    
+    async def bump(self, user_id: str):
+        try:
+            await redis_client.incr(self._key(user_id))
+        except RedisError as e:
+            logging.warning(f"Cache generation unavailable: {e}")
+            
+            
+user_namespaces = UserNamespaces()
@@ -0,0 +1,99 @@
+from datetime import date, datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import delete, insert, select
+from src.app.repository.orm import LedgerChangeORM, LedgerConsumerORM
+from src.app.repository.uow import commit_or_defer
+from src.app.model.ledger import LedgerChange
+
+
+class LedgerChangeRepository:
+    """Append-only ledger change feed and the position of its consumers, see `LedgerChangeORM`."""
+    
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+    
+    async def record(self, user_id: str, from_dts: dict[tuple[str, str], date]):
+        """Append a change per position, run in the unit of work of the leg writes.
+        
+        Args:
+            from_dts (dict[tuple[str, str], date]): earliest transaction date affected per (acct_id, prop_id).
+        """
+        if not from_dts:
+            return
+        rows = [
+            dict(
+                user_id=user_id,
+                acct_id=acct_id,
+                prop_id=prop_id,
+                from_dt=from_dt.date() if isinstance(from_dt, datetime) else from_dt
+            ) for (acct_id, prop_id), from_dt in sorted(from_dts.items())
+        ]
+        await commit_or_defer(self.db_session, (insert(LedgerChangeORM), rows), during_creation=True)
+    
+    async def list_after(self, after_change_id: int, limit: int = 1000) -> list[LedgerChange]:
+        """Changes after the given change in feed order."""
+        sql = (
+            select(LedgerChangeORM)
+            .where(LedgerChangeORM.change_id > after_change_id)
+            .order_by(LedgerChangeORM.change_id) # type: ignore
+            .limit(limit)
+        )
+        result = await self.db_session.execute(sql)
+        return [
+            LedgerChange(
+                change_id=change.change_id,
+                user_id=change.user_id,
+                acct_id=change.acct_id,
+                prop_id=change.prop_id,
+                from_dt=change.from_dt
+            ) for change in result.scalars().all()
+        ]
+    
+    async def get_offset(self, consumer: str) -> int:
+        """Last change acknowledged by the consumer, 0 for a new consumer."""
+        sql = select(LedgerConsumerORM.last_change_id).where(LedgerConsumerORM.consumer == consumer)
+        result = await self.db_session.execute(sql)
+        return result.scalars().one_or_none() or 0
+    
+    async def set_offset(self, consumer: str, last_change_id: int):
+        """Move the consumer forward to last_change_id (never backward), in one upsert.
+        
+        Concurrent drains of the same consumer neither fail on the first insert nor move it backward.
+        """
+        values = dict(consumer=consumer, last_change_id=last_change_id)
+        if self.db_session.bind.dialect.name == 'sqlite': # type: ignore
+            # sqlite (tests) has no ON DUPLICATE KEY, its two argument max() is GREATEST
+            sql = sqlite_insert(LedgerConsumerORM).values(values)
+            sql = sql.on_conflict_do_update(
+                index_elements=['consumer'],
+                set_=dict(last_change_id=func.max(LedgerConsumerORM.last_change_id, sql.excluded.last_change_id))
+            )
+        else:
+            sql = mysql_insert(LedgerConsumerORM).values(values)
+            sql = sql.on_duplicate_key_update(
+                last_change_id=func.greatest(LedgerConsumerORM.last_change_id, sql.inserted.last_change_id)
+            )
+        await commit_or_defer(self.db_session, sql, during_creation=False)
+        
+    async def prune(self):
+        """Delete the changes acknowledged by every consumer, the feed only keeps what is still unread.
+        
+        A consumer is known from its first acknowledgement, and starts from the oldest change kept.
+        The newest change is always kept, as some engines (sqlite, MySQL before 8.0 on restart) 
+        derive the next auto increment id from the max one, and would hand out acknowledged ids again.
+        """
+        sql = select(
+            select(func.min(LedgerConsumerORM.last_change_id)).scalar_subquery(),
+            select(func.max(LedgerChangeORM.change_id)).scalar_subquery()
+        )
+        min_acked, max_change_id = (await self.db_session.execute(sql)).one()
+        if min_acked is None or max_change_id is None:
+            return
+        await commit_or_defer(
+            self.db_session, 
+            delete(LedgerChangeORM).where(LedgerChangeORM.change_id <= min(min_acked, max_change_id - 1)), 
+            during_creation=False
+        )
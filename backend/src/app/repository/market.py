@@ -1,6 +1,7 @@
 import logging
 from typing import Dict, List
 from datetime import date, timedelta
+from sqlalchemy import and_, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import Session, delete, select, insert, distinct
 from sqlalchemy.exc import NoResultFound, IntegrityError
@@ -85,11 +86,46 @@ class FxRepository:
     async def get_fx_on_date(self, cur_dt: date) -> Dict[CurType, float]:
         sql = select(FxORM.currency, FxORM.rate).where(FxORM.cur_dt == cur_dt)
         result = await self.db_session.execute(sql)
-        fxs = result.scalars().all() # get the fx
+        fxs = result.all() # get the fx
         
         # .all() never raises NoResultFound, it returns empty list
         return {CurType(fx.currency): fx.rate for fx in fxs}
     
+    async def get_fx_as_of(self, cur_dt: date, lookback_days: int = 10) -> Dict[CurType, float]:
+        """Latest rate of every currency on or before cur_dt (e.g., for weekends or not yet downloaded days)."""
+        latest = (
+            select(FxORM.currency, func.max(FxORM.cur_dt).label('cur_dt'))
+            .where(
+                FxORM.cur_dt <= cur_dt,
+                FxORM.cur_dt >= cur_dt - timedelta(days=lookback_days)
+            )
+            .group_by(FxORM.currency)
+            .subquery()
+        )
+        sql = (
+            select(FxORM.currency, FxORM.rate)
+            .join(latest, and_(FxORM.currency == latest.c.currency, FxORM.cur_dt == latest.c.cur_dt))
+        )
+        result = await self.db_session.execute(sql)
+        return {CurType(fx.currency): fx.rate for fx in result.all()}
+    
+    async def get_fx_between(self, start_date: date, end_date: date, lookback_days: int = 10) -> List[FxRate]:
+        """Rates of all currencies from start_date to end_date in date order, 
+        including the lookback_days before start_date to carry rates into the first days."""
+        sql = (
+            select(FxORM)
+            .where(
+                FxORM.cur_dt >= start_date - timedelta(days=lookback_days),
+                FxORM.cur_dt <= end_date
+            )
+            .order_by(FxORM.cur_dt)
+        )
+        result = await self.db_session.execute(sql)
+        return [
+            FxRate(currency=CurType(fx.currency), cur_dt=fx.cur_dt, rate=fx.rate) 
+            for fx in result.scalars().all()
+        ]
+    
     async def get_hist_fx(self, currency: CurType, start_date: date, end_date: date) -> List[FxRate]:
         sql = select(FxORM).where(
             FxORM.currency == currency, 
@@ -1,10 +1,10 @@
 from typing import Any
 from sqlalchemy.engine import Engine
 from sqlmodel import Field, SQLModel, Column, create_engine 
-from sqlalchemy import ForeignKey, Boolean, JSON, TIMESTAMP, Integer, String, Text, Date, DECIMAL, Index
+from sqlalchemy import ForeignKey, Boolean, JSON, TIMESTAMP, BigInteger, Integer, String, Text, Date, DECIMAL, Index, Computed, func
 from sqlalchemy_utils import EmailType, PasswordType, PhoneNumberType, ChoiceType
 from sqlalchemy.exc import NoResultFound, IntegrityError
-from datetime import date
+from datetime import date, datetime
 from src.app.model.enums import CurType, PropertyType, PlanType, LegType
 from src.app.model.exceptions import FKNoDeleteUpdateError, FKNotExistError, AlreadyExistError
 
@@ -29,6 +29,21 @@ def infer_integrity_error(e: IntegrityError, during_creation: bool = True) ->  F
     return e
 
 
+def json_facet_column(key: str, length: int = 100) -> Computed:
+    """Stored generated column extracting a scalar from property.custom_props (MySQL).
+    
+    JSON null unquotes to the string 'null', map it back to NULL.
+    """
+    return Computed(
+        f"LEFT(NULLIF(JSON_UNQUOTE(JSON_EXTRACT(custom_props, '$.{key}')), 'null'), {length})",
+        persisted=True
+    )
+
+
+# generated columns on property table, must never be written
+PROPERTY_FACET_COLUMNS = ('exchange', 'sector', 'industry', 'country')
+
+
 def get_class_by_tablename(tablename):
     """Return class reference mapped to table.
 
@@ -131,6 +146,11 @@ class PropertyORM(SQLModelWithSort, table=True):
             "symbol", "name", "description",
             mysql_prefix="FULLTEXT"
         ),
+        # facet indexes, symbol included to serve keyset pagination within a facet
+        Index('idx_property_exchange', 'exchange', 'symbol'),
+        Index('idx_property_sector', 'sector', 'symbol'),
+        Index('idx_property_industry', 'industry', 'symbol'),
+        Index('idx_property_country', 'country', 'symbol'),
     )
 
     
@@ -193,6 +213,39 @@ class PropertyORM(SQLModelWithSort, table=True):
             nullable = True
         )
     )
+    # generated from custom_props (PublicPropInfo fields), read only
+    exchange: str | None = Field(
+        default=None,
+        sa_column=Column(
+            String(length = 100),
+            json_facet_column('exchange'),
+            nullable = True
+        )
+    )
+    sector: str | None = Field(
+        default=None,
+        sa_column=Column(
+            String(length = 100),
+            json_facet_column('sector'),
+            nullable = True
+        )
+    )
+    industry: str | None = Field(
+        default=None,
+        sa_column=Column(
+            String(length = 100),
+            json_facet_column('industry'),
+            nullable = True
+        )
+    )
+    country: str | None = Field(
+        default=None,
+        sa_column=Column(
+            String(length = 100),
+            json_facet_column('country'),
+            nullable = True
+        )
+    )
     
 class PrivatePropOwnershipORM(SQLModelWithSort, table=True):
     __collection__: str = 'primary'
@@ -275,6 +328,10 @@ class TransactionORM(SQLModelWithSort, table=True):
     __collection__: str = 'primary'
     __tablename__: str = "transaction"
     
+    __table_args__ = (
+        Index('idx_transaction_user_dt', 'user_id', 'trans_dt'),
+    )
+    
     trans_id: str = Field(
         sa_column=Column(
             String(length = 18), 
@@ -312,6 +369,9 @@ class LegORM(SQLModelWithSort, table=True):
     
     __table_args__ = (
         Index('idx_leg_user_id', 'user_id'),
+        Index('idx_leg_trans_id', 'trans_id'),
+        Index('idx_leg_user_acct_prop', 'user_id', 'acct_id', 'prop_id'),
+        Index('idx_leg_user_prop_type', 'user_id', 'prop_id', 'leg_type'),
     )
     
     leg_id: str = Field(
@@ -383,4 +443,154 @@ class LegORM(SQLModelWithSort, table=True):
             nullable = False
         )
     )
-    
\ No newline at end of file
+        
+    
+class PositionSnapshotORM(SQLModelWithSort, table=True):
+    """Running position per (user, account, property) after all legs on snap_dt.
+    
+    Sparse: one row only for dates where the position changed, derived from leg/transaction.
+    """
+    __collection__: str = 'primary'
+    __tablename__: str = "position_snapshot"
+    
+    user_id: str = Field(
+        sa_column=Column(
+            String(length = 15), 
+            ForeignKey(
+                'users.user_id', 
+                onupdate = 'CASCADE', 
+                ondelete = 'CASCADE'
+            ),
+            primary_key = True,
+            nullable = False
+        )
+    )
+    acct_id: str = Field(
+        sa_column=Column(
+            String(length = 18), 
+            ForeignKey(
+                'account.acct_id', 
+                onupdate = 'CASCADE', 
+                ondelete = 'CASCADE'
+            ),
+            primary_key = True,
+            nullable = False
+        )
+    )
+    prop_id: str = Field(
+        sa_column=Column(
+            String(length = 18), 
+            ForeignKey(
+                'property.prop_id', 
+                onupdate = 'CASCADE', 
+                ondelete = 'CASCADE'
+            ),
+            primary_key = True,
+            nullable = False
+        )
+    )
+    snap_dt: date = Field(
+        sa_column=Column(
+            Date(), 
+            primary_key = True, 
+            nullable = False
+        )
+    )
+    quantity: float = Field(
+        sa_column=Column(
+            DECIMAL(20, 5, asdecimal=False), 
+            nullable = False
+        )
+    )
+    invested: float = Field(
+        sa_column=Column(
+            DECIMAL(20, 2, asdecimal=False), 
+            nullable = False
+        )
+    )
+    cash_balance: float = Field(
+        sa_column=Column(
+            DECIMAL(20, 2, asdecimal=False), 
+            nullable = False
+        )
+    )
+    
+    
+class LedgerChangeORM(SQLModelWithSort, table=True):
+    """Append-only feed of ledger changes, written in the same transaction as the legs.
+    
+    One row per (user, account, property) touched by a write, with the earliest transaction date affected,
+    so consumers recompute from that date only. No FK on account/property, entries outlive them.
+    """
+    __collection__: str = 'primary'
+    __tablename__: str = "ledger_change"
+    
+    __table_args__ = (
+        Index('idx_ledger_change_user', 'user_id', 'change_id'),
+    )
+    
+    change_id: int | None = Field(
+        default=None,
+        sa_column=Column(
+            # sqlite only auto increments INTEGER primary keys
+            BigInteger().with_variant(Integer(), 'sqlite'), 
+            primary_key = True, 
+            autoincrement = True
+        )
+    )
+    user_id: str = Field(
+        sa_column=Column(
+            String(length = 15), 
+            ForeignKey(
+                'users.user_id', 
+                onupdate = 'CASCADE', 
+                ondelete = 'CASCADE'
+            ),
+            nullable = False
+        )
+    )
+    acct_id: str = Field(
+        sa_column=Column(
+            String(length = 18), 
+            nullable = False
+        )
+    )
+    prop_id: str = Field(
+        sa_column=Column(
+            String(length = 18), 
+            nullable = False
+        )
+    )
+    from_dt: date = Field(
+        sa_column=Column(
+            Date(), 
+            nullable = False
+        )
+    )
+    changed_at: datetime | None = Field(
+        default=None,
+        sa_column=Column(
+            TIMESTAMP(timezone=True), 
+            server_default = func.now(),
+            nullable = False
+        )
+    )
+    
+class LedgerConsumerORM(SQLModelWithSort, table=True):
+    """Position of each consumer in the ledger change feed."""
+    __collection__: str = 'primary'
+    __tablename__: str = "ledger_consumer"
+    
+    consumer: str = Field(
+        sa_column=Column(
+            String(length = 50), 
+            primary_key = True, 
+            nullable = False
+        )
+    )
+    last_change_id: int = Field(
+        sa_column=Column(
+            BigInteger(), 
+            nullable = False
+        )
+    )
@@ -0,0 +1,376 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import Date, and_, case, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import delete, insert, select
+from src.app.repository.orm import LegORM, PropertyORM, TransactionORM, PositionSnapshotORM
+from src.app.repository.uow import commit_or_defer
+from src.app.model.enums import LegType
+from src.app.model.portfolio import Holding
+from src.app.model.transaction import CF_DIRECTIONS
+
+
+INCOME_EXPENSE_LEG_TYPES = [leg_type for leg_type in LegType if leg_type not in (LegType.BUY, LegType.SELL)]
+
+
+def leg_amount():
+    # same as LegCreate.amount
+    return func.round(LegORM.quantity * LegORM.price, 2)
+
+def leg_cf_direction():
+    # same as LegCreate.cf_direction
+    return case(
+        *[(LegORM.leg_type == leg_type, direction) for leg_type, direction in CF_DIRECTIONS.items() if direction != 0],
+        else_=0
+    )
+
+def leg_invested_change():
+    return case(
+        (LegORM.leg_type == LegType.BUY, leg_amount()),
+        (LegORM.leg_type == LegType.SELL, -leg_amount()),
+        else_=0
+    )
+
+def leg_quantity_change():
+    # BUY adds, SELL removes quantity, other legs do not change the position
+    return case(
+        (LegORM.leg_type == LegType.BUY, LegORM.quantity),
+        (LegORM.leg_type == LegType.SELL, -LegORM.quantity),
+        else_=0
+    )
+
+
+class PortfolioRepository:
+    
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+        
+    async def get_acct_ids(self, user_id: str) -> list[str]:
+        """Accounts of the user that have any legs."""
+        sql = select(LegORM.acct_id).where(LegORM.user_id == user_id).distinct()
+        result = await self.db_session.execute(sql)
+        return list(result.scalars().all())
+        
+    async def get_last_prices(self, user_id: str, prop_ids: list[str], as_of: date) -> dict[str, float]:
+        """Price of the last BUY/SELL on or before as_of per property, for properties without market price."""
+        if not prop_ids:
+            return {}
+        ranked = (
+            select(
+                LegORM.prop_id,
+                LegORM.price,
+                func.row_number().over(
+                    partition_by=LegORM.prop_id,
+                    order_by=(TransactionORM.trans_dt.desc(), TransactionORM.trans_id.desc())
+                ).label('rn')
+            )
+            .join(TransactionORM, TransactionORM.trans_id == LegORM.trans_id)
+            .where(
+                LegORM.user_id == user_id,
+                LegORM.prop_id.in_(prop_ids),
+                LegORM.leg_type.in_([LegType.BUY, LegType.SELL]),
+                TransactionORM.trans_dt < as_of + timedelta(days=1)
+            )
+            .subquery()
+        )
+        sql = select(ranked.c.prop_id, ranked.c.price).where(ranked.c.rn == 1)
+        result = await self.db_session.execute(sql)
+        return {prop_id: price for prop_id, price in result.all()}
+        
+    async def get_trade_prices(self, user_id: str, prop_ids: list[str], start_dt: date, end_dt: date):
+        """Prices of BUY/SELL legs of the properties after start_dt up to end_dt, in time order.
+        
+        Returns rows of (prop_id, trans_dt, price).
+        """
+        if not prop_ids:
+            return []
+        sql = (
+            select(LegORM.prop_id, TransactionORM.trans_dt, LegORM.price)
+            .join(TransactionORM, TransactionORM.trans_id == LegORM.trans_id)
+            .where(
+                LegORM.user_id == user_id,
+                LegORM.prop_id.in_(prop_ids),
+                LegORM.leg_type.in_([LegType.BUY, LegType.SELL]),
+                # whole days, as trans_dt is a timestamp
+                TransactionORM.trans_dt >= start_dt + timedelta(days=1),
+                TransactionORM.trans_dt < end_dt + timedelta(days=1)
+            )
+            .order_by(TransactionORM.trans_dt, TransactionORM.trans_id)
+        )
+        result = await self.db_session.execute(sql)
+        return result.all()
+        
+    async def get_cash_flows(self, user_id: str, start_dt: date, end_dt: date):
+        """Net cash flow (cf_direction * amount) per position and transaction date after start_dt up to end_dt.
+        
+        Returns rows of (acct_id, prop_id, trans_dt, cash_flow), in the property currency.
+        """
+        sql = (
+            select(
+                LegORM.acct_id,
+                LegORM.prop_id,
+                TransactionORM.trans_dt,
+                func.sum(leg_cf_direction() * leg_amount()).label('cash_flow')
+            )
+            .join(TransactionORM, TransactionORM.trans_id == LegORM.trans_id)
+            .where(
+                LegORM.user_id == user_id,
+                # whole days, as trans_dt is a timestamp
+                TransactionORM.trans_dt >= start_dt + timedelta(days=1),
+                TransactionORM.trans_dt < end_dt + timedelta(days=1)
+            )
+            .group_by(LegORM.acct_id, LegORM.prop_id, TransactionORM.trans_dt)
+        )
+        result = await self.db_session.execute(sql)
+        return result.all()
+        
+    async def get_income_expenses(self, user_id: str, start_dt: date, end_dt: date):
+        """Amount of income and expense legs (all but BUY/SELL) per account, leg type, currency and day.
+        
+        Returns rows of (acct_id, leg_type, currency, trans_dt, amount), amount in the property currency.
+        Legs are summed per calendar day of trans_dt, the finest bucket the FX conversion needs.
+        """
+        trans_day = func.date(TransactionORM.trans_dt, type_=Date)
+        sql = (
+            select(
+                LegORM.acct_id,
+                LegORM.leg_type,
+                PropertyORM.currency,
+                trans_day.label('trans_dt'),
+                func.sum(leg_amount()).label('amount')
+            )
+            .join(TransactionORM, TransactionORM.trans_id == LegORM.trans_id)
+            .join(PropertyORM, PropertyORM.prop_id == LegORM.prop_id)
+            .where(
+                LegORM.user_id == user_id,
+                LegORM.leg_type.in_(INCOME_EXPENSE_LEG_TYPES),
+                # whole days, as trans_dt is a timestamp
+                TransactionORM.trans_dt >= start_dt,
+                TransactionORM.trans_dt < end_dt + timedelta(days=1)
+            )
+            .group_by(LegORM.acct_id, LegORM.leg_type, PropertyORM.currency, trans_day)
+        )
+        result = await self.db_session.execute(sql)
+        return result.all()
+        
+    async def get_trades(self, user_id: str, acct_ids: list[str]):
+        """BUY/SELL/FEE totals per (acct_id, prop_id, transaction), in time order of each position.
+        
+        Returns rows of (acct_id, prop_id, trans_dt, buy_qty, buy_amount, sell_qty, sell_amount, fee_amount).
+        """
+        def _sum_of(leg_type: LegType, value):
+            return func.sum(case((LegORM.leg_type == leg_type, value), else_=0))
+        
+        sql = (
+            select(
+                LegORM.acct_id,
+                LegORM.prop_id,
+                TransactionORM.trans_dt,
+                _sum_of(LegType.BUY, LegORM.quantity).label('buy_qty'),
+                _sum_of(LegType.BUY, leg_amount()).label('buy_amount'),
+                _sum_of(LegType.SELL, LegORM.quantity).label('sell_qty'),
+                _sum_of(LegType.SELL, leg_amount()).label('sell_amount'),
+                _sum_of(LegType.FEE, leg_amount()).label('fee_amount'),
+            )
+            .join(TransactionORM, TransactionORM.trans_id == LegORM.trans_id)
+            .where(
+                LegORM.user_id == user_id,
+                LegORM.acct_id.in_(acct_ids),
+                LegORM.leg_type.in_([LegType.BUY, LegType.SELL, LegType.FEE])
+            )
+            .group_by(LegORM.acct_id, LegORM.prop_id, TransactionORM.trans_dt, TransactionORM.trans_id)
+            .order_by(LegORM.acct_id, LegORM.prop_id, TransactionORM.trans_dt, TransactionORM.trans_id)
+        )
+        result = await self.db_session.execute(sql)
+        return result.all()
+        
+    async def get_holdings(self, user_id: str, acct_id: str | None = None, 
+                           include_closed: bool = False) -> list[Holding]:
+        """Aggregate legs of a user into positions per (acct_id, prop_id) in one grouped query.
+        
+        Args:
+            include_closed (bool): whether to include positions with zero net quantity.
+        """
+        quantity = func.sum(leg_quantity_change())
+        invested = func.sum(leg_invested_change())
+        cash_balance = func.sum(leg_cf_direction() * leg_amount())
+        sql = (
+            select(
+                LegORM.acct_id, 
+                LegORM.prop_id, 
+                quantity.label('quantity'), 
+                invested.label('invested'), 
+                cash_balance.label('cash_balance')
+            )
+            .where(LegORM.user_id == user_id)
+            .group_by(LegORM.acct_id, LegORM.prop_id)
+            .order_by(LegORM.acct_id, LegORM.prop_id)
+        )
+        if acct_id is not None:
+            sql = sql.where(LegORM.acct_id == acct_id)
+        if not include_closed:
+            sql = sql.having(quantity != 0)
+        result = await self.db_session.execute(sql)
+        return [
+            Holding(
+                acct_id=row.acct_id,
+                prop_id=row.prop_id,
+                quantity=float(row.quantity or 0),
+                invested=float(row.invested or 0),
+                cash_balance=float(row.cash_balance or 0)
+            ) for row in result.all()
+        ]
+        
+        
+class PositionSnapshotRepository:
+    """Incrementally maintained running positions, see `PositionSnapshotORM`."""
+    
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+        
+    async def _latest(self, user_id: str, as_of: date, 
+                      positions: list[tuple[str, str]] | None = None, 
+                      acct_id: str | None = None) -> list[PositionSnapshotORM]:
+        # latest snapshot on or before as_of of each position, served by the primary key
+        latest = (
+            select(
+                PositionSnapshotORM.acct_id, 
+                PositionSnapshotORM.prop_id, 
+                func.max(PositionSnapshotORM.snap_dt).label('snap_dt')
+            )
+            .where(
+                PositionSnapshotORM.user_id == user_id,
+                PositionSnapshotORM.snap_dt <= as_of
+            )
+            .group_by(PositionSnapshotORM.acct_id, PositionSnapshotORM.prop_id)
+        )
+        if positions is not None:
+            latest = latest.where(tuple_(PositionSnapshotORM.acct_id, PositionSnapshotORM.prop_id).in_(positions))
+        if acct_id is not None:
+            latest = latest.where(PositionSnapshotORM.acct_id == acct_id)
+        latest = latest.subquery()
+        sql = (
+            select(PositionSnapshotORM)
+            .join(
+                latest, 
+                and_(
+                    PositionSnapshotORM.acct_id == latest.c.acct_id,
+                    PositionSnapshotORM.prop_id == latest.c.prop_id,
+                    PositionSnapshotORM.snap_dt == latest.c.snap_dt
+                )
+            )
+            .where(PositionSnapshotORM.user_id == user_id)
+            .order_by(PositionSnapshotORM.acct_id, PositionSnapshotORM.prop_id)
+        )
+        result = await self.db_session.execute(sql)
+        return list(result.scalars().all())
+        
+    async def get_holdings_as_of(self, user_id: str, as_of: date, acct_id: str | None = None, 
+                                 include_closed: bool = False) -> list[Holding]:
+        snapshots = await self._latest(user_id, as_of, acct_id=acct_id)
+        return [
+            Holding(
+                acct_id=s.acct_id,
+                prop_id=s.prop_id,
+                quantity=s.quantity,
+                invested=s.invested,
+                cash_balance=s.cash_balance
+            ) for s in snapshots
+            if include_closed or s.quantity != 0
+        ]
+        
+    async def get_quantity_series(self, user_id: str, start_dt: date, end_dt: date):
+        """Quantity of every position at start_dt and at each change up to end_dt.
+        
+        Returns rows of (acct_id, prop_id, snap_dt, quantity), the first snapshot of a position 
+        may be dated before start_dt (the position it carries into start_dt).
+        """
+        rows = [
+            (s.acct_id, s.prop_id, s.snap_dt, s.quantity) 
+            for s in await self._latest(user_id, start_dt)
+        ]
+        sql = (
+            select(
+                PositionSnapshotORM.acct_id,
+                PositionSnapshotORM.prop_id,
+                PositionSnapshotORM.snap_dt,
+                PositionSnapshotORM.quantity
+            )
+            .where(
+                PositionSnapshotORM.user_id == user_id,
+                PositionSnapshotORM.snap_dt > start_dt,
+                PositionSnapshotORM.snap_dt <= end_dt
+            )
+            .order_by(PositionSnapshotORM.snap_dt)
+        )
+        result = await self.db_session.execute(sql)
+        return rows + [tuple(row) for row in result.all()]
+        
+    async def refresh(self, user_id: str, positions: set[tuple[str, str]], from_dt: date):
+        """Recompute snapshots of the given positions from from_dt forward.
+        
+        Must run after the legs are written (in the same unit of work), as it reads them back.
+
+        Args:
+            positions (set[tuple[str, str]]): (acct_id, prop_id) of positions whose legs changed.
+            from_dt (date): the earliest transaction date touched.
+        """
+        if not positions:
+            return
+        positions = sorted(positions) # type: ignore
+        if isinstance(from_dt, datetime):
+            from_dt = from_dt.date()
+        
+        # running totals carried in from before from_dt
+        base = {
+            (s.acct_id, s.prop_id): (s.quantity, s.invested, s.cash_balance)
+            for s in await self._latest(user_id, from_dt - timedelta(days=1), positions=positions) # type: ignore
+        }
+        
+        # daily changes from from_dt forward
+        snap_dt = func.date(TransactionORM.trans_dt)
+        sql = (
+            select(
+                LegORM.acct_id,
+                LegORM.prop_id,
+                snap_dt.label('snap_dt'),
+                func.sum(leg_quantity_change()).label('quantity'),
+                func.sum(leg_invested_change()).label('invested'),
+                func.sum(leg_cf_direction() * leg_amount()).label('cash_balance')
+            )
+            .join(TransactionORM, TransactionORM.trans_id == LegORM.trans_id)
+            .where(
+                LegORM.user_id == user_id,
+                tuple_(LegORM.acct_id, LegORM.prop_id).in_(positions),
+                TransactionORM.trans_dt >= from_dt
+            )
+            .group_by(LegORM.acct_id, LegORM.prop_id, snap_dt)
+            .order_by(LegORM.acct_id, LegORM.prop_id, snap_dt)
+        )
+        result = await self.db_session.execute(sql)
+        rows = []
+        for row in result.all():
+            quantity, invested, cash_balance = base.get((row.acct_id, row.prop_id), (0, 0, 0))
+            quantity = round(quantity + float(row.quantity or 0), 5)
+            invested = round(invested + float(row.invested or 0), 2)
+            cash_balance = round(cash_balance + float(row.cash_balance or 0), 2)
+            base[(row.acct_id, row.prop_id)] = (quantity, invested, cash_balance)
+            rows.append(dict(
+                user_id=user_id,
+                acct_id=row.acct_id,
+                prop_id=row.prop_id,
+                snap_dt=row.snap_dt if isinstance(row.snap_dt, date) else date.fromisoformat(str(row.snap_dt)),
+                quantity=quantity,
+                invested=invested,
+                cash_balance=cash_balance
+            ))
+        
+        statements = [
+            delete(PositionSnapshotORM).where(
+                PositionSnapshotORM.user_id == user_id,
+                tuple_(PositionSnapshotORM.acct_id, PositionSnapshotORM.prop_id).in_(positions),
+                PositionSnapshotORM.snap_dt >= from_dt
+            )
+        ]
+        if rows:
+            statements.append((insert(PositionSnapshotORM), rows))
+        await commit_or_defer(self.db_session, *statements, during_creation=True)
@@ -5,12 +5,16 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import Session, delete, select, insert, distinct
 from sqlmodel import Session, select, delete, distinct, case, func as f, and_, or_
 from sqlalchemy.exc import NoResultFound, IntegrityError
-from sqlalchemy import text, desc
-from src.app.model.enums import CurType
+from sqlalchemy import text, desc, literal, cast, String, union_all
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from src.app.model.enums import CurType, PropertyType
 from src.app.model.registry import Property, PrivatePropOwnership, Account
 from src.app.repository.orm import PropertyORM, PrivatePropOwnershipORM, AccountORM
 from src.app.model.exceptions import NotExistError
-from src.app.repository.orm import infer_integrity_error
+from src.app.repository.orm import infer_integrity_error, PROPERTY_FACET_COLUMNS
+
+# facets available to browse public properties
+PROPERTY_FACETS = ('prop_type', 'currency') + PROPERTY_FACET_COLUMNS
 
 class PropertyRepository:
     
@@ -30,6 +34,10 @@ class PropertyRepository:
             custom_props=property.custom_props
         )
         
+    def toPropertyRow(self, property: Property) -> dict:
+        """Column values for core (bulk) insert, generated columns excluded."""
+        return self.toPropertyORM(property).model_dump(exclude=set(PROPERTY_FACET_COLUMNS))
+        
     def fromPropertyORM(self, property_orm: PropertyORM) -> Property:
         return Property(
             prop_id=property_orm.prop_id,
@@ -62,6 +70,61 @@ class PropertyRepository:
             await self.db_session.rollback()
             raise infer_integrity_error(e, during_creation=True)
         
+    async def adds_if_not_exist(self, properties: List[Property]):
+        """Idempotent batch insert in one statement, rows whose key already exists are left untouched."""
+        if not properties:
+            return
+        sql = mysql_insert(PropertyORM).values([
+            self.toPropertyRow(property) for property in properties
+        ])
+        sql = sql.on_duplicate_key_update(symbol=sql.inserted.symbol) # no-op on duplicate
+        try:
+            await self.db_session.execute(sql)
+            await self.db_session.commit()
+        except IntegrityError as e:
+            await self.db_session.rollback()
+            raise infer_integrity_error(e, during_creation=True)
+        
+    async def upserts(self, new_properties: List[Property], existing_properties: List[Property], 
+                      owner_id: str | None = None):
+        """Insert new properties and update existing ones (matched by prop_id) in a single transaction.
+        
+        Args:
+            new_properties (List[Property]): properties to insert, fails on duplicate symbol.
+            existing_properties (List[Property]): properties to update, must carry the stored prop_id.
+            owner_id (str | None): if given, register ownership of the new properties to this user.
+        """
+        try:
+            if new_properties:
+                # plain insert, so a symbol taken in the meantime fails instead of overwriting others' row
+                await self.db_session.execute(
+                    insert(PropertyORM),
+                    [self.toPropertyRow(property) for property in new_properties]
+                )
+                if owner_id is not None:
+                    await self.db_session.execute(
+                        insert(PrivatePropOwnershipORM),
+                        [
+                            PrivatePropOwnership(prop_id=property.prop_id, user_id=owner_id).model_dump() 
+                            for property in new_properties
+                        ]
+                    )
+            if existing_properties:
+                sql = mysql_insert(PropertyORM).values([
+                    self.toPropertyRow(property) for property in existing_properties
+                ])
+                sql = sql.on_duplicate_key_update(
+                    name=sql.inserted.name,
+                    prop_type=sql.inserted.prop_type,
+                    description=sql.inserted.description,
+                    custom_props=sql.inserted.custom_props,
+                )
+                await self.db_session.execute(sql)
+            await self.db_session.commit()
+        except IntegrityError as e:
+            await self.db_session.rollback()
+            raise infer_integrity_error(e, during_creation=True)
+        
     async def remove(self, prop_id: str):
         sql = delete(PropertyORM).where(PropertyORM.prop_id == prop_id)
         try:
@@ -103,7 +166,24 @@ class PropertyRepository:
         except NoResultFound as e:
             raise NotExistError(details=str(e))
         return self.fromPropertyORM(p)
-        
+
+    async def get_with_owner(self, prop_id: str) -> tuple[Property, str | None]:
+        """Get property together with its owner (None for unowned/public) in one round trip."""
+        sql = (
+            select(PropertyORM, PrivatePropOwnershipORM.user_id)
+            .outerjoin(
+                PrivatePropOwnershipORM,
+                PrivatePropOwnershipORM.prop_id == PropertyORM.prop_id
+            )
+            .where(PropertyORM.prop_id == prop_id)
+        )
+        try:
+            result = await self.db_session.execute(sql)
+            p, owner_id = result.one()
+        except NoResultFound as e:
+            raise NotExistError(details=str(e))
+        return self.fromPropertyORM(p), owner_id
+
     async def get_by_symbol(self, symbol: str) -> Property:
         sql = select(PropertyORM).where(PropertyORM.symbol == symbol)
         try:
@@ -113,6 +193,28 @@ class PropertyRepository:
             raise NotExistError(details=str(e))
         return self.fromPropertyORM(p)
     
+    async def get_existing_by_symbols(self, symbols: List[str]) -> Dict[str, tuple[str, bool, str | None]]:
+        """Look up existing symbols in one query.
+        
+        Returns:
+            Dict[str, tuple[str, bool, str | None]]: symbol -> (prop_id, is_public, owner user_id)
+        """
+        if not symbols:
+            return {}
+        sql = (
+            select(PropertyORM.symbol, PropertyORM.prop_id, PropertyORM.is_public, PrivatePropOwnershipORM.user_id)
+            .outerjoin(
+                PrivatePropOwnershipORM,
+                PrivatePropOwnershipORM.prop_id == PropertyORM.prop_id
+            )
+            .where(PropertyORM.symbol.in_(symbols))
+        )
+        result = await self.db_session.execute(sql)
+        return {
+            symbol: (prop_id, is_public, owner_id) 
+            for symbol, prop_id, is_public, owner_id in result.all()
+        }
+    
     async def gets(self, prop_ids: List[str]) -> List[Property]:
         sql = select(PropertyORM).where(PropertyORM.prop_id.in_(prop_ids))
         result = await self.db_session.execute(sql)
@@ -139,6 +241,58 @@ class PropertyRepository:
         result = await self.db_session.execute(sql)
         return [self.fromPropertyORM(p) for p in result.scalars().all()]
     
+    def _browse_conditions(self, filters: Dict[str, list], exclude_facet: str | None = None) -> list:
+        conditions = [
+            PropertyORM.is_public == True,
+            PropertyORM.is_cash_prop == False
+        ]
+        for facet, values in filters.items():
+            if values and facet != exclude_facet:
+                conditions.append(getattr(PropertyORM, facet).in_(values))
+        return conditions
+    
+    async def browse_public(self, filters: Dict[str, list], after_symbol: str | None = None, 
+                            limit: int = 50) -> List[Property]:
+        """Page through public properties ordered by symbol (keyset pagination).
+        
+        Args:
+            filters (Dict[str, list]): facet -> accepted values, facet in PROPERTY_FACETS.
+            after_symbol (str | None): last symbol of the previous page.
+            limit (int): page size.
+        """
+        sql = select(PropertyORM).where(*self._browse_conditions(filters))
+        if after_symbol is not None:
+            sql = sql.where(PropertyORM.symbol > after_symbol)
+        sql = sql.order_by(PropertyORM.symbol).limit(limit)
+        result = await self.db_session.execute(sql)
+        return [self.fromPropertyORM(p) for p in result.scalars().all()]
+    
+    async def facet_counts_public(self, filters: Dict[str, list]) -> List[tuple[str, str | None, int]]:
+        """Count public properties per facet value in one grouped (UNION ALL) query.
+        
+        Each facet is counted under all filters except its own, so selecting a value
+        does not hide the alternatives of the same facet.
+        
+        Returns:
+            List[tuple[str, str | None, int]]: (facet, value as string, count)
+        """
+        sqls = []
+        for facet in PROPERTY_FACETS:
+            column = getattr(PropertyORM, facet)
+            sqls.append(
+                select(
+                    literal(facet).label('facet'),
+                    # prop_type/currency are stored as integers
+                    cast(column.expression, String(100)).label('value'), 
+                    f.count().label('cnt')
+                )
+                .where(*self._browse_conditions(filters, exclude_facet=facet))
+                .group_by(column)
+            )
+        result = await self.db_session.execute(union_all(*sqls))
+        return [(facet, value, cnt) for facet, value, cnt in result.all()]
+    
+    
 class PrivatePropOwnershipRepository:
     
     def __init__(self, db_session: AsyncSession):
@@ -1,10 +1,14 @@
+from datetime import date, timedelta
+from typing import Any, AsyncIterator
+from sqlalchemy import and_, or_, exists
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import delete, select, insert
-from sqlalchemy.exc import IntegrityError, NoResultFound
-from src.app.repository.orm import TransactionORM, LegORM
-from src.app.model.transaction import TransactionWOLegs, Leg
+from sqlmodel import delete, select, insert, update
+from sqlalchemy.exc import NoResultFound
+from src.app.repository.orm import TransactionORM, LegORM, PropertyORM
+from src.app.model.enums import LegType
+from src.app.model.transaction import TransactionWOLegs, Leg, Transaction
 from src.app.model.exceptions import NotExistError
-from src.app.repository.orm import infer_integrity_error
+from src.app.repository.uow import commit_or_defer
 
 class TransactionBodyRepository:
     
@@ -30,36 +34,28 @@ class TransactionBodyRepository:
     async def add(self, transaction: TransactionWOLegs):
         transaction_orm = self.toTransactionORM(transaction)    # type: ignore
         self.db_session.add(transaction_orm)
-        try:
-            await self.db_session.commit()
-        except IntegrityError as e:
-            await self.db_session.rollback()
-            raise infer_integrity_error(e, during_creation=True)
+        await commit_or_defer(self.db_session, during_creation=True)
+        
+    async def adds(self, transactions: list[TransactionWOLegs]):
+        transaction_orms = [self.toTransactionORM(transaction) for transaction in transactions]    # type: ignore
+        self.db_session.add_all(transaction_orms)
+        await commit_or_defer(self.db_session, during_creation=True)
         
     async def remove(self, trans_id: str):
         sql = delete(TransactionORM).where(TransactionORM.trans_id == trans_id)
-        try:
-            await self.db_session.execute(sql)
-            await self.db_session.commit()
-        except IntegrityError as e:
-            await self.db_session.rollback()
-            raise infer_integrity_error(e, during_creation=False)
+        await commit_or_defer(self.db_session, sql, during_creation=False)
         
     async def update(self, transaction: TransactionWOLegs):
-        transaction_orm = self.toTransactionORM(transaction)    # type: ignore
-        sql = select(TransactionORM).where(TransactionORM.trans_id == transaction.trans_id)
-        try:
-            result = await self.db_session.execute(sql)
-            p = result.scalars().one()
-        except NoResultFound as e:
-            raise NotExistError(details=str(e))
-        if not p == transaction_orm:
-            p.trans_dt = transaction.trans_dt
-            p.description = transaction.description
-            p.user_id = transaction.user_id
-            self.db_session.add(p)
-            await self.db_session.commit()
-            await self.db_session.refresh(p) # update p to instantly have new values
+        sql = (
+            update(TransactionORM)
+            .where(TransactionORM.trans_id == transaction.trans_id)
+            .values(
+                trans_dt=transaction.trans_dt,
+                description=transaction.description,
+                user_id=transaction.user_id
+            )
+        )
+        await commit_or_defer(self.db_session, sql, during_creation=False)
         
     async def get(self, trans_id: str) -> TransactionWOLegs:
         sql = select(TransactionORM).where(TransactionORM.trans_id == trans_id)
@@ -70,6 +66,137 @@ class TransactionBodyRepository:
             raise NotExistError(details=str(e))
         return self.fromTransactionORM(transaction_orm)
     
+    async def gets_with_legs(self, trans_ids: list[str]) -> dict[str, Transaction]:
+        """Get transactions with their legs in one joined query, missing ones are absent from the result."""
+        if not trans_ids:
+            return {}
+        sql = (
+            select(TransactionORM, LegORM)
+            .outerjoin(LegORM, LegORM.trans_id == TransactionORM.trans_id)
+            .where(TransactionORM.trans_id.in_(trans_ids))
+        )
+        result = await self.db_session.execute(sql)
+        bodies: dict[str, TransactionWOLegs] = {}
+        legs: dict[str, list[Leg]] = {}
+        for transaction_orm, leg_orm in result.all():
+            if transaction_orm.trans_id not in bodies:
+                bodies[transaction_orm.trans_id] = self.fromTransactionORM(transaction_orm)
+                legs[transaction_orm.trans_id] = []
+            if leg_orm is not None:
+                legs[transaction_orm.trans_id].append(Leg.model_validate(leg_orm, from_attributes=True))
+        return {
+            trans_id: Transaction(**body.model_dump(), legs=legs[trans_id])
+            for trans_id, body in bodies.items()
+        }
+    
+    async def list_by_user_id(
+        self, 
+        user_id: str, 
+        start_dt: date | None = None, 
+        end_dt: date | None = None,
+        acct_id: str | None = None,
+        prop_id: str | None = None,
+        leg_type: LegType | None = None,
+        after: tuple[date, str] | None = None,
+        limit: int = 100
+    ) -> list[TransactionWOLegs]:
+        """List transaction bodies of a user, latest first, keyset paginated on (trans_dt, trans_id).
+        
+        Args:
+            after (tuple[date, str] | None): (trans_dt, trans_id) of the last transaction of previous page.
+        """
+        sql = select(TransactionORM).where(TransactionORM.user_id == user_id)
+        if start_dt is not None:
+            sql = sql.where(TransactionORM.trans_dt >= start_dt)
+        if end_dt is not None:
+            sql = sql.where(TransactionORM.trans_dt <= end_dt)
+        
+        # leg filters, transaction kept if any of its legs match
+        leg_conditions = []
+        if acct_id is not None:
+            leg_conditions.append(LegORM.acct_id == acct_id)
+        if prop_id is not None:
+            leg_conditions.append(LegORM.prop_id == prop_id)
+        if leg_type is not None:
+            leg_conditions.append(LegORM.leg_type == leg_type)
+        if leg_conditions:
+            sql = sql.where(
+                exists().where(LegORM.trans_id == TransactionORM.trans_id, *leg_conditions)
+            )
+        
+        if after is not None:
+            after_dt, after_id = after
+            # expanded row comparison so it is served by the (user_id, trans_dt) index range
+            sql = sql.where(
+                or_(
+                    TransactionORM.trans_dt < after_dt,
+                    and_(TransactionORM.trans_dt == after_dt, TransactionORM.trans_id < after_id)
+                )
+            )
+        sql = (
+            sql
+            .order_by(TransactionORM.trans_dt.desc(), TransactionORM.trans_id.desc())
+            .limit(limit)
+        )
+        result = await self.db_session.execute(sql)
+        return [self.fromTransactionORM(p) for p in result.scalars().all()]
+    
+    async def stream_legs(
+        self, 
+        user_id: str, 
+        start_dt: date | None = None, 
+        end_dt: date | None = None,
+        chunk_size: int = 1000
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """Stream all legs of a user with their transaction, oldest first, in chunks of chunk_size rows.
+        
+        Rows are fetched from a server-side cursor, so memory is bounded by the chunk size. 
+        Legs of a transaction are consecutive, keyed like the import columns (trans_ref = trans_id).
+        """
+        sql = (
+            select(
+                TransactionORM.trans_id,
+                TransactionORM.trans_dt,
+                TransactionORM.description,
+                LegORM.leg_type,
+                LegORM.acct_id,
+                PropertyORM.symbol,
+                LegORM.quantity,
+                LegORM.price,
+            )
+            .join(LegORM, LegORM.trans_id == TransactionORM.trans_id)
+            .join(PropertyORM, PropertyORM.prop_id == LegORM.prop_id)
+            .where(TransactionORM.user_id == user_id)
+        )
+        if start_dt is not None:
+            sql = sql.where(TransactionORM.trans_dt >= start_dt)
+        if end_dt is not None:
+            sql = sql.where(TransactionORM.trans_dt < end_dt + timedelta(days=1))
+        # (user_id, trans_dt) index carries the primary key, no sort needed before the first row
+        sql = (
+            sql
+            .order_by(TransactionORM.trans_dt, TransactionORM.trans_id)
+            .execution_options(yield_per=chunk_size)
+        )
+        result = await self.db_session.stream(sql)
+        try:
+            async for partition in result.partitions():
+                yield [
+                    dict(
+                        trans_ref=row.trans_id,
+                        trans_dt=row.trans_dt.isoformat()[:10],
+                        description=row.description,
+                        leg_type=LegType(row.leg_type).name,
+                        account=row.acct_id,
+                        symbol=row.symbol,
+                        quantity=row.quantity,
+                        price=row.price,
+                    ) for row in partition
+                ]
+        finally:
+            # release the cursor if the consumer stops early (e.g., client disconnected)
+            await result.close()
+    
     
 class LegRepository:
     
@@ -103,47 +230,29 @@ class LegRepository:
     async def add(self, leg: Leg):
         leg_orm = self.toLegORM(leg)    # type: ignore
         self.db_session.add(leg_orm)
-        try:
-            await self.db_session.commit()
-        except IntegrityError as e:
-            await self.db_session.rollback()
-            raise infer_integrity_error(e, during_creation=True)
+        await commit_or_defer(self.db_session, during_creation=True)
         
     async def adds(self, legs: list[Leg]):
         leg_orms = [self.toLegORM(leg) for leg in legs]    # type: ignore
         self.db_session.add_all(leg_orms)
-        try:
-            await self.db_session.commit()
-        except IntegrityError as e:
-            await self.db_session.rollback()
-            raise infer_integrity_error(e, during_creation=True)
+        await commit_or_defer(self.db_session, during_creation=True)
         
     async def remove(self, leg_id: str):
         sql = delete(LegORM).where(LegORM.leg_id == leg_id)
-        try:
-            await self.db_session.execute(sql)
-            await self.db_session.commit()
-        except IntegrityError as e:
-            await self.db_session.rollback()
-            raise infer_integrity_error(e, during_creation=False)
+        await commit_or_defer(self.db_session, sql, during_creation=False)
         
     async def remove_by_trans_id(self, trans_id: str):
         sql = delete(LegORM).where(LegORM.trans_id == trans_id)
-        try:
-            await self.db_session.execute(sql)
-            await self.db_session.commit()
-        except IntegrityError as e:
-            await self.db_session.rollback()
-            raise infer_integrity_error(e, during_creation=False)
+        await commit_or_defer(self.db_session, sql, during_creation=False)
         
     async def removes(self, leg_ids: list[str]):
         sql = delete(LegORM).where(LegORM.leg_id.in_(leg_ids))
-        try:
-            await self.db_session.execute(sql)
-            await self.db_session.commit()
-        except IntegrityError as e:
-            await self.db_session.rollback()
-            raise infer_integrity_error(e, during_creation=False)
+        await commit_or_defer(self.db_session, sql, during_creation=False)
+        
+    async def updates(self, legs: list[Leg]):
+        # bulk update by primary key, executed as one executemany
+        params = [self.toLegORM(leg).model_dump() for leg in legs]
+        await commit_or_defer(self.db_session, (update(LegORM), params), during_creation=False)
         
         
     async def update(self, leg: Leg):
@@ -164,8 +273,8 @@ class LegRepository:
             p.price = leg.price
             
             self.db_session.add(p)
-            await self.db_session.commit()
-            await self.db_session.refresh(p) # update p to instantly have new values
+            if await commit_or_defer(self.db_session, during_creation=False):
+                await self.db_session.refresh(p) # update p to instantly have new values
             
     async def get(self, leg_id: str) -> Leg:
         sql = select(LegORM).where(LegORM.leg_id == leg_id)
@@ -184,4 +293,15 @@ class LegRepository:
     async def get_leg_ids_by_trans_id(self, trans_id: str) -> list[str]:
         sql = select(LegORM.leg_id).where(LegORM.trans_id == trans_id)
         result = await self.db_session.execute(sql)
-        return result.scalars().all()
\ No newline at end of file
+        return result.scalars().all()
+    
+    async def get_by_trans_ids(self, trans_ids: list[str]) -> dict[str, list[Leg]]:
+        """Get legs of many transactions in one query, keyed by trans_id."""
+        legs: dict[str, list[Leg]] = {trans_id: [] for trans_id in trans_ids}
+        if not trans_ids:
+            return legs
+        sql = select(LegORM).where(LegORM.trans_id.in_(trans_ids))
+        result = await self.db_session.execute(sql)
+        for p in result.scalars().all():
+            legs[p.trans_id].append(self.fromLegORM(p))
+        return legs
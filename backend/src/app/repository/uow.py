@@ -0,0 +1,75 @@
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from src.app.repository.orm import infer_integrity_error
+
+_UOW_DEPTH = 'uow_depth' # key in AsyncSession.info
+
+
+def in_unit_of_work(db_session: AsyncSession) -> bool:
+    return db_session.info.get(_UOW_DEPTH, 0) > 0
+
+async def commit_or_defer(db_session: AsyncSession, *statements: Any, during_creation: bool = True) -> bool:
+    """Execute statements and commit, or only flush if a unit of work is active on the session.
+    
+    Repositories call this instead of committing directly, so that several repository
+    writes can be grouped into one database transaction by the service.
+    
+    Args:
+        db_session (AsyncSession): The session shared by the repositories.
+        statements: Optional DML statements to execute before committing, either a statement 
+            or a (statement, parameters) tuple to execute many.
+        during_creation (bool): How to interpret integrity errors, see `infer_integrity_error`.
+        
+    Returns:
+        bool: True if committed, False if deferred to the unit of work.
+    """
+    try:
+        for statement in statements:
+            if isinstance(statement, tuple):
+                await db_session.execute(*statement)
+            else:
+                await db_session.execute(statement)
+        if in_unit_of_work(db_session):
+            # send statements in order (and surface errors where they happen), commit later
+            await db_session.flush()
+            return False
+        await db_session.commit()
+        return True
+    except IntegrityError as e:
+        if not in_unit_of_work(db_session):
+            await db_session.rollback() # otherwise rolled back by the unit of work
+        raise infer_integrity_error(e, during_creation=during_creation)
+    
+
+class UnitOfWork:
+    """Group writes of repositories sharing one session into a single atomic commit.
+    
+    Usage:
+        async with unit_of_work.begin():
+            await transaction_body_repository.add(transaction)
+            await leg_repository.adds(legs)
+        # committed once here, or rolled back if anything above raised
+    
+    Blocks can be nested, only the outermost one commits.
+    """
+    
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+        
+    @asynccontextmanager
+    async def begin(self, during_creation: bool = True) -> AsyncIterator['UnitOfWork']:
+        info = self.db_session.info
+        info[_UOW_DEPTH] = info.get(_UOW_DEPTH, 0) + 1
+        try:
+            yield self
+        except BaseException:
+            info[_UOW_DEPTH] -= 1
+            if info[_UOW_DEPTH] == 0:
+                await self.db_session.rollback()
+            raise
+        
+        info[_UOW_DEPTH] -= 1
+        if info[_UOW_DEPTH] == 0:
+            await commit_or_defer(self.db_session, during_creation=during_creation)
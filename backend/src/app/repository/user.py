@@ -24,10 +24,12 @@ class UserRepository:
         Returns:
             UserORM: The UserORM object.
         """
+        if user.hashed_password is None:
+            raise ValueError("Password must be hashed before saving, see PasswordHasher")
         return UserORM(
             user_id = user.user_id,
             username = user.username,
-            hashed_password = user.hashed_password, # type: ignore
+            hashed_password = user.hashed_password,
             is_admin = user.is_admin,
             email = user.email
         )
@@ -1,14 +1,22 @@
 import asyncio
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from jose import jwt, JWTError, ExpiredSignatureError
+try:
+    # PyJWT verifies tokens several times faster than python-jose, used for decoding when installed
+    import jwt as pyjwt
+except ImportError:
+    pyjwt = None
 from pydantic import ValidationError
-from src.app.utils.secrets import get_secret
+from src.app.utils.secrets import secrets_provider
 from src.app.utils.rate_limiter import get_rate_limiter
 from src.app.model.exceptions import NotExistError, PermissionDeniedError, \
     StrongPermissionDeniedError, UnexpectedError
 from src.app.model.user import Token, User, UserCreate
 from src.app.repository.user import UserRepository
 from src.app.service.email import EmailService
+from src.app.service.password import password_hasher
 
 def create_access_token(user: User, secret_key: str, 
             algorithm: str="HS256", expires_minutes: int = 15) -> str:
@@ -19,20 +27,67 @@ def create_access_token(user: User, secret_key: str,
     
     return encoded_jwt
 
-def decode_token(token: str, secret_key: str, algorithm: str="HS256") -> User:
+class TokenExpiredError(PermissionError):
+    pass
+
+def decode_payload(token: str, secret_key: str, algorithm: str="HS256") -> dict:
+    if pyjwt is not None:
+        try:
+            return pyjwt.decode(token, secret_key, algorithms=[algorithm])
+        except pyjwt.ExpiredSignatureError:
+            raise TokenExpiredError("Token expired")
+        except pyjwt.InvalidTokenError:
+            raise PermissionError("Invalid token")
     try:
-        payload = jwt.decode(token, secret_key, algorithms=algorithm)
+        return jwt.decode(token, secret_key, algorithms=algorithm)
     except ExpiredSignatureError:   
-        raise PermissionError("Token expired")
+        raise TokenExpiredError("Token expired")
     except JWTError:
         raise PermissionError("Invalid token")
-    user = User(
+    
+def user_from_payload(payload: dict) -> User:
+    return User(
         user_id=payload.get('user_id'), # type: ignore
         username=payload.get('username'), # type: ignore
         is_admin=payload.get('is_admin'), # type: ignore
         email=payload.get('email'), # type: ignore
     )
-    return user
+
+def decode_token(token: str, secret_key: str, algorithm: str="HS256") -> User:
+    return user_from_payload(decode_payload(token, secret_key, algorithm))
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified tokens to their user, so repeated requests skip the JWT verification.
+    
+    Entries expire with the token, and remember the key that verified them so tokens 
+    of a key no longer accepted (rotated twice) are verified again.
+    """
+    
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, tuple[User, float, str]] = OrderedDict()
+        
+    def get(self, token: str) -> tuple[User, str] | None:
+        """The user and verifying key of a cached unexpired token."""
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        user, exp, secret_key = entry
+        if exp <= time.time():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return user, secret_key
+    
+    def set(self, token: str, user: User, exp: float, secret_key: str):
+        self._entries[token] = (user, exp, secret_key)
+        self._entries.move_to_end(token)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            
+            
+verified_token_cache = VerifiedTokenCache()
 
 class AuthService:
 
@@ -70,8 +125,7 @@ class AuthService:
         # Successful login - reset failed attempts
         await self.rate_limiter.reset_attempts(username)
         
-        # get auth config is IO bounded operation, so we run it in a separate thread to avoid blocking the main thread
-        auth_config = (await asyncio.to_thread(get_secret))['auth'] # type: ignore
+        auth_config = secrets_provider.get()['auth']
         access_token = create_access_token(
             user=User(
                 user_id=internal_user.user_id,
@@ -88,14 +142,40 @@ class AuthService:
         
     async def verify_token(self, token: str) -> User:
         # shared by login and reset password process
+        # secrets are held in memory by the provider, no IO on the hot path
+        auth_config = secrets_provider.get()['auth']
+        previous = secrets_provider.get_previous()
+        # token signed before a key rotation stays valid until it expires
+        previous_config = previous['auth'] if previous is not None \
+            and previous['auth']['secret_key'] != auth_config['secret_key'] else None
+        
+        cached = verified_token_cache.get(token)
+        if cached is not None:
+            user, secret_key = cached
+            if secret_key == auth_config['secret_key'] or \
+                    (previous_config is not None and secret_key == previous_config['secret_key']):
+                return user
+        
         try:
-            # get auth config is IO bounded operation, so we run it in a separate thread to avoid blocking the main thread
-            auth_config = (await asyncio.to_thread(get_secret))['auth'] # type: ignore
-            decoded_token = decode_token(
-                token=token,
-                secret_key=auth_config['secret_key'],
-                algorithm=auth_config['algorithm']
-            )
+            try:
+                config = auth_config
+                payload = decode_payload(
+                    token=token,
+                    secret_key=config['secret_key'],
+                    algorithm=config['algorithm']
+                )
+            except TokenExpiredError:
+                raise
+            except PermissionError:
+                if previous_config is None:
+                    raise
+                config = previous_config
+                payload = decode_payload(
+                    token=token,
+                    secret_key=config['secret_key'],
+                    algorithm=config['algorithm']
+                )
+            decoded_token = user_from_payload(payload)
         except ValidationError:
             raise PermissionDeniedError("Cannot parse token")
         except PermissionError as e:
@@ -103,6 +183,8 @@ class AuthService:
                 message=str(e),
                 details=token
             )
+        if 'exp' in payload:
+            verified_token_cache.set(token, decoded_token, exp=float(payload['exp']), secret_key=config['secret_key'])
         return decoded_token
     
     async def request_reset_password(self, email: str):
@@ -114,7 +196,7 @@ class AuthService:
                 details="N/A" # don't pass database info
             )
         
-        auth_config = (await asyncio.to_thread(get_secret))['auth'] # type: ignore
+        auth_config = secrets_provider.get()['auth']
         access_token = create_access_token(
             user=user,
             secret_key=auth_config['secret_key'],
@@ -146,4 +228,4 @@ class AuthService:
             is_admin=user.is_admin,
             password=new_password
         )
-        await self.user_repository.update(updated_user)
\ No newline at end of file
+        await self.user_repository.update(await password_hasher.hashed(updated_user))
\ No newline at end of file
@@ -1,9 +1,8 @@
-import asyncio
 from jinja2 import Environment, FileSystemLoader
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from aiosmtplib import SMTP
-from src.app.utils.secrets import get_secret
+from src.app.utils.secrets import secrets_provider
 from src.app.model.exceptions import UnexpectedError
 
 env = Environment(loader=FileSystemLoader("src/app/service/templates"))
@@ -16,7 +15,7 @@ class EmailService:
         return template.render(**context)
 
     async def send_email(self, to_email: str, subject: str, html_body: str):
-        secret = await asyncio.to_thread(get_secret)
+        secret = secrets_provider.get()
         
         msg = MIMEMultipart("alternative")
         msg["Subject"] = subject
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from typing import Callable
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.app.model.ledger import LedgerChange, LedgerChangeBatch
+from src.app.repository.ledger import LedgerChangeRepository
+from src.app.service.portfolio import net_worth_cache
+
+NET_WORTH_CACHE_CONSUMER = 'net_worth_cache'
+
+class LedgerFeedService:
+    """Read side of the ledger change feed, for consumers recomputing derived data 
+    (snapshots, caches, reports) from the earliest affected date only.
+    
+    Usage: `batch = await poll(consumer)`, apply it, then `await ack(batch)`;
+    a consumer failing before ack reads the same changes again.
+    """
+    
+    def __init__(self, ledger_change_repository: LedgerChangeRepository):
+        self.ledger_change_repository = ledger_change_repository
+        
+    async def poll(self, consumer: str, limit: int = 1000) -> LedgerChangeBatch | None:
+        """Changes after the consumer's offset, None when it is up to date."""
+        offset = await self.ledger_change_repository.get_offset(consumer)
+        changes = await self.ledger_change_repository.list_after(offset, limit=limit)
+        if not changes:
+            return None
+        
+        coalesced: dict[tuple[str, str, str], LedgerChange] = {}
+        for change in changes:
+            key = (change.user_id, change.acct_id, change.prop_id)
+            if key not in coalesced or change.from_dt < coalesced[key].from_dt:
+                coalesced[key] = change
+        return LedgerChangeBatch(
+            consumer=consumer,
+            last_change_id=changes[-1].change_id, # type: ignore
+            changes=list(coalesced.values())
+        )
+        
+    async def ack(self, batch: LedgerChangeBatch):
+        """Mark the batch as applied by its consumer, and drop the changes all consumers have applied."""
+        await self.ledger_change_repository.set_offset(batch.consumer, batch.last_change_id)
+        await self.ledger_change_repository.prune()
+        
+    async def invalidate_net_worth(self, limit: int = 1000):
+        """Consumer dropping the cached net worth of each changed user from the earliest day changed.
+        
+        Runs until the feed is consumed; if redis fails, the batch is left unacknowledged for the next run.
+        """
+        while (batch := await self.poll(NET_WORTH_CACHE_CONSUMER, limit=limit)) is not None:
+            try:
+                for user_id, from_dt in batch.from_dts().items():
+                    await net_worth_cache.invalidate(user_id, from_dt)
+            except RedisError as e:
+                logging.warning(f"Net worth cache invalidation postponed: {e}")
+                return
+            await self.ack(batch)
+
+
+class LedgerFeedWorker:
+    """Runs the ledger feed consumers in the background of a worker process, one drain at a time.
+    
+    Writers only append to the feed and `notify` the worker, so requests never wait on a drain.
+    The feed is drained on its own session when notified, or every interval seconds for the writes 
+    of other processes. Drains of several processes may overlap, which is safe: invalidation is 
+    idempotent and consumer offsets only move forward.
+    """
+    
+    def __init__(self, interval: float = 5):
+        self.interval = interval
+        self._session_maker: Callable[[], AsyncSession] | None = None
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        
+    def notify(self):
+        """Drain soon, called by writers after their commit."""
+        self._wakeup.set()
+        
+    async def drain(self):
+        async with self._session_maker() as session: # type: ignore
+            await LedgerFeedService(LedgerChangeRepository(session)).invalidate_net_worth()
+        
+    async def _drain_forever(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.drain()
+            except Exception as e:
+                # changes stay in the feed, the next drain applies them
+                logging.warning(f"Failed to drain the ledger feed: {e}")
+                
+    async def start(self, session_maker: Callable[[], AsyncSession]):
+        """Drain the feed in the background, run once per worker at startup."""
+        self._session_maker = session_maker
+        if self._task is None:
+            self._task = asyncio.create_task(self._drain_forever())
+            
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            
+            
+ledger_feed_worker = LedgerFeedWorker()
@@ -1,6 +1,7 @@
 import yfinance as yf
 from currency_converter import CurrencyConverter, ECB_URL
 import asyncio
+import logging
 from datetime import date, timedelta
 from yokedcache import cached
 import pandas as pd
@@ -10,7 +11,8 @@ from src.app.model.enums import CurType, PropertyType
 from src.app.model.market import FxRate, FxPoint, YFinancePricePoint
 from src.app.repository.market import FxRepository
 from src.app.model.exceptions import NotExistError
-from src.app.repository.cache import cache
+from redis.exceptions import RedisError
+from src.app.repository.cache import cache, redis_client
 from src.app.utils.cache import deserialize_cached_model
 
 
@@ -102,7 +104,105 @@ class YFinanceWrapper:
         return df[['open', 'high', 'low', 'close', 'adj_close', 'volume', 'stock_splits', 'dividends', 'split_factor']]
 
 
+def download_closes(symbols: list[str], as_of: date, lookback_days: int = 10) -> dict[str, float]:
+    """Last close on or before as_of of many symbols with a single (threaded) yfinance download."""
+    df = yf.download(
+        symbols,
+        start=as_of - timedelta(days=lookback_days), # to avoid holidays
+        end=as_of + timedelta(days=1),
+        interval="1d",
+        auto_adjust=False,
+        progress=False,
+        threads=True,
+    )
+    if df is None or df.empty:
+        return {}
+    closes = df['Close']
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(symbols[0])
+    closes = closes[closes.index.date <= as_of].ffill() # type: ignore
+    if closes.empty:
+        return {}
+    last = closes.iloc[-1]
+    return {symbol: float(close) for symbol, close in last.items() if pd.notna(close)}
+
+
+def download_close_history(symbols: list[str], start_date: date, end_date: date, 
+                           lookback_days: int = 10) -> pd.DataFrame:
+    """Daily closes of many symbols with a single (threaded) yfinance download.
+    
+    Indexed by every day from start_date to end_date, a column per symbol found, 
+    non-trading days are forward filled.
+    """
+    df = yf.download(
+        symbols,
+        start=start_date - timedelta(days=lookback_days), # to avoid holiday at beginning
+        end=end_date + timedelta(days=1),
+        interval="1d",
+        auto_adjust=False,
+        progress=False,
+        threads=True,
+    )
+    all_days = pd.date_range(start=start_date, end=end_date, freq='D').date
+    if df is None or df.empty:
+        return pd.DataFrame(index=all_days)
+    closes = df['Close']
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(symbols[0])
+    closes.index = closes.index.date # type: ignore
+    closes = closes.dropna(axis=1, how='all')
+    # ffill from the lookback days, then keep the requested days only
+    closes = closes.reindex(sorted(set(closes.index) | set(all_days))).ffill()
+    return closes.loc[all_days]
+
+
 class YFinanceService:
+    
+    async def get_close_history(self, symbols: list[str], start_date: date, end_date: date) -> pd.DataFrame:
+        """Daily closes from start_date to end_date (forward filled), a column per symbol found.
+        
+        Download errors are logged and give no columns, callers treat the symbols as unpriced.
+        """
+        if symbols:
+            try:
+                return await asyncio.to_thread(download_close_history, symbols, start_date, end_date)
+            except Exception as e:
+                logging.warning(f"Error downloading close history: {e}")
+        return pd.DataFrame(index=pd.date_range(start=start_date, end=end_date, freq='D').date)
+    
+    async def get_closes(self, symbols: list[str], as_of: date) -> dict[str, float]:
+        """Close price on or before as_of per symbol, missing symbols are absent from the result.
+        
+        Cached per (symbol, date) and read with one MGET, only uncached symbols are downloaded (in one batch).
+        """
+        if not symbols:
+            return {}
+        keys = [f"yfinance_close:{symbol}:{as_of.isoformat()}" for symbol in symbols]
+        try:
+            values = await redis_client.mget(keys)
+        except RedisError as e:
+            logging.warning(f"Close price cache unavailable: {e}")
+            values = [None] * len(symbols)
+        closes = {symbol: float(value) for symbol, value in zip(symbols, values) if value is not None}
+        
+        missing = [symbol for symbol in symbols if symbol not in closes]
+        if missing:
+            try:
+                downloaded = await asyncio.to_thread(download_closes, missing, as_of)
+            except Exception as e:
+                logging.warning(f"Error downloading close prices: {e}")
+                downloaded = {}
+            # closes of past days are final, today's still move
+            ttl = timedelta(minutes=15) if as_of >= date.today() else timedelta(days=7)
+            try:
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    for symbol, close in downloaded.items():
+                        pipe.set(f"yfinance_close:{symbol}:{as_of.isoformat()}", close, ex=int(ttl.total_seconds()))
+                    await pipe.execute()
+            except RedisError as e:
+                logging.warning(f"Close price cache unavailable: {e}")
+            closes.update(downloaded)
+        return closes
         
     @cached(
         cache=cache, 
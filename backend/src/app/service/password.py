@@ -0,0 +1,40 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from src.app.model.user import UserCreate
+from src.app.utils.tools import hash_password
+
+class PasswordHasher:
+    """Hash passwords in a dedicated process pool, so bcrypt never blocks the event loop
+    nor competes with it for the GIL.
+    
+    The pool is created on first use and shut down with the app.
+    """
+    
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self._pool: ProcessPoolExecutor | None = None
+        
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn, as forking a process running an event loop and threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._pool
+    
+    async def hash(self, password: str) -> str:
+        return await asyncio.get_running_loop().run_in_executor(self._get_pool(), hash_password, password)
+    
+    async def hashed(self, user: UserCreate) -> UserCreate:
+        """Copy of the user carrying the hash of its password."""
+        return user.model_copy(update={'hashed_password': await self.hash(user.password)})
+    
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            
+            
+password_hasher = PasswordHasher()
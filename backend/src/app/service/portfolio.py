@@ -0,0 +1,728 @@
+import logging
+from typing import Literal, NamedTuple
+from datetime import date, timedelta
+import numpy as np
+from pydantic import TypeAdapter
+from redis.exceptions import RedisError
+from src.app.model.enums import CurType, LegType
+from src.app.model.exceptions import NotExistError, OpNotPermittedError
+from src.app.model.portfolio import CostBasis, Holding, IncomeExpense, IncomeExpenseSummary, Lot, NetWorthPoint, \
+    NetWorthSeries, Performance, PositionValue, ScopeReturn, Valuation
+from src.app.repository.cache import UserNamespace, redis_client, user_namespaces
+from src.app.repository.market import FxRepository
+from src.app.repository.portfolio import PortfolioRepository, PositionSnapshotRepository
+from src.app.repository.registry import AccountRepository, PropertyRepository
+from src.app.service.market import YFinanceService
+from src.app.utils.cost_basis import compute_cost_basis
+from src.app.utils.returns import time_weighted_returns, xirr
+from src.app.utils.timeseries import date_range, day_index, ffill, period_bounds, period_of, periods_between, scatter
+
+
+class CostBasisCache:
+    """Redis cache of cost basis per account in the user's cache namespace, as recomputing needs the whole trade history.
+    
+    Transaction writers invalidate by bumping the user's namespace generation.
+    """
+    
+    adapter = TypeAdapter(list[CostBasis])
+    
+    def __init__(self, ttl: int = int(timedelta(hours=24).total_seconds())):
+        self.ttl = ttl
+    
+    async def get_many(self, namespace: UserNamespace | None, acct_ids: list[str]) -> dict[str, list[CostBasis]]:
+        if namespace is None or not acct_ids:
+            return {}
+        try:
+            values = await redis_client.mget([namespace.key('cost_basis', acct_id) for acct_id in acct_ids])
+        except RedisError as e:
+            logging.warning(f"Cost basis cache unavailable: {e}")
+            return {}
+        return {
+            acct_id: self.adapter.validate_json(value)
+            for acct_id, value in zip(acct_ids, values)
+            if value is not None
+        }
+        
+    async def set_many(self, namespace: UserNamespace | None, cost_bases: dict[str, list[CostBasis]]):
+        if namespace is None or not cost_bases:
+            return
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for acct_id, cost_basis in cost_bases.items():
+                    pipe.set(namespace.key('cost_basis', acct_id), self.adapter.dump_json(cost_basis), ex=self.ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logging.warning(f"Cost basis cache unavailable: {e}")
+            
+            
+cost_basis_cache = CostBasisCache()
+
+
+class NetWorthCache:
+    """Redis cache of daily net worth per user and report currency, a sorted set of "date|value" scored by date.
+    
+    A day holds one member: writes replace the days of the range they cover. Invalidated by the ledger 
+    feed consumer `LedgerFeedService.invalidate_net_worth` from the earliest date changed, days before stay valid.
+    """
+    
+    def __init__(self, ttl: int = int(timedelta(hours=24).total_seconds())):
+        self.ttl = ttl
+        
+    @staticmethod
+    def _key(user_id: str, report_currency: CurType) -> str:
+        # hash tag keeps the currencies of a user on the same cluster slot
+        return f"net_worth:{{{user_id}}}:{report_currency.name}"
+    
+    async def get_range(self, user_id: str, report_currency: CurType, 
+                        start_dt: date, end_dt: date) -> dict[date, float]:
+        try:
+            members = await redis_client.zrangebyscore(
+                self._key(user_id, report_currency), 
+                start_dt.toordinal(), 
+                end_dt.toordinal()
+            )
+        except RedisError as e:
+            logging.warning(f"Net worth cache unavailable: {e}")
+            return {}
+        points = {}
+        for member in members:
+            cur_dt, net_worth = member.split('|')
+            points[date.fromisoformat(cur_dt)] = float(net_worth)
+        return points
+    
+    async def set_many(self, user_id: str, report_currency: CurType, points: list[NetWorthPoint]):
+        """Replace the cached days between the first and last point by the points."""
+        if not points:
+            return
+        key = self._key(user_id, report_currency)
+        try:
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.zremrangebyscore(
+                    key, 
+                    min(point.cur_dt for point in points).toordinal(), 
+                    max(point.cur_dt for point in points).toordinal()
+                )
+                pipe.zadd(key, {f"{point.cur_dt.isoformat()}|{point.net_worth}": point.cur_dt.toordinal() for point in points})
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logging.warning(f"Net worth cache unavailable: {e}")
+            
+    async def invalidate(self, user_id: str, from_dt: date):
+        """Drop the days from from_dt on in all report currencies, raises RedisError so the caller can retry."""
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for report_currency in CurType:
+                pipe.zremrangebyscore(self._key(user_id, report_currency), from_dt.toordinal(), '+inf')
+            await pipe.execute()
+            
+            
+net_worth_cache = NetWorthCache()
+
+
+class PerformanceCache:
+    """Redis cache of returns in the user's cache namespace, so ledger writes need no explicit invalidation.
+    
+    Nothing invalidates an entry when close prices move or fill in later, so ranges ending today or later 
+    are kept open_ttl only, and closed historical ranges ttl.
+    """
+    
+    def __init__(self, ttl: int = int(timedelta(hours=24).total_seconds()), 
+                 open_ttl: int = int(timedelta(minutes=15).total_seconds())):
+        self.ttl = ttl
+        self.open_ttl = open_ttl
+        
+    def ttl_of(self, performance: Performance) -> int:
+        return self.open_ttl if performance.end_dt >= date.today() else self.ttl
+    
+    @staticmethod
+    def _key(namespace: UserNamespace, start_dt: date, end_dt: date, report_currency: CurType) -> str:
+        return namespace.key('performance', report_currency.name, start_dt.isoformat(), end_dt.isoformat())
+    
+    async def get(self, namespace: UserNamespace | None, start_dt: date, end_dt: date, 
+                  report_currency: CurType) -> Performance | None:
+        if namespace is None:
+            return None
+        try:
+            value = await redis_client.get(self._key(namespace, start_dt, end_dt, report_currency))
+        except RedisError as e:
+            logging.warning(f"Performance cache unavailable: {e}")
+            return None
+        return Performance.model_validate_json(value) if value is not None else None
+    
+    async def set(self, namespace: UserNamespace | None, performance: Performance):
+        if namespace is None:
+            return
+        try:
+            await redis_client.set(
+                self._key(namespace, performance.start_dt, performance.end_dt, performance.report_currency),
+                performance.model_dump_json(),
+                ex=self.ttl_of(performance)
+            )
+        except RedisError as e:
+            logging.warning(f"Performance cache unavailable: {e}")
+            
+            
+performance_cache = PerformanceCache()
+
+
+class IncomeExpenseCache:
+    """Redis cache of income and expense totals of closed periods, a hash per (user, period) with a field per report currency.
+    
+    Transaction writers must call `invalidate` with the transaction dates they touched.
+    """
+    
+    adapter = TypeAdapter(list[IncomeExpense])
+    
+    def __init__(self, ttl: int = int(timedelta(days=7).total_seconds())):
+        self.ttl = ttl
+        
+    @staticmethod
+    def _key(user_id: str, period: str) -> str:
+        return f"income_expense:{user_id}:{period}"
+    
+    async def get_many(self, user_id: str, report_currency: CurType, 
+                       periods: list[str]) -> dict[str, list[IncomeExpense]]:
+        if not periods:
+            return {}
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for period in periods:
+                    pipe.hget(self._key(user_id, period), report_currency.name)
+                values = await pipe.execute()
+        except RedisError as e:
+            logging.warning(f"Income expense cache unavailable: {e}")
+            return {}
+        return {
+            period: self.adapter.validate_json(value)
+            for period, value in zip(periods, values)
+            if value is not None
+        }
+        
+    async def set_many(self, user_id: str, report_currency: CurType, items: dict[str, list[IncomeExpense]]):
+        if not items:
+            return
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for period, period_items in items.items():
+                    pipe.hset(self._key(user_id, period), report_currency.name, self.adapter.dump_json(period_items))
+                    pipe.expire(self._key(user_id, period), self.ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logging.warning(f"Income expense cache unavailable: {e}")
+            
+    async def invalidate(self, user_id: str, dts: list[date]):
+        """Drop the months and years containing the dates, in all report currencies."""
+        periods = {period_of(dt, period_type) for dt in dts for period_type in ('month', 'year')}
+        if not periods:
+            return
+        try:
+            await redis_client.delete(*[self._key(user_id, period) for period in periods])
+        except RedisError as e:
+            logging.warning(f"Income expense cache unavailable: {e}")
+            
+            
+income_expense_cache = IncomeExpenseCache()
+
+
+def cost_basis_from_trades(trades: list) -> list[CostBasis]:
+    """Compute cost basis of every position from `PortfolioRepository.get_trades` rows.
+    
+    Fees of a transaction go into the cost of its buy, otherwise reduce the proceeds of its sell.
+    """
+    if not trades:
+        return []
+    acct_ids, prop_ids, trans_dts, buy_qty, buy_amount, sell_qty, sell_amount, fee = zip(*trades)
+    buy_qty, buy_amount, sell_qty, sell_amount, fee = (
+        np.asarray(x, dtype=float) 
+        for x in (buy_qty, buy_amount, sell_qty, sell_amount, fee)
+    )
+    
+    # split each row into a buy event and/or a sell event, buy first within a transaction
+    has_buy = buy_qty > 0
+    has_sell = sell_qty > 0
+    rows = np.concatenate((np.flatnonzero(has_buy), np.flatnonzero(has_sell)))
+    is_buy = np.concatenate((np.ones(has_buy.sum(), bool), np.zeros(has_sell.sum(), bool)))
+    order = np.argsort(rows * 2 + ~is_buy, kind='stable')
+    rows, is_buy = rows[order], is_buy[order]
+    qty = np.where(is_buy, buy_qty[rows], sell_qty[rows])
+    amount = np.where(
+        is_buy, 
+        buy_amount[rows] + fee[rows], 
+        sell_amount[rows] - np.where(has_buy[rows], 0.0, fee[rows])
+    )
+    
+    # events are grouped by position, as rows are ordered by (acct_id, prop_id)
+    acct_ids, prop_ids = np.asarray(acct_ids, dtype=object), np.asarray(prop_ids, dtype=object)
+    new_position = np.concatenate(([True], (acct_ids[1:] != acct_ids[:-1]) | (prop_ids[1:] != prop_ids[:-1])))
+    position = np.cumsum(new_position)[rows]
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(position)) + 1, [len(rows)]))
+    cost_bases = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        result = compute_cost_basis(is_buy[start:end], qty[start:end], amount[start:end])
+        lot_idx = np.flatnonzero(result.remaining > 0)
+        acct_id, prop_id = acct_ids[rows[start]], prop_ids[rows[start]]
+        cost_bases.append(
+            CostBasis(
+                acct_id=acct_id,
+                prop_id=prop_id,
+                quantity=round(result.quantity, 5),
+                acb=round(result.acb, 2),
+                avg_cost=round(result.acb / result.quantity, 5) if result.quantity > 0 else 0.0,
+                realized_gain_avg=round(result.realized_avg, 2),
+                fifo_cost=round(result.fifo_cost, 2),
+                realized_gain_fifo=round(result.realized_fifo, 2),
+                lots=[
+                    Lot(
+                        trans_dt=trans_dts[rows[start + i]],
+                        quantity=round(float(result.remaining[i]), 5),
+                        unit_cost=round(float(amount[start + i] / qty[start + i]), 5)
+                    ) for i in lot_idx
+                ]
+            )
+        )
+    return cost_bases
+
+
+class PositionValues(NamedTuple):
+    days: list[date]
+    positions: list[tuple[str, str]] # (acct_id, prop_id) of each column
+    value: np.ndarray # (days x positions) end of day value in the report currency
+    to_report: np.ndarray # (days x positions) FX factor from the property currency to the report currency
+    unpriced: np.ndarray # (days x positions) held without a market price (private: without any price)
+    symbols: list[str] # symbol of each column
+    
+    def missing_prices(self) -> list[str]:
+        """Symbols held without a market price on some day."""
+        return sorted({self.symbols[i] for i in np.flatnonzero(self.unpriced.any(axis=0))})
+
+
+class PortfolioService:
+    
+    def __init__(
+        self, 
+        portfolio_repository: PortfolioRepository,
+        position_snapshot_repository: PositionSnapshotRepository,
+        property_repository: PropertyRepository,
+        account_repository: AccountRepository,
+        fx_repository: FxRepository,
+        yfinance_service: YFinanceService,
+    ):
+        self.portfolio_repository = portfolio_repository
+        self.position_snapshot_repository = position_snapshot_repository
+        self.property_repository = property_repository
+        self.account_repository = account_repository
+        self.fx_repository = fx_repository
+        self.yfinance_service = yfinance_service
+        
+    async def get_holdings(self, user_id: str, acct_id: str | None = None, 
+                           include_closed: bool = False, as_of: date | None = None) -> list[Holding]:
+        """Current holdings from the ledger, or historical holdings as of a date from the snapshots."""
+        if as_of is not None:
+            return await self.position_snapshot_repository.get_holdings_as_of(
+                user_id,
+                as_of,
+                acct_id=acct_id,
+                include_closed=include_closed
+            )
+        return await self.portfolio_repository.get_holdings(
+            user_id, 
+            acct_id=acct_id, 
+            include_closed=include_closed
+        )
+        
+    async def get_cost_basis(self, user_id: str, acct_id: str | None = None) -> list[CostBasis]:
+        """FIFO and average cost basis of every position, cached per account."""
+        if acct_id is not None:
+            acct_ids = [acct_id]
+        else:
+            acct_ids = await self.portfolio_repository.get_acct_ids(user_id)
+        namespace = await user_namespaces.get(user_id)
+        found = await cost_basis_cache.get_many(namespace, acct_ids)
+        missing = [acct_id for acct_id in acct_ids if acct_id not in found]
+        if missing:
+            # one query and one pass for all accounts not cached
+            computed = {acct_id: [] for acct_id in missing}
+            trades = await self.portfolio_repository.get_trades(user_id, missing)
+            for cost_basis in cost_basis_from_trades(trades):
+                computed[cost_basis.acct_id].append(cost_basis)
+            await cost_basis_cache.set_many(namespace, computed)
+            found.update(computed)
+        return [cost_basis for acct_id in acct_ids for cost_basis in found[acct_id]]
+    
+    async def get_valuation(self, user_id: str, as_of: date, report_currency: CurType) -> Valuation:
+        """Market value of all positions held at the end of as_of, in the report currency.
+        
+        Every input is fetched in one batch: holdings, properties, closes (one download for 
+        all uncached symbols), last trade prices for the rest, and FX rates of all currencies.
+        Positions without any price are left out of the totals and listed in `missing_prices`.
+        """
+        holdings = await self.position_snapshot_repository.get_holdings_as_of(user_id, as_of)
+        prop_ids = list({holding.prop_id for holding in holdings})
+        properties = {p.prop_id: p for p in await self.property_repository.gets(prop_ids)}
+        
+        # market close for public properties, last trade price of the user otherwise
+        closes = await self.yfinance_service.get_closes(
+            list({p.symbol for p in properties.values() if p.is_public and not p.is_cash_prop}), 
+            as_of
+        )
+        unpriced = [
+            p.prop_id for p in properties.values() 
+            if not p.is_cash_prop and p.symbol not in closes
+        ]
+        last_prices = await self.portfolio_repository.get_last_prices(user_id, unpriced, as_of)
+        
+        fxs = await self.fx_repository.get_fx_as_of(as_of)
+        missing_fx = {properties[h.prop_id].currency for h in holdings} | {report_currency}
+        missing_fx = [currency.name for currency in missing_fx if currency not in fxs]
+        if missing_fx:
+            raise NotExistError(
+                f"FX rates of {', '.join(missing_fx)} not available as of {as_of}",
+                details="N/A"
+            )
+            
+        positions = []
+        prices = []
+        for holding in holdings:
+            property = properties[holding.prop_id]
+            if property.is_cash_prop:
+                price, source = 1.0, 'cash'
+            elif property.symbol in closes:
+                price, source = closes[property.symbol], 'market'
+            elif property.prop_id in last_prices:
+                price, source = last_prices[property.prop_id], 'last_trade'
+            else:
+                price, source = None, 'none'
+            prices.append(price)
+            positions.append((holding, property, source))
+        
+        # value all positions at once, fx rates are quoted per 100 EUR
+        quantity = np.array([holding.quantity for holding, _, _ in positions], dtype=float)
+        price = np.array([np.nan if p is None else p for p in prices], dtype=float)
+        fx = np.array([fxs[property.currency] for _, property, _ in positions], dtype=float)
+        # unpriced positions count as 0 in the totals, and are reported as missing
+        market_value = np.nan_to_num(quantity * price)
+        report_value = market_value * fxs[report_currency] / fx
+        
+        def _totals(keys: list[str]) -> dict[str, float]:
+            if not keys:
+                return {}
+            labels, inverse = np.unique(np.asarray(keys, dtype=object), return_inverse=True)
+            sums = np.bincount(inverse, weights=report_value, minlength=len(labels))
+            return {str(label): round(float(value), 2) for label, value in zip(labels, sums)}
+        
+        return Valuation(
+            as_of=as_of,
+            report_currency=report_currency,
+            total=round(float(report_value.sum()), 2),
+            by_account=_totals([holding.acct_id for holding, _, _ in positions]),
+            by_prop_type=_totals([property.prop_type.name for _, property, _ in positions]),
+            by_currency=_totals([property.currency.name for _, property, _ in positions]),
+            positions=[
+                PositionValue(
+                    acct_id=holding.acct_id,
+                    prop_id=holding.prop_id,
+                    symbol=property.symbol,
+                    prop_type=property.prop_type,
+                    currency=property.currency,
+                    quantity=holding.quantity,
+                    price=prices[i],
+                    price_source=source,
+                    market_value=round(float(market_value[i]), 2),
+                    report_value=round(float(report_value[i]), 2)
+                ) for i, (holding, property, source) in enumerate(positions)
+            ],
+            missing_prices=sorted({property.symbol for _, property, source in positions if source == 'none'})
+        )
+
+        
+    async def get_net_worth(self, user_id: str, start_dt: date, end_dt: date, 
+                            report_currency: CurType) -> NetWorthSeries:
+        """Daily net worth in the report currency, cached per user for closed and priced days.
+        
+        Days without a price are not cached, so the cached days may have gaps: the days from 
+        the first missing one are computed again, and replace the cached ones.
+        """
+        if start_dt > end_dt:
+            raise OpNotPermittedError(
+                f"Start date {start_dt} must not be after end date {end_dt}",
+                details="N/A"
+            )
+        days = date_range(start_dt, end_dt)
+        cached = await net_worth_cache.get_range(user_id, report_currency, start_dt, end_dt)
+        points = {dt: NetWorthPoint(cur_dt=dt, net_worth=net_worth) for dt, net_worth in cached.items()}
+        missing_prices = []
+        first_missing = next((dt for dt in days if dt not in points), None)
+        if first_missing is not None:
+            computed, missing_prices = await self._compute_net_worth(user_id, first_missing, end_dt, report_currency)
+            # prices of today still move, days without a price are retried next time
+            await net_worth_cache.set_many(
+                user_id, 
+                report_currency, 
+                [point for point in computed if point.cur_dt < date.today() and point.priced]
+            )
+            points.update({point.cur_dt: point for point in computed})
+        return NetWorthSeries(
+            report_currency=report_currency,
+            points=[points[dt] for dt in days],
+            missing_prices=missing_prices
+        )
+    
+    async def get_performance(self, user_id: str, start_dt: date, end_dt: date, 
+                              report_currency: CurType) -> Performance:
+        """Time-weighted and money-weighted returns overall, per plan type and per account.
+        
+        Values come from the daily position values, cash flows from the legs (cf_direction * amount), 
+        all scopes are solved at once as columns of the same matrices.
+        """
+        if start_dt > end_dt:
+            raise OpNotPermittedError(
+                f"Start date {start_dt} must not be after end date {end_dt}",
+                details="N/A"
+            )
+        namespace = await user_namespaces.get(user_id)
+        performance = await performance_cache.get(namespace, start_dt, end_dt, report_currency)
+        if performance is not None:
+            return performance
+        
+        position_values = await self._position_values(user_id, start_dt, end_dt, report_currency)
+        days, positions = position_values.days, position_values.positions
+        
+        # cash flows (days x positions) in the report currency, flows on start_dt are in its value
+        position_idx = {position: i for i, position in enumerate(positions)}
+        flows = [
+            row for row in await self.portfolio_repository.get_cash_flows(user_id, start_dt, end_dt)
+            if (row.acct_id, row.prop_id) in position_idx
+        ]
+        cash_flow = np.zeros((len(days), len(positions)))
+        if flows:
+            rows = day_index([row.trans_dt for row in flows], start_dt)
+            cols = np.array([position_idx[(row.acct_id, row.prop_id)] for row in flows])
+            amounts = np.array([row.cash_flow for row in flows], dtype=float)
+            np.add.at(cash_flow, (rows, cols), amounts * position_values.to_report[rows, cols])
+        
+        # scopes as a (positions x scopes) membership matrix
+        plan_types = {account.acct_id: account.plan_type for account in await self.account_repository.get_by_user_id(user_id)}
+        position_accts = np.array([acct_id for acct_id, _ in positions], dtype=object)
+        position_plans = np.array([plan_types.get(acct_id) for acct_id, _ in positions], dtype=object)
+        scopes = [('overall', 'ALL', np.ones(len(positions), dtype=bool))]
+        scopes += [
+            ('plan_type', plan_type.name, position_plans == plan_type)
+            for plan_type in sorted({p for p in position_plans if p is not None})
+        ]
+        scopes += [
+            ('account', acct_id, position_accts == acct_id)
+            for acct_id in sorted(set(position_accts))
+        ]
+        membership = np.column_stack([members for _, _, members in scopes]).astype(float)
+        values = position_values.value @ membership
+        cash_flows = cash_flow @ membership
+        
+        twr = time_weighted_returns(values, cash_flows)
+        # money-weighted: buy the start value, get the end value back
+        irr_flows = cash_flows.copy()
+        irr_flows[0] -= values[0]
+        irr_flows[-1] += values[-1]
+        irr = xirr(irr_flows, np.arange(len(days)) / 365.25)
+        # no returns on values of unpriced days
+        unpriced = (position_values.unpriced.any(axis=0).astype(float) @ membership) > 0
+        
+        performance = Performance(
+            start_dt=start_dt,
+            end_dt=end_dt,
+            report_currency=report_currency,
+            returns=[
+                ScopeReturn(
+                    scope=scope, # type: ignore
+                    key=key,
+                    start_value=round(float(values[0, i]), 2),
+                    end_value=round(float(values[-1, i]), 2),
+                    net_contribution=round(float(-cash_flows[1:, i].sum()), 2),
+                    twr=None if unpriced[i] else round(float(twr[i]), 6),
+                    irr=None if unpriced[i] or np.isnan(irr[i]) else round(float(irr[i]), 6)
+                ) for i, (scope, key, _) in enumerate(scopes)
+            ],
+            missing_prices=position_values.missing_prices()
+        )
+        if not performance.missing_prices:
+            # prices may be back next time
+            await performance_cache.set(namespace, performance)
+        return performance
+    
+    async def _compute_net_worth(self, user_id: str, start_dt: date, end_dt: date, 
+                                 report_currency: CurType) -> tuple[list[NetWorthPoint], list[str]]:
+        """Daily net worth, and the symbols held without a market price."""
+        position_values = await self._position_values(user_id, start_dt, end_dt, report_currency)
+        net_worth = position_values.value.sum(axis=1)
+        priced = ~position_values.unpriced.any(axis=1)
+        points = [
+            NetWorthPoint(cur_dt=dt, net_worth=round(float(v), 2), priced=bool(p)) 
+            for dt, v, p in zip(position_values.days, net_worth, priced)
+        ]
+        return points, position_values.missing_prices()
+        
+    async def get_income_expenses(self, user_id: str, start_dt: date, end_dt: date, 
+                                  period_type: Literal['month', 'year'], 
+                                  report_currency: CurType) -> IncomeExpenseSummary:
+        """Income and expense totals per period, account and leg type, for whole periods overlapping the range.
+        
+        Closed periods are cached, so usually only the current period is queried.
+        """
+        if start_dt > end_dt:
+            raise OpNotPermittedError(
+                f"Start date {start_dt} must not be after end date {end_dt}",
+                details="N/A"
+            )
+        periods = periods_between(start_dt, end_dt, period_type)
+        found = await income_expense_cache.get_many(user_id, report_currency, periods)
+        missing = [period for period in periods if period not in found]
+        if missing:
+            # one query from the first to the last missing period
+            computed = await self._compute_income_expenses(
+                user_id, 
+                period_bounds(missing[0])[0], 
+                period_bounds(missing[-1])[1], 
+                period_type, 
+                report_currency
+            )
+            computed = {period: computed.get(period, []) for period in missing}
+            await income_expense_cache.set_many(
+                user_id, 
+                report_currency,
+                {period: items for period, items in computed.items() if period_bounds(period)[1] < date.today()}
+            )
+            found.update(computed)
+        return IncomeExpenseSummary(
+            period_type=period_type,
+            report_currency=report_currency,
+            items=[item for period in periods for item in found[period]]
+        )
+        
+    async def _compute_income_expenses(self, user_id: str, start_dt: date, end_dt: date, 
+                                       period_type: Literal['month', 'year'], 
+                                       report_currency: CurType) -> dict[str, list[IncomeExpense]]:
+        rows = await self.portfolio_repository.get_income_expenses(user_id, start_dt, end_dt)
+        if not rows:
+            return {}
+        
+        # convert at the rate of each transaction date, one FX query for the whole range
+        currencies = sorted({row.currency for row in rows}, key=lambda c: c.name)
+        currency_idx = {currency: i for i, currency in enumerate(currencies)}
+        to_report = await self._fx_to_report(start_dt, end_dt, currencies, report_currency)
+        amounts = np.array([row.amount for row in rows], dtype=float) * to_report[
+            day_index([row.trans_dt for row in rows], start_dt),
+            [currency_idx[row.currency] for row in rows]
+        ]
+        
+        # sum into (period, acct_id, leg_type) buckets
+        keys = [(period_of(row.trans_dt, period_type), row.acct_id, LegType(row.leg_type)) for row in rows]
+        buckets = sorted(set(keys))
+        bucket_idx = {bucket: i for i, bucket in enumerate(buckets)}
+        totals = np.bincount([bucket_idx[key] for key in keys], weights=amounts, minlength=len(buckets))
+        items = {}
+        for (period, acct_id, leg_type), total in zip(buckets, totals):
+            items.setdefault(period, []).append(
+                IncomeExpense(period=period, acct_id=acct_id, leg_type=leg_type, amount=round(float(total), 2))
+            )
+        return items
+        
+    async def _fx_to_report(self, start_dt: date, end_dt: date, currencies: list[CurType], 
+                            report_currency: CurType) -> np.ndarray:
+        """(days x currencies) factor converting each currency to the report currency, forward filled."""
+        # fx matrix (days x currencies), rates are quoted per 100 EUR
+        distinct = sorted(set(currencies) | {report_currency}, key=lambda c: c.name)
+        currency_idx = {currency: i for i, currency in enumerate(distinct)}
+        fx_rates = [
+            fx_rate for fx_rate in await self.fx_repository.get_fx_between(start_dt, end_dt) 
+            if fx_rate.currency in currency_idx
+        ]
+        fx = ffill(scatter(
+            (end_dt - start_dt).days + 1,
+            len(distinct),
+            day_index([fx_rate.cur_dt for fx_rate in fx_rates], start_dt),
+            np.array([currency_idx[fx_rate.currency] for fx_rate in fx_rates], dtype=np.int64),
+            np.array([fx_rate.rate for fx_rate in fx_rates], dtype=float)
+        ))
+        missing_fx = [currency.name for currency in distinct if np.isnan(fx[:, currency_idx[currency]]).any()]
+        if missing_fx:
+            raise NotExistError(
+                f"FX rates of {', '.join(missing_fx)} not available from {start_dt}",
+                details="N/A"
+            )
+        return fx[:, [currency_idx[report_currency]]] / fx[:, [currency_idx[currency] for currency in currencies]]
+        
+    async def _position_values(self, user_id: str, start_dt: date, end_dt: date, 
+                               report_currency: CurType) -> PositionValues:
+        # value = quantity * price * fx, each a (days x ...) matrix
+        days = date_range(start_dt, end_dt)
+        n_days = len(days)
+        rows = await self.position_snapshot_repository.get_quantity_series(user_id, start_dt, end_dt)
+        if not rows:
+            return PositionValues(
+                days, [], np.zeros((n_days, 0)), np.zeros((n_days, 0)), np.zeros((n_days, 0), dtype=bool), []
+            )
+        
+        # quantity matrix (days x positions), forward filled between snapshots
+        acct_ids, prop_ids, snap_dts, quantities = zip(*rows)
+        positions = sorted(set(zip(acct_ids, prop_ids)))
+        position_idx = {position: i for i, position in enumerate(positions)}
+        quantity = np.nan_to_num(ffill(scatter(
+            n_days, 
+            len(positions),
+            day_index(list(snap_dts), start_dt),
+            np.array([position_idx[position] for position in zip(acct_ids, prop_ids)]),
+            np.array(quantities, dtype=float)
+        )))
+        
+        props = sorted({prop_id for _, prop_id in positions})
+        prop_idx = {prop_id: i for i, prop_id in enumerate(props)}
+        properties = {p.prop_id: p for p in await self.property_repository.gets(props)}
+        
+        # price matrix (days x properties): market close, else the user's last trade price, 1 for cash
+        traded = [prop_id for prop_id in props if not properties[prop_id].is_cash_prop]
+        closes = await self.yfinance_service.get_close_history(
+            sorted({properties[prop_id].symbol for prop_id in traded if properties[prop_id].is_public}),
+            start_dt,
+            end_dt
+        )
+        base_prices = await self.portfolio_repository.get_last_prices(user_id, traded, start_dt)
+        trade_prices = [(prop_id, start_dt, price) for prop_id, price in base_prices.items()]
+        trade_prices += await self.portfolio_repository.get_trade_prices(user_id, traded, start_dt, end_dt)
+        price = np.full((n_days, len(props)), np.nan)
+        if trade_prices:
+            price = ffill(scatter(
+                n_days,
+                len(props),
+                day_index([trans_dt for _, trans_dt, _ in trade_prices], start_dt),
+                np.array([prop_idx[prop_id] for prop_id, _, _ in trade_prices]),
+                np.array([p for _, _, p in trade_prices], dtype=float)
+            ))
+        # days a property has no market price (no price at all for private ones), e.g., download failed
+        no_market = np.zeros((n_days, len(props)), dtype=bool)
+        for prop_id in traded:
+            symbol = properties[prop_id].symbol
+            if symbol in closes.columns:
+                market = closes[symbol].to_numpy(dtype=float)
+                price[:, prop_idx[prop_id]] = np.where(np.isnan(market), price[:, prop_idx[prop_id]], market)
+                no_market[:, prop_idx[prop_id]] = np.isnan(market)
+            elif properties[prop_id].is_public:
+                no_market[:, prop_idx[prop_id]] = True
+            else:
+                no_market[:, prop_idx[prop_id]] = np.isnan(price[:, prop_idx[prop_id]])
+        for prop_id in props:
+            if properties[prop_id].is_cash_prop:
+                price[:, prop_idx[prop_id]] = 1.0
+        
+        to_report = await self._fx_to_report(
+            start_dt, 
+            end_dt, 
+            [properties[prop_id].currency for prop_id in props], 
+            report_currency
+        )
+        
+        # value per position, properties broadcast onto positions
+        position_prop = [prop_idx[prop_id] for _, prop_id in positions]
+        to_report = to_report[:, position_prop]
+        value = np.nan_to_num(quantity * price[:, position_prop] * to_report)
+        unpriced = no_market[:, position_prop] & (quantity != 0)
+        symbols = [properties[prop_id].symbol for _, prop_id in positions]
+        return PositionValues(days, positions, value, to_report, unpriced, symbols)
@@ -1,16 +1,140 @@
 import asyncio
+import json
+import logging
 from datetime import timedelta
-from yokedcache import cached
+from typing import Any, BinaryIO
+from pydantic import TypeAdapter
+from redis.exceptions import RedisError
 from src.app.service.market import YFinanceService
 from src.app.repository.registry import PropertyRepository, PrivatePropOwnershipRepository, \
     AccountRepository
-from src.app.model.registry import Property, PrivatePropOwnership, Account
-from src.app.model.enums import CurType, PropertyType
+from src.app.model.registry import Property, PrivatePropOwnership, Account, FacetCount, \
+    PropertyBrowsePage
+from src.app.model.enums import CurType, PropertyType, ImportFormat, ImportStatus
 from src.app.model.exceptions import AlreadyExistError, NotExistError, OpNotPermittedError, \
-    FKNoDeleteUpdateError, PermissionDeniedError
+    FKNoDeleteUpdateError, FKNotExistError, PermissionDeniedError
 from src.app.model.market import PublicPropInfo
-from src.app.repository.cache import cache
-from src.app.utils.cache import deserialize_cached_model
+from src.app.model.imports import ImportResult, ImportRowResult
+from src.app.repository.cache import UserNamespace, redis_client, user_namespaces
+from src.app.utils.cache import LRUCache
+from src.app.utils.stream import RawRecord, iter_record_batches
+from src.app.utils.tools import id_generator
+
+
+class PropertyCache:
+    """Read-through cache of public property records.
+    
+    Two levels: a per-process LRU (short ttl, as other workers cannot invalidate it)
+    in front of redis. Records are keyed by prop_id, and symbol keys point to the prop_id.
+    Writers must call `invalidate` explicitly after any change to a public property.
+    """
+    
+    def __init__(self, lru_maxsize: int = 4096, lru_ttl: int = 60, 
+                 redis_ttl: int = int(timedelta(hours=24).total_seconds())):
+        self.lru = LRUCache(maxsize=lru_maxsize, ttl=lru_ttl)
+        self.redis_ttl = redis_ttl
+        
+    @staticmethod
+    def _id_key(prop_id: str) -> str:
+        return f"property:id:{prop_id}"
+    
+    @staticmethod
+    def _symbol_key(symbol: str) -> str:
+        return f"property:symbol:{symbol}"
+    
+    async def get_many(self, prop_ids: list[str]) -> dict[str, Property]:
+        """Get cached properties, missing ones are simply absent from the result."""
+        found = {}
+        remote_ids = []
+        for prop_id in prop_ids:
+            property = self.lru.get(self._id_key(prop_id))
+            if property is None:
+                remote_ids.append(prop_id)
+            else:
+                found[prop_id] = property
+        
+        if remote_ids:
+            try:
+                # one MGET round trip for all keys missing locally
+                values = await redis_client.mget([self._id_key(prop_id) for prop_id in remote_ids])
+            except RedisError as e:
+                logging.warning(f"Property cache unavailable: {e}")
+                values = [None] * len(remote_ids)
+            for prop_id, value in zip(remote_ids, values):
+                if value is not None:
+                    property = Property.model_validate_json(value)
+                    self.lru.set(self._id_key(prop_id), property)
+                    found[prop_id] = property
+        return found
+    
+    async def get(self, prop_id: str) -> Property | None:
+        return (await self.get_many([prop_id])).get(prop_id)
+    
+    async def get_id_by_symbol(self, symbol: str) -> str | None:
+        prop_id = self.lru.get(self._symbol_key(symbol))
+        if prop_id is None:
+            try:
+                prop_id = await redis_client.get(self._symbol_key(symbol))
+            except RedisError as e:
+                logging.warning(f"Property cache unavailable: {e}")
+                return None
+            if prop_id is not None:
+                self.lru.set(self._symbol_key(symbol), prop_id)
+        return prop_id
+    
+    async def set_many(self, properties: list[Property]):
+        if not properties:
+            return
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for property in properties:
+                    pipe.set(self._id_key(property.prop_id), property.model_dump_json(), ex=self.redis_ttl)
+                    pipe.set(self._symbol_key(property.symbol), property.prop_id, ex=self.redis_ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logging.warning(f"Property cache unavailable: {e}")
+        for property in properties:
+            self.lru.set(self._id_key(property.prop_id), property)
+            self.lru.set(self._symbol_key(property.symbol), property.prop_id)
+            
+    async def invalidate(self, prop_ids: list[str] | None = None, symbols: list[str] | None = None):
+        keys = [self._id_key(prop_id) for prop_id in prop_ids or []] + \
+            [self._symbol_key(symbol) for symbol in symbols or []]
+        if not keys:
+            return
+        for key in keys:
+            self.lru.delete(key)
+        try:
+            await redis_client.delete(*keys)
+        except RedisError as e:
+            logging.warning(f"Property cache unavailable: {e}")
+            
+            
+property_cache = PropertyCache()
+
+
+def property_from_record(data: dict[str, Any], is_public: bool) -> Property:
+    """Build property from an imported CSV/NDJSON record.
+    
+    Enums can be given by name (e.g., USD, STOCK) or value, custom_props as JSON string or object.
+    Private properties get a generated symbol if not given.
+    """
+    data = {k: v for k, v in data.items() if k in Property.model_fields and k != 'prop_id'}
+    for field, enum_class in (('prop_type', PropertyType), ('currency', CurType)):
+        value = data.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+            data[field] = int(value) if value.isdigit() else enum_class[value.upper()]
+    if isinstance(data.get('custom_props'), str):
+        data['custom_props'] = json.loads(data['custom_props'])
+    data.setdefault('custom_props', None)
+    data['custom_props'] = data['custom_props'] or {}
+    data.setdefault('description', None)
+    if not is_public and not data.get('symbol'):
+        data['symbol'] = id_generator(prefix='priv-', length=8)
+    data['is_public'] = is_public
+    return Property.model_validate(data)
+
 
 class RegistryService:
     
@@ -35,6 +159,9 @@ class RegistryService:
                         f"Property {property} already exist",
                         details="N/A" # don't pass database info
                     )
+            else:
+                # symbol may still point to a previously delisted property
+                await property_cache.invalidate(symbols=[property.symbol])
         else:
             raise OpNotPermittedError(f"Property {property} is not public")
     
@@ -45,16 +172,30 @@ class RegistryService:
             if not property.is_public:
                 raise OpNotPermittedError(f"Property {property} is not public")
         
+        if allow_exist:
+            # only insert not yet registered symbols, so existing ones do not fail the whole batch
+            existing = await self.property_repository.get_existing_by_symbols(
+                [property.symbol for property in properties]
+            )
+            properties = list({
+                property.symbol: property for property in properties 
+                if property.symbol not in existing
+            }.values())
+            if not properties:
+                return
+        
         try:
             await self.property_repository.adds(properties)
         except AlreadyExistError as e:
             if allow_exist:
-                pass # allow exist
+                pass # allow exist (registered concurrently)
             else:
                 raise AlreadyExistError(
                     f"Some properties already exist",
                     details="N/A" # don't pass database info
                 )
+        else:
+            await property_cache.invalidate(symbols=[property.symbol for property in properties])
             
     async def register_yfinance_property(self, symbol: str):
         if not await self.yfinance_service.exists(symbol):
@@ -77,9 +218,9 @@ class RegistryService:
         await self.register_public_properties(properties, allow_exist=True)
         
     async def register_cash_properties(self):
-        # only execute once when startup
-        for cur in CurType:
-            property = Property(
+        # executed once at startup (app lifespan), idempotent
+        properties = [
+            Property(
                 symbol=cur.name,
                 name=cur.name,
                 prop_type=PropertyType.CASH,
@@ -88,9 +229,111 @@ class RegistryService:
                 is_public=True,
                 description=f"Cash property for {cur.name}",
                 custom_props={},
-            )
-            await self.register_public_property(property, allow_exist=True)
+            ) for cur in CurType
+        ]
+        # one query to find existing cash properties, one upsert for the missing ones
+        existing = await self.property_repository.get_existing_by_symbols(
+            [property.symbol for property in properties]
+        )
+        missing = [property for property in properties if property.symbol not in existing]
+        if missing:
+            # tolerates another worker inserting the same rows concurrently
+            await self.property_repository.adds_if_not_exist(missing)
+            await property_cache.invalidate(symbols=[property.symbol for property in missing])
+    
+        
+    async def import_properties(self, file: BinaryIO, fmt: ImportFormat, 
+                                user_id: str | None = None, batch_size: int = 500) -> ImportResult:
+        """Stream import property definitions from CSV/NDJSON, upserted by symbol in chunks.
+        
+        Args:
+            file (BinaryIO): the uploaded file, read incrementally.
+            fmt (ImportFormat): the file format.
+            user_id (str | None): None to import public properties (admin only), 
+                otherwise private properties owned by this user.
+            batch_size (int): number of rows validated and written per transaction.
+        """
+        result = ImportResult()
+        async for batch in iter_record_batches(file, fmt, batch_size=batch_size):
+            for row_result in await self._import_property_batch(batch, user_id):
+                result.add(row_result)
+        return result
     
+    async def _import_property_batch(self, batch: list[RawRecord], user_id: str | None) -> list[ImportRowResult]:
+        is_public = user_id is None
+        row_results: dict[int, ImportRowResult] = {}
+        parsed: dict[str, tuple[int, Property]] = {} # symbol -> (row, property), last row wins
+        
+        for record in batch:
+            if record.error is not None:
+                row_results[record.row] = ImportRowResult(
+                    row=record.row, status=ImportStatus.FAILED, message=record.error
+                )
+                continue
+            try:
+                property = property_from_record(record.data, is_public=is_public) # type: ignore
+            except (ValueError, KeyError) as e:
+                row_results[record.row] = ImportRowResult(
+                    row=record.row, key=record.data.get('symbol'), # type: ignore
+                    status=ImportStatus.FAILED, message=f"Invalid property: {e}"
+                )
+                continue
+            if property.is_public != is_public:
+                row_results[record.row] = ImportRowResult(
+                    row=record.row, key=property.symbol, status=ImportStatus.FAILED,
+                    message=f"Property of type {property.prop_type.name} cannot be imported here"
+                )
+                continue
+            if property.symbol in parsed:
+                prev_row = parsed[property.symbol][0]
+                row_results[prev_row] = ImportRowResult(
+                    row=prev_row, key=property.symbol, status=ImportStatus.SKIPPED,
+                    message=f"Superseded by row {record.row}"
+                )
+            parsed[property.symbol] = (record.row, property)
+        
+        # one lookup for the whole batch to decide insert vs update
+        existing = await self.property_repository.get_existing_by_symbols(list(parsed))
+        new_properties: list[tuple[int, Property]] = []
+        existing_properties: list[tuple[int, Property]] = []
+        for symbol, (row, property) in parsed.items():
+            if symbol not in existing:
+                new_properties.append((row, property))
+                continue
+            prop_id, existing_is_public, owner_id = existing[symbol]
+            if existing_is_public != is_public or (not is_public and owner_id != user_id):
+                row_results[row] = ImportRowResult(
+                    row=row, key=symbol, status=ImportStatus.FAILED,
+                    message=f"Symbol {symbol} is already registered by others"
+                )
+                continue
+            # keep the stored id, prop_id is frozen so copy instead of assign
+            existing_properties.append((row, property.model_copy(update={'prop_id': prop_id})))
+        
+        try:
+            await self.property_repository.upserts(
+                new_properties=[property for _, property in new_properties],
+                existing_properties=[property for _, property in existing_properties],
+                owner_id=user_id
+            )
+        except (AlreadyExistError, FKNotExistError) as e:
+            # e.g., symbol registered concurrently, reject the chunk rather than guess
+            for row, property in new_properties + existing_properties:
+                row_results[row] = ImportRowResult(
+                    row=row, key=property.symbol, status=ImportStatus.FAILED,
+                    message="Batch rejected by database, please retry"
+                )
+        else:
+            for row, property in new_properties:
+                row_results[row] = ImportRowResult(row=row, key=property.symbol, status=ImportStatus.INSERTED)
+            for row, property in existing_properties:
+                row_results[row] = ImportRowResult(row=row, key=property.symbol, status=ImportStatus.UPDATED)
+            if is_public:
+                await property_cache.invalidate(
+                    prop_ids=[property.prop_id for _, property in existing_properties],
+                    symbols=[property.symbol for _, property in new_properties + existing_properties]
+                )
+        return [row_results[row] for row in sorted(row_results)]
         
     async def register_private_property(self, property: Property, user_id: str):
         if not property.is_public:
@@ -117,7 +360,7 @@ class RegistryService:
 
     async def delist_public_property(self, prop_id: str):
         # make sure the property is public and exists
-        property = await self.get_public_property.get(prop_id)
+        property = await self.get_public_property(prop_id)
         try:
             await self.property_repository.remove(prop_id)
         except NotExistError as e:
@@ -130,6 +373,7 @@ class RegistryService:
                 f"Property {prop_id} is associated with other data, cannot delete",
                 details=e.details
             )
+        await property_cache.invalidate(prop_ids=[prop_id], symbols=[property.symbol])
             
     async def delist_private_property(self, prop_id: str, user_id: str):
         # make sure the property is private and exists
@@ -189,6 +433,7 @@ class RegistryService:
             raise FKNoDeleteUpdateError(
                 f"Property {property.prop_id} is associated with other data, cannot update", details=e.details
             )
+        await property_cache.invalidate(prop_ids=[property.prop_id], symbols=[property.symbol])
             
     async def update_private_property(self, property: Property, user_id: str):
         # make sure the property is private and exists
@@ -221,6 +466,10 @@ class RegistryService:
         
         
     async def get_public_property(self, prop_id: str) -> Property:
+        property = await property_cache.get(prop_id)
+        if property is not None:
+            return property
+        
         try:
             property = await self.property_repository.get(prop_id)
         except NotExistError as e:
@@ -230,34 +479,67 @@ class RegistryService:
             )
         else:
             if property.is_public:
+                await property_cache.set_many([property])
                 return property
             else:
                 raise OpNotPermittedError(f"Property {prop_id} is private")
+            
+    async def get_public_property_by_symbol(self, symbol: str) -> Property:
+        prop_id = await property_cache.get_id_by_symbol(symbol)
+        if prop_id is not None:
+            property = await property_cache.get(prop_id)
+            if property is not None:
+                return property
+        
+        try:
+            property = await self.property_repository.get_by_symbol(symbol)
+        except NotExistError as e:
+            raise NotExistError(
+                f"Property {symbol} does not exist",
+                details="N/A" # don't pass database info
+            )
+        if not property.is_public:
+            raise OpNotPermittedError(f"Property {symbol} is private")
+        await property_cache.set_many([property])
+        return property
+        
+    async def get_public_properties(self, prop_ids: list[str]) -> list[Property]:
+        """Batch get public properties, missing/private ones are skipped. Order follows prop_ids."""
+        found = await property_cache.get_many(prop_ids)
+        missing_ids = [prop_id for prop_id in prop_ids if prop_id not in found]
+        if missing_ids:
+            # one query for all cache misses
+            properties = [
+                property for property in await self.property_repository.gets(missing_ids)
+                if property.is_public
+            ]
+            await property_cache.set_many(properties)
+            found.update({property.prop_id: property for property in properties})
+        return [found[prop_id] for prop_id in dict.fromkeys(prop_ids) if prop_id in found]
                 
+    def check_private_ownership(self, property: Property, owner_id: str | None, user_id: str) -> Property:
+        """Make sure the property is private and owned by the given user."""
+        if property.is_public:
+            raise OpNotPermittedError(f"Property {property.prop_id} is public")
+        if owner_id is None:
+            raise NotExistError(
+                f"Property {property.prop_id} is not owned by user {user_id}",
+                details="N/A" # don't pass database info
+            )
+        if owner_id != user_id:
+            raise OpNotPermittedError(f"Property {property.prop_id} is not owned by user {user_id}")
+        return property
+
     async def get_private_property(self, prop_id: str, user_id: str) -> Property:
+        # property and its ownership are fetched in one joined query
         try:
-            property = await self.property_repository.get(prop_id)
+            property, owner_id = await self.property_repository.get_with_owner(prop_id)
         except NotExistError as e:
             raise NotExistError(
                 f"Property {prop_id} does not exist",
                 details="N/A" # don't pass database info
             )
-        else:
-            if property.is_public:
-                raise OpNotPermittedError(f"Property {prop_id} is public")
-            else:
-                try:
-                    ownership = await self.private_prop_ownership_repository.get_by_prop_id(prop_id)
-                except NotExistError as e:
-                    raise NotExistError(
-                        f"Property {prop_id} is not owned by user {user_id}",
-                        details="N/A" # don't pass database info
-                    )
-                    
-                if ownership.user_id == user_id:
-                    return property
-                else:
-                    raise OpNotPermittedError(f"Property {prop_id} is not owned by user {user_id}")
+        return self.check_private_ownership(property, owner_id, user_id)
                 
     async def list_private_properties(self, user_id: str) -> list[Property]:
         private_prop_ownerships = await self.private_prop_ownership_repository.list_by_user(user_id)
@@ -268,6 +550,35 @@ class RegistryService:
     async def blurry_search_public(self, keyword: str, limit: int = 10) -> list[Property]:
         return await self.property_repository.blurry_search_public(keyword, limit)
     
+    async def browse_public(self, filters: dict[str, list], after: str | None = None, 
+                            limit: int = 50) -> PropertyBrowsePage:
+        """Browse public properties with multi-facet filters and keyset pagination.
+        
+        Args:
+            filters (dict[str, list]): facet -> accepted values, e.g., {'sector': ['Technology']}.
+            after (str | None): `next_after` of the previous page.
+            limit (int): page size.
+        """
+        items = await self.property_repository.browse_public(filters, after_symbol=after, limit=limit)
+        counts = await self.property_repository.facet_counts_public(filters)
+        
+        facets: dict[str, list[FacetCount]] = {}
+        for facet, value, count in counts:
+            # enum facets are stored as integer, show their name instead
+            if value is not None and facet == 'prop_type':
+                value = PropertyType(int(value)).name
+            elif value is not None and facet == 'currency':
+                value = CurType(int(value)).name
+            facets.setdefault(facet, []).append(FacetCount(value=value, count=count))
+        for values in facets.values():
+            values.sort(key=lambda c: c.count, reverse=True)
+            
+        return PropertyBrowsePage(
+            items=items,
+            facets=facets,
+            next_after=items[-1].symbol if len(items) == limit else None
+        )
+    
     async def blurry_search_yfinance(self, keyword: str, limit: int = 10) -> list[PublicPropInfo]:
         properties = await self.blurry_search_public(keyword, limit)
         infos = [PublicPropInfo.from_property(property) for property in properties]
@@ -276,6 +587,54 @@ class RegistryService:
         # )
         return infos
     
+class AccountCache:
+    """Redis cache of a user's accounts and account list, in the user's cache namespace.
+    
+    Writers invalidate by bumping the user's namespace generation.
+    """
+    
+    adapter = TypeAdapter(list[Account])
+    
+    def __init__(self, ttl: int = int(timedelta(hours=24).total_seconds())):
+        self.ttl = ttl
+        
+    async def _get(self, key: str) -> str | None:
+        try:
+            return await redis_client.get(key)
+        except RedisError as e:
+            logging.warning(f"Account cache unavailable: {e}")
+            return None
+        
+    async def _set(self, key: str, value: str | bytes):
+        try:
+            await redis_client.set(key, value, ex=self.ttl)
+        except RedisError as e:
+            logging.warning(f"Account cache unavailable: {e}")
+    
+    async def get(self, namespace: UserNamespace | None, acct_id: str) -> Account | None:
+        if namespace is None:
+            return None
+        value = await self._get(namespace.key('account', acct_id))
+        return Account.model_validate_json(value) if value is not None else None
+    
+    async def set(self, namespace: UserNamespace | None, account: Account):
+        if namespace is not None:
+            await self._set(namespace.key('account', account.acct_id), account.model_dump_json())
+        
+    async def get_list(self, namespace: UserNamespace | None) -> list[Account] | None:
+        if namespace is None:
+            return None
+        value = await self._get(namespace.key('accounts'))
+        return self.adapter.validate_json(value) if value is not None else None
+    
+    async def set_list(self, namespace: UserNamespace | None, accounts: list[Account]):
+        if namespace is not None:
+            await self._set(namespace.key('accounts'), self.adapter.dump_json(accounts))
+        
+        
+account_cache = AccountCache()
+
+    
 class AccountService:
     
     def __init__(self, account_repository: AccountRepository):
@@ -290,7 +649,7 @@ class AccountService:
         try:
             await self.account_repository.add(account)
             # Invalidate cache after successful creation - only for this user
-            await cache.delete(f"accounts_{user_id}")
+            await user_namespaces.bump(user_id)
         except AlreadyExistError as e:
             raise AlreadyExistError(
                 f"Account {account.acct_name} already exist",
@@ -303,8 +662,7 @@ class AccountService:
         try:
             await self.account_repository.remove(acct_id)
             # Clear cache after successful deletion - only for this user
-            await cache.delete(f"account_{acct_id}_{user_id}")
-            await cache.delete(f"accounts_{user_id}")
+            await user_namespaces.bump(user_id)
         except FKNoDeleteUpdateError as e:
             raise FKNoDeleteUpdateError(
                 f"Account {acct_id} is associated with other data, cannot delete",
@@ -324,8 +682,7 @@ class AccountService:
         try:
             await self.account_repository.update(account)
             # Invalidate cache after successful update - only for this user
-            await cache.delete(f"account_{account.acct_id}_{user_id}")
-            await cache.delete(f"accounts_{user_id}")
+            await user_namespaces.bump(user_id)
         except NotExistError as e:
             raise NotExistError(
                 f"Account {account.acct_name} does not exist",
@@ -338,28 +695,24 @@ class AccountService:
             )
             
             
-    @deserialize_cached_model(Account)
-    @cached(
-        cache=cache, 
-        key_builder=lambda self, acct_id, user_id: f"account_{acct_id}_{user_id}", 
-        ttl=int(timedelta(hours=24).total_seconds()),
-        tags=['user_accounts']
-    )
     async def get_account(self, acct_id: str, user_id: str) -> Account:
+        namespace = await user_namespaces.get(user_id)
+        existing_account = await account_cache.get(namespace, acct_id)
+        if existing_account is not None:
+            return existing_account
         existing_account = await self.account_repository.get(acct_id)
         if existing_account.user_id != user_id:
             raise OpNotPermittedError(
                 f"Account user ID {existing_account.user_id} must be the same as the user ID {user_id}",
                 details="N/A" # don't pass database info
             )
+        await account_cache.set(namespace, existing_account)
         return existing_account
     
-    @deserialize_cached_model(Account)
-    @cached(
-        cache=cache, 
-        key_builder=lambda self, user_id: f"accounts_{user_id}", 
-        ttl=int(timedelta(hours=24).total_seconds()),
-        tags=['user_accounts']
-    )
     async def list_accounts(self, user_id: str) -> list[Account]:
-        return await self.account_repository.get_by_user_id(user_id)
\ No newline at end of file
+        namespace = await user_namespaces.get(user_id)
+        accounts = await account_cache.get_list(namespace)
+        if accounts is None:
+            accounts = await self.account_repository.get_by_user_id(user_id)
+            await account_cache.set_list(namespace, accounts)
+        return accounts
\ No newline at end of file
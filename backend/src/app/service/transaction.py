@@ -1,11 +1,142 @@
-from datetime import timedelta
-from yokedcache import cached
-from src.app.model.transaction import Leg, LegCreate
+import logging
+from datetime import date, timedelta
+from typing import Any, AsyncIterator, BinaryIO, NamedTuple
+from redis.exceptions import RedisError
+from src.app.model.enums import ImportFormat, ImportStatus, LegType
+from src.app.model.imports import ImportResult, ImportRowResult
+from src.app.model.transaction import Leg, LegCreate, TransactionWOLegs
+from src.app.repository.ledger import LedgerChangeRepository
+from src.app.repository.portfolio import PositionSnapshotRepository
+from src.app.repository.registry import AccountRepository, PropertyRepository
 from src.app.repository.transaction import TransactionBodyRepository, LegRepository
-from src.app.model.transaction import TransactionCreate, Transaction
+from src.app.repository.uow import UnitOfWork
+from src.app.model.transaction import TransactionCreate, Transaction, TransactionPage
 from src.app.model.exceptions import OpNotPermittedError, AlreadyExistError, FKNotExistError, NotExistError, FKNoDeleteUpdateError
-from src.app.repository.cache import cache
-from src.app.utils.cache import deserialize_cached_model
+from src.app.repository.cache import UserNamespace, redis_client, user_namespaces
+from src.app.service.ledger import ledger_feed_worker
+from src.app.service.portfolio import income_expense_cache
+from src.app.utils.stream import RawRecord, format_records, iter_record_batches
+
+
+class TransactionCache:
+    """Read-through redis cache of transactions with legs, in the owner's cache namespace.
+    
+    Keys include the owner user_id, so a record is only served to its owner.
+    Writers invalidate by bumping the owner's namespace generation.
+    """
+    
+    def __init__(self, ttl: int = int(timedelta(hours=24).total_seconds())):
+        self.ttl = ttl
+    
+    async def get_many(self, namespace: UserNamespace | None, trans_ids: list[str]) -> dict[str, Transaction]:
+        """Get cached transactions in one MGET, missing ones are absent from the result."""
+        if namespace is None or not trans_ids:
+            return {}
+        try:
+            values = await redis_client.mget([namespace.key('transaction', trans_id) for trans_id in trans_ids])
+        except RedisError as e:
+            logging.warning(f"Transaction cache unavailable: {e}")
+            return {}
+        return {
+            trans_id: Transaction.model_validate_json(value)
+            for trans_id, value in zip(trans_ids, values)
+            if value is not None
+        }
+    
+    async def set_many(self, namespace: UserNamespace | None, transactions: list[Transaction]):
+        if namespace is None or not transactions:
+            return
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for transaction in transactions:
+                    pipe.set(namespace.key('transaction', transaction.trans_id), transaction.model_dump_json(), ex=self.ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logging.warning(f"Transaction cache unavailable: {e}")
+            
+            
+transaction_cache = TransactionCache()
+
+
+class LegRecord(NamedTuple):
+    """One leg of an imported broker statement, accounts and properties not resolved yet."""
+    trans_ref: str | None # rows with the same consecutive reference form one transaction
+    trans_dt: date
+    description: str
+    leg_type: LegType
+    account: str # account ID or name
+    symbol: str
+    quantity: float
+    price: float
+    
+def trans_ref_of(data: dict[str, Any] | None) -> str | None:
+    """Transaction reference of an imported record, blank is no reference."""
+    trans_ref = (data or {}).get('trans_ref')
+    if trans_ref is None:
+        return None
+    return str(trans_ref).strip() or None
+
+def leg_record_from(data: dict[str, Any]) -> LegRecord:
+    """Build leg record from an imported CSV/NDJSON record, leg type can be given by name or value."""
+    leg_type = data['leg_type']
+    if isinstance(leg_type, str):
+        leg_type = leg_type.strip()
+        leg_type = int(leg_type) if leg_type.isdigit() else LegType[leg_type.upper()]
+    return LegRecord(
+        trans_ref=trans_ref_of(data),
+        trans_dt=date.fromisoformat(str(data['trans_dt'])[:10]),
+        description=data.get('description') or '',
+        leg_type=LegType(leg_type),
+        account=str(data['account']),
+        symbol=str(data['symbol']),
+        quantity=float(data['quantity']),
+        price=float(data['price']),
+    )
+    
+EXPORT_COLUMNS = list(LegRecord._fields)
+    
+class ParsedLeg(NamedTuple):
+    """An imported row, grouped into transactions by its reference even if it failed to parse."""
+    row: int
+    trans_ref: str | None
+    leg: LegRecord | None # None if the row failed to parse
+    error: str | None
+
+def parse_leg_records(records: list[RawRecord]) -> list[ParsedLeg]:
+    parsed = []
+    for record in records:
+        trans_ref = trans_ref_of(record.data)
+        if record.error is not None:
+            parsed.append(ParsedLeg(record.row, trans_ref, None, record.error))
+            continue
+        try:
+            parsed.append(ParsedLeg(record.row, trans_ref, leg_record_from(record.data), None)) # type: ignore
+        except (ValueError, KeyError, TypeError) as e:
+            parsed.append(ParsedLeg(record.row, trans_ref, None, f"Invalid leg: {e!r}"))
+    return parsed
+
+def group_leg_records(parsed: list[ParsedLeg]) -> list[list[ParsedLeg]]:
+    """Group consecutive legs sharing a transaction reference, legs without one are single transactions.
+    
+    Rows that failed to parse keep their place in the group, so the whole transaction is rejected.
+    """
+    groups: list[list[ParsedLeg]] = []
+    last_ref = None
+    for item in parsed:
+        if item.trans_ref is not None and item.trans_ref == last_ref:
+            groups[-1].append(item)
+        else:
+            groups.append([item])
+        last_ref = item.trans_ref
+    return groups
+
+def _reject_oversized(items: list[ParsedLeg], max_legs: int) -> list[ImportRowResult]:
+    return [
+        ImportRowResult(
+            row=item.row, status=ImportStatus.FAILED, 
+            message=f"Transaction {item.trans_ref} has more than {max_legs} legs"
+        ) for item in items
+    ]
 
 class TransactionService:
     
@@ -13,9 +144,30 @@ class TransactionService:
         self, 
         transaction_body_repository: TransactionBodyRepository, 
         leg_repository: LegRepository,
+        account_repository: AccountRepository,
+        property_repository: PropertyRepository,
+        position_snapshot_repository: PositionSnapshotRepository,
+        ledger_change_repository: LedgerChangeRepository,
+        unit_of_work: UnitOfWork,
     ):
         self.transaction_body_repository = transaction_body_repository
         self.leg_repository = leg_repository
+        self.account_repository = account_repository
+        self.property_repository = property_repository
+        self.position_snapshot_repository = position_snapshot_repository
+        self.ledger_change_repository = ledger_change_repository
+        self.unit_of_work = unit_of_work
+        
+    async def _invalidate_caches(self, user_id: str, trans_dts: list[date]):
+        """Invalidate caches derived from the user's ledger, after a committed write.
+        
+        One INCR of the user's cache namespace drops all of them, except the income/expense cache 
+        which drops the periods of the dates touched, and the net worth cache which is invalidated 
+        in the background by its ledger feed consumer, from the earliest date changed.
+        """
+        await user_namespaces.bump(user_id)
+        await income_expense_cache.invalidate(user_id, trans_dts)
+        ledger_feed_worker.notify()
         
     async def add_transaction(self, transaction: TransactionCreate, user_id: str):
         if transaction.user_id != user_id:
@@ -24,119 +176,351 @@ class TransactionService:
                 details="N/A" # don't pass database info
             )
         
-        # add transaction body first
-        try:
-            await self.transaction_body_repository.add(
-                transaction.to_transaction_wolgs()
-            )
-        except AlreadyExistError as e:
-            raise AlreadyExistError(
-                f"Transaction {transaction.trans_id} already exist",
-                details="N/A" # don't pass database info
+        # convert legs to Leg objects
+        legs = [
+            Leg(
+                trans_id=transaction.trans_id,
+                user_id=user_id,
+                **leg.model_dump()
+            ) for leg in transaction.legs
+        ]
+        
+        # body and legs are committed together, or not at all
+        async with self.unit_of_work.begin(during_creation=True):
+            # add transaction body first
+            try:
+                await self.transaction_body_repository.add(
+                    transaction.to_transaction_wolgs()
+                )
+            except AlreadyExistError as e:
+                raise AlreadyExistError(
+                    f"Transaction {transaction.trans_id} already exist",
+                    details="N/A" # don't pass database info
+                )
+            except FKNotExistError as e:
+                raise FKNotExistError(
+                    f"User {user_id} does not exist",
+                    details="N/A" # don't pass database info
+                )
+                
+            # add legs
+            try:
+                await self.leg_repository.adds(legs)
+            except AlreadyExistError as e:
+                raise AlreadyExistError(
+                    f"Some legs already exist",
+                    details="N/A" # don't pass database info
+                )
+            except FKNotExistError as e:
+                raise FKNotExistError(
+                    f"Some accounts or properties do not exist",
+                    details=str(e) # don't pass database info
+                )
+                
+            await self.position_snapshot_repository.refresh(
+                user_id, 
+                positions={(leg.acct_id, leg.prop_id) for leg in legs}, 
+                from_dt=transaction.trans_dt
             )
-        except FKNotExistError as e:
-            raise FKNotExistError(
-                f"User {user_id} does not exist",
-                details="N/A" # don't pass database info
+            await self.ledger_change_repository.record(
+                user_id, 
+                {(leg.acct_id, leg.prop_id): transaction.trans_dt for leg in legs}
             )
             
-        # add legs
-        try:
-            # convert legs to Leg objects
-            legs = [
+        await self._invalidate_caches(user_id, [transaction.trans_dt])
+
+    async def import_transactions(self, file: BinaryIO, fmt: ImportFormat, user_id: str, 
+                                  batch_size: int = 500, max_legs: int = 1000) -> ImportResult:
+        """Stream import broker statement legs from CSV/NDJSON, one row per leg.
+        
+        Columns: trans_ref (optional), trans_dt, description (optional), leg_type, 
+        account (ID or name), symbol, quantity, price. Consecutive rows with the same trans_ref
+        make one transaction, which is imported entirely or not at all.
+        
+        Args:
+            file (BinaryIO): the uploaded file, read incrementally.
+            fmt (ImportFormat): the file format.
+            user_id (str): the user importing the transactions.
+            batch_size (int): number of rows resolved and written per database transaction.
+            max_legs (int): transactions with more legs are rejected, without holding them in memory.
+        """
+        # accounts of a user are few, resolve them once
+        user_accounts = await self.account_repository.get_by_user_id(user_id)
+        accounts = {account.acct_name: account.acct_id for account in user_accounts}
+        accounts.update({account.acct_id: account.acct_id for account in user_accounts})
+        
+        result = ImportResult()
+        carry: list[ParsedLeg] = []
+        oversized_ref = None # reference of the transaction being rejected for its size
+        async for batch in iter_record_batches(file, fmt, batch_size=batch_size):
+            parsed = parse_leg_records(batch)
+            if oversized_ref is not None:
+                # rest of the oversized transaction, rejected as it comes
+                end = next((i for i, item in enumerate(parsed) if item.trans_ref != oversized_ref), len(parsed))
+                for row_result in _reject_oversized(parsed[:end], max_legs):
+                    result.add(row_result)
+                if end < len(parsed):
+                    oversized_ref = None
+                parsed = parsed[end:]
+            groups = group_leg_records(carry + parsed)
+            # last transaction may continue in the next batch
+            carry = groups.pop() if groups else []
+            if len(carry) > max_legs:
+                for row_result in _reject_oversized(carry, max_legs):
+                    result.add(row_result)
+                oversized_ref, carry = carry[-1].trans_ref, []
+            for row_result in await self._import_transaction_batch(groups, accounts, user_id, max_legs):
+                result.add(row_result)
+        if carry:
+            for row_result in await self._import_transaction_batch([carry], accounts, user_id, max_legs):
+                result.add(row_result)
+        return result
+    
+    async def _import_transaction_batch(self, groups: list[list[ParsedLeg]], accounts: dict[str, str], 
+                                        user_id: str, max_legs: int) -> list[ImportRowResult]:
+        row_results: dict[int, ImportRowResult] = {}
+        
+        # one lookup for all properties of the batch, only public or owned ones are usable
+        symbols = {item.leg.symbol for group in groups for item in group if item.leg is not None}
+        existing = await self.property_repository.get_existing_by_symbols(list(symbols))
+        prop_ids = {
+            symbol: prop_id 
+            for symbol, (prop_id, is_public, owner_id) in existing.items() 
+            if is_public or owner_id == user_id
+        }
+        
+        transactions: list[TransactionWOLegs] = []
+        legs: list[Leg] = []
+        imported: list[tuple[list[int], str]] = [] # (rows, trans_id)
+        for group in groups:
+            if len(group) > max_legs:
+                row_results.update((row_result.row, row_result) for row_result in _reject_oversized(group, max_legs))
+                continue
+            errors = {}
+            for row, _, leg, error in group:
+                if leg is not None and leg.account not in accounts:
+                    error = f"Account {leg.account} does not exist"
+                elif leg is not None and leg.symbol not in prop_ids:
+                    error = f"Property {leg.symbol} does not exist"
+                if error is not None:
+                    errors[row] = error
+            if errors:
+                for row, _, _, _ in group:
+                    row_results[row] = ImportRowResult(
+                        row=row, status=ImportStatus.FAILED,
+                        message=errors.get(row, "Other legs of the transaction are invalid")
+                    )
+                continue
+            
+            first: LegRecord = group[0].leg # type: ignore
+            transaction = TransactionWOLegs(
+                user_id=user_id,
+                trans_dt=first.trans_dt,
+                description=first.description
+            )
+            transactions.append(transaction)
+            legs.extend(
                 Leg(
                     trans_id=transaction.trans_id,
                     user_id=user_id,
-                    **leg.model_dump()
-                ) for leg in transaction.legs
-            ]
-            await self.leg_repository.adds(legs)
-        except AlreadyExistError as e:
-            raise AlreadyExistError(
-                f"Some legs already exist",
-                details="N/A" # don't pass database info
-            )
-        except FKNotExistError as e:
-            raise FKNotExistError(
-                f"Some accounts or properties do not exist",
-                details=str(e) # don't pass database info
+                    leg_type=leg.leg_type,
+                    acct_id=accounts[leg.account],
+                    prop_id=prop_ids[leg.symbol],
+                    quantity=leg.quantity,
+                    price=leg.price
+                ) for _, _, leg, _ in group # type: ignore
             )
+            imported.append(([item.row for item in group], transaction.trans_id))
+        
+        if transactions:
+            trans_dts = {transaction.trans_id: transaction.trans_dt for transaction in transactions}
+            from_dts: dict[tuple[str, str], date] = {}
+            for leg in legs:
+                position = (leg.acct_id, leg.prop_id)
+                from_dts[position] = min(from_dts.get(position, trans_dts[leg.trans_id]), trans_dts[leg.trans_id])
+            try:
+                async with self.unit_of_work.begin(during_creation=True):
+                    await self.transaction_body_repository.adds(transactions)
+                    await self.leg_repository.adds(legs)
+                    await self.position_snapshot_repository.refresh(
+                        user_id,
+                        positions={(leg.acct_id, leg.prop_id) for leg in legs},
+                        from_dt=min(transaction.trans_dt for transaction in transactions)
+                    )
+                    await self.ledger_change_repository.record(user_id, from_dts)
+            except (AlreadyExistError, FKNotExistError, FKNoDeleteUpdateError) as e:
+                # e.g., property delisted concurrently, reject the chunk rather than guess
+                for rows, trans_id in imported:
+                    for row in rows:
+                        row_results[row] = ImportRowResult(
+                            row=row, key=trans_id, status=ImportStatus.FAILED,
+                            message="Batch rejected by database, please retry"
+                        )
+            else:
+                await self._invalidate_caches(user_id, [transaction.trans_dt for transaction in transactions])
+                for rows, trans_id in imported:
+                    for row in rows:
+                        row_results[row] = ImportRowResult(
+                            row=row, key=trans_id, status=ImportStatus.INSERTED
+                        )
+        return [row_results[row] for row in sorted(row_results)]
 
-    @deserialize_cached_model(Transaction)
-    @cached(
-        cache=cache, 
-        key_builder=lambda self, trans_id, user_id: f"transaction_{trans_id}_{user_id}", 
-        ttl=int(timedelta(hours=24).total_seconds()),
-        tags=['user_transactions']
-    )
     async def get_transaction(self, trans_id: str, user_id: str) -> Transaction:
-        try:
-            transaction_wolgs = await self.transaction_body_repository.get(trans_id)
-        except NotExistError as e:
-            raise NotExistError(
-                f"Transaction {trans_id} does not exist",
-                details="N/A" # don't pass database info
-            )
+        return (await self.get_transactions([trans_id], user_id))[0]
+    
+    async def get_transactions(self, trans_ids: list[str], user_id: str) -> list[Transaction]:
+        """Get many transactions with one cache MGET and one joined query for the cache misses.
+
+        Returns:
+            list[Transaction]: in the same order as trans_ids.
+        """
+        trans_ids = list(dict.fromkeys(trans_ids)) # dedup, keep order
+        namespace = await user_namespaces.get(user_id)
+        found = await transaction_cache.get_many(namespace, trans_ids)
+        missing = [trans_id for trans_id in trans_ids if trans_id not in found]
+        if missing:
+            loaded = await self.transaction_body_repository.gets_with_legs(missing)
+            for trans_id in missing:
+                if trans_id not in loaded:
+                    raise NotExistError(
+                        f"Transaction {trans_id} does not exist",
+                        details="N/A" # don't pass database info
+                    )
+                if loaded[trans_id].user_id != user_id:
+                    raise OpNotPermittedError(
+                        f"Transaction user ID {loaded[trans_id].user_id} must be the same as the user ID {user_id}",
+                        details="N/A" # don't pass database info
+                    )
+            await transaction_cache.set_many(namespace, list(loaded.values()))
+            found.update(loaded)
+        return [found[trans_id] for trans_id in trans_ids]
         
-        if transaction_wolgs.user_id != user_id:
-            raise OpNotPermittedError(
-                f"Transaction user ID {transaction_wolgs.user_id} must be the same as the user ID {user_id}",
-                details=str(e) # don't pass database info
-            )
-            
-        try:
-            legs = await self.leg_repository.get_by_trans_id(trans_id)
-        except NotExistError as e:
-            raise NotExistError(
-                f"Transaction {trans_id} does not exist",
-                details="N/A" # don't pass database info
-            )
-        return Transaction(
-            trans_id=transaction_wolgs.trans_id,
-            user_id=transaction_wolgs.user_id,
-            trans_dt=transaction_wolgs.trans_dt,
-            description=transaction_wolgs.description,
-            legs=legs
-        )
+    async def export_transactions(
+        self,
+        user_id: str,
+        fmt: ImportFormat,
+        start_dt: date | None = None,
+        end_dt: date | None = None,
+        chunk_size: int = 1000
+    ) -> AsyncIterator[str]:
+        """Stream the user's ledger as CSV (with header) or NDJSON, one row per leg, oldest first.
+        
+        The output has the import columns, so it can be imported back with `import_transactions`.
+        Each chunk of rows read from the database is formatted and yielded at once.
+        """
+        yield format_records([], fmt, columns=EXPORT_COLUMNS, header=True)
+        async for records in self.transaction_body_repository.stream_legs(
+            user_id, start_dt=start_dt, end_dt=end_dt, chunk_size=chunk_size
+        ):
+            yield format_records(records, fmt, columns=EXPORT_COLUMNS)
+        
+    async def list_transactions(
+        self, 
+        user_id: str,
+        start_dt: date | None = None,
+        end_dt: date | None = None,
+        acct_id: str | None = None,
+        prop_id: str | None = None,
+        leg_type: LegType | None = None,
+        after: str | None = None,
+        limit: int = 100
+    ) -> TransactionPage:
+        """List transactions of a user with their legs, latest first.
         
+        Args:
+            after (str | None): the `next_after` cursor returned by the previous page.
+        """
+        cursor = None
+        if after is not None:
+            try:
+                after_dt, after_id = after.split('|', 1)
+                cursor = (date.fromisoformat(after_dt), after_id)
+            except ValueError:
+                raise OpNotPermittedError(
+                    f"Invalid pagination cursor {after}",
+                    details="N/A"
+                )
+        
+        transactions = await self.transaction_body_repository.list_by_user_id(
+            user_id,
+            start_dt=start_dt,
+            end_dt=end_dt,
+            acct_id=acct_id,
+            prop_id=prop_id,
+            leg_type=leg_type,
+            after=cursor,
+            limit=limit
+        )
+        legs = await self.leg_repository.get_by_trans_ids(
+            [transaction.trans_id for transaction in transactions]
+        )
+        items = [
+            Transaction(
+                **transaction.model_dump(),
+                legs=legs[transaction.trans_id]
+            ) for transaction in transactions
+        ]
+        next_after = None
+        if len(transactions) == limit:
+            last = transactions[-1]
+            next_after = f"{last.trans_dt.isoformat()}|{last.trans_id}"
+        return TransactionPage(items=items, next_after=next_after)
         
     async def remove_transaction(self, trans_id: str, user_id: str):
-        # verify transaction exists and belongs to the user
-        transaction_wolgs = await self.transaction_body_repository.get(trans_id)
-        if transaction_wolgs.user_id != user_id:
-            raise OpNotPermittedError(
-                f"Transaction user ID {transaction_wolgs.user_id} must be the same as the user ID {user_id}",
-                details=str(e) # don't pass database info
-            )
-        # remove legs first
-        try:
-            await self.leg_repository.remove_by_trans_id(trans_id)
-        except NotExistError as e:
+        # verify transaction exists and belongs to the user, legs needed to refresh positions
+        transaction = (await self.transaction_body_repository.gets_with_legs([trans_id])).get(trans_id)
+        if transaction is None:
             raise NotExistError(
                 f"Transaction {trans_id} does not exist",
                 details="N/A" # don't pass database info
             )
-        except FKNoDeleteUpdateError as e:
-            raise FKNoDeleteUpdateError(
-                f"Transaction {trans_id} is associated with other data, cannot delete",
-                details=str(e) # don't pass database info
+        if transaction.user_id != user_id:
+            raise OpNotPermittedError(
+                f"Transaction user ID {transaction.user_id} must be the same as the user ID {user_id}",
+                details="N/A" # don't pass database info
             )
             
-        try:
-            await self.transaction_body_repository.remove(trans_id)
-        except NotExistError as e:
-            raise NotExistError(
-                f"Transaction {trans_id} does not exist",
-                details="N/A" # don't pass database info
+        # legs and body are removed together, or not at all
+        async with self.unit_of_work.begin(during_creation=False):
+            # remove legs first
+            try:
+                await self.leg_repository.remove_by_trans_id(trans_id)
+            except NotExistError as e:
+                raise NotExistError(
+                    f"Transaction {trans_id} does not exist",
+                    details="N/A" # don't pass database info
+                )
+            except FKNoDeleteUpdateError as e:
+                raise FKNoDeleteUpdateError(
+                    f"Transaction {trans_id} is associated with other data, cannot delete",
+                    details=str(e) # don't pass database info
+                )
+                
+            try:
+                await self.transaction_body_repository.remove(trans_id)
+            except NotExistError as e:
+                raise NotExistError(
+                    f"Transaction {trans_id} does not exist",
+                    details="N/A" # don't pass database info
+                )
+            except FKNoDeleteUpdateError as e:
+                raise FKNoDeleteUpdateError(
+                    f"Transaction {trans_id} is associated with other data, cannot delete",
+                    details=str(e) # don't pass database info
+                )
+                
+            await self.position_snapshot_repository.refresh(
+                user_id, 
+                positions={(leg.acct_id, leg.prop_id) for leg in transaction.legs}, 
+                from_dt=transaction.trans_dt
             )
-        except FKNoDeleteUpdateError as e:
-            raise FKNoDeleteUpdateError(
-                f"Transaction {trans_id} is associated with other data, cannot delete",
-                details=str(e) # don't pass database info
+            await self.ledger_change_repository.record(
+                user_id, 
+                {(leg.acct_id, leg.prop_id): transaction.trans_dt for leg in transaction.legs}
             )
             
         # Invalidate cache after successful update
-        await cache.delete(f"transaction_{trans_id}_{user_id}")
+        await self._invalidate_caches(user_id, [transaction.trans_dt])
             
     async def update_transaction(self, transaction: TransactionCreate, user_id: str):
         if transaction.user_id != user_id:
@@ -145,59 +529,139 @@ class TransactionService:
                 details="N/A" # don't pass database info
             )
             
-        # get old leg ids first
-        leg_ids = await self.leg_repository.get_leg_ids_by_trans_id(transaction.trans_id)
-        
-        # add new legs
-        try:
-            # convert legs to Leg objects
-            legs = [
-                Leg(
-                    trans_id=transaction.trans_id,
-                    user_id=user_id,
-                    **leg.model_dump()
-                ) for leg in transaction.legs
-            ]
-            await self.leg_repository.adds(legs)
-        except AlreadyExistError as e:
-            raise AlreadyExistError(
-                f"Some legs already exist",
-                details="N/A" # don't pass database info
-            )
-        except FKNotExistError as e:
-            raise FKNotExistError(
-                f"Some accounts or properties do not exist",
-                details=str(e) # don't pass database info
-            )
-            
-        # remove old legs only if new legs are added successfully
-        
-        try:
-            await self.leg_repository.removes(leg_ids)
-        except NotExistError as e:
+        # verify transaction exists and belongs to the user, body and legs in one query
+        stored = (await self.transaction_body_repository.gets_with_legs([transaction.trans_id])).get(transaction.trans_id)
+        if stored is None:
             raise NotExistError(
                 f"Transaction {transaction.trans_id} does not exist",
                 details="N/A" # don't pass database info
             )
-        except FKNoDeleteUpdateError as e:
-            raise FKNoDeleteUpdateError(
-                f"Transaction {transaction.trans_id} is associated with other data, cannot update",
-                details=str(e) # don't pass database info
-            )
-        
-        # finally update transaction body  
-        try:
-            await self.transaction_body_repository.update(transaction.to_transaction_wolgs())
-        except NotExistError as e:
-            raise NotExistError(
-                f"Transaction {transaction.trans_id} does not exist",
+        if stored.user_id != user_id:
+            raise OpNotPermittedError(
+                f"Transaction user ID {stored.user_id} must be the same as the user ID {user_id}",
                 details="N/A" # don't pass database info
             )
-        except FKNoDeleteUpdateError as e:
-            raise FKNoDeleteUpdateError(
-                f"Transaction {transaction.trans_id} is associated with other data, cannot update",
-                details=str(e) # don't pass database info
-            )
+        transaction_wolgs = TransactionWOLegs(**stored.model_dump(exclude={'legs'}))
+            
+        # only touch the legs that actually changed
+        old_legs = stored.legs
+        new_legs, changed_legs, removed_leg_ids = diff_legs(
+            old_legs, 
+            transaction.legs, 
+            trans_id=transaction.trans_id, 
+            user_id=user_id
+        )
+        new_body = transaction.to_transaction_wolgs()
+        
+        async with self.unit_of_work.begin(during_creation=False):
+            # update body
+            if new_body != transaction_wolgs:
+                await self.transaction_body_repository.update(new_body)
+            
+            # update changed legs in place
+            try:
+                if changed_legs:
+                    await self.leg_repository.updates(changed_legs)
+                if new_legs:
+                    await self.leg_repository.adds(new_legs)
+            except AlreadyExistError as e:
+                raise AlreadyExistError(
+                    f"Some legs already exist",
+                    details="N/A" # don't pass database info
+                )
+            except (FKNotExistError, FKNoDeleteUpdateError) as e:
+                raise FKNotExistError(
+                    f"Some accounts or properties do not exist",
+                    details=str(e) # don't pass database info
+                )
+                
+            # remove legs no longer present
+            try:
+                if removed_leg_ids:
+                    await self.leg_repository.removes(removed_leg_ids)
+            except FKNoDeleteUpdateError as e:
+                raise FKNoDeleteUpdateError(
+                    f"Transaction {transaction.trans_id} is associated with other data, cannot update",
+                    details=str(e) # don't pass database info
+                )
+            
+            # positions of old and new legs change from the earlier of old and new date
+            if new_legs or changed_legs or removed_leg_ids or new_body.trans_dt != transaction_wolgs.trans_dt:
+                await self.position_snapshot_repository.refresh(
+                    user_id,
+                    positions={(leg.acct_id, leg.prop_id) for leg in old_legs + new_legs + changed_legs},
+                    from_dt=min(new_body.trans_dt, transaction_wolgs.trans_dt)
+                )
+                await self.ledger_change_repository.record(
+                    user_id,
+                    {
+                        (leg.acct_id, leg.prop_id): min(new_body.trans_dt, transaction_wolgs.trans_dt) 
+                        for leg in old_legs + new_legs + changed_legs
+                    }
+                )
             
         # Invalidate cache after successful update
-        await cache.delete(f"transaction_{transaction.trans_id}_{user_id}")
\ No newline at end of file
+        await self._invalidate_caches(user_id, [new_body.trans_dt, transaction_wolgs.trans_dt])
+
+
+def _leg_key(leg: LegCreate) -> tuple:
+    # legs are stored as DECIMAL(15, 5)
+    return (leg.leg_type, leg.acct_id, leg.prop_id, round(leg.quantity, 5), round(leg.price, 5))
+
+def diff_legs(
+    old_legs: list[Leg], 
+    legs: list[LegCreate], 
+    trans_id: str, 
+    user_id: str
+) -> tuple[list[Leg], list[Leg], list[str]]:
+    """Compare the incoming legs of a transaction with the stored ones.
+    
+    Identical legs are left alone (keeping their leg ids), other legs reuse the ids 
+    of leftover stored legs and are updated in place, the rest are added or removed.
+
+    Args:
+        old_legs (list[Leg]): The stored legs of the transaction.
+        legs (list[LegCreate]): The incoming legs of the transaction.
+        trans_id (str): The transaction ID.
+        user_id (str): The user ID.
+
+    Returns:
+        tuple[list[Leg], list[Leg], list[str]]: legs to add, legs to update, leg ids to remove.
+    """
+    unmatched: dict[tuple, list[Leg]] = {}
+    for old_leg in old_legs:
+        unmatched.setdefault(_leg_key(old_leg), []).append(old_leg)
+    
+    # keep legs with exactly the same content
+    pending: list[LegCreate] = []
+    for leg in legs:
+        same = unmatched.get(_leg_key(leg))
+        if same:
+            same.pop(0)
+        else:
+            pending.append(leg)
+    leftovers = [old_leg for same in unmatched.values() for old_leg in same]
+    
+    # reuse leftover leg ids for changed legs, add or remove the rest
+    new_legs = []
+    changed_legs = []
+    for i, leg in enumerate(pending):
+        if i < len(leftovers):
+            changed_legs.append(
+                Leg(
+                    leg_id=leftovers[i].leg_id,
+                    trans_id=trans_id,
+                    user_id=user_id,
+                    **leg.model_dump()
+                )
+            )
+        else:
+            new_legs.append(
+                Leg(
+                    trans_id=trans_id,
+                    user_id=user_id,
+                    **leg.model_dump()
+                )
+            )
+    removed_leg_ids = [old_leg.leg_id for old_leg in leftovers[len(pending):]]
+    return new_legs, changed_legs, removed_leg_ids
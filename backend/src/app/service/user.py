@@ -1,5 +1,6 @@
 from src.app.model.user import UserCreate, User
 from src.app.repository.user import UserRepository
+from src.app.service.password import password_hasher
 from src.app.model.exceptions import AlreadyExistError, NotExistError, FKNoDeleteUpdateError
 
 class UserService:
@@ -8,6 +9,8 @@ class UserService:
         self.user_repository = user_repository
         
     async def create_user(self, user: UserCreate):
+        # hashed once, off the event loop
+        user = await password_hasher.hashed(user)
         try:
             await self.user_repository.add(user)
         except AlreadyExistError as e:
@@ -46,6 +49,7 @@ class UserService:
         
         
     async def update_user(self, user: UserCreate):
+        user = await password_hasher.hashed(user)
         try:
             await self.user_repository.update(user)
         except NotExistError as e:
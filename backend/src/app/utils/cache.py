@@ -1,5 +1,7 @@
+import time
+from collections import OrderedDict
 from functools import wraps
-from typing import Callable, Any, Type
+from typing import Callable, Any, Hashable, Type
 from pydantic import BaseModel
 
 
@@ -47,3 +49,49 @@ def deserialize_cached_model(model_class: Type[BaseModel]):
         return wrapper
     return decorator
 
+
+class LRUCache:
+    """Bounded in-process LRU cache with optional per-entry TTL.
+    
+    Used as the first level in front of redis for hot, rarely changing records.
+    Not shared across workers, so keep the TTL short where cross-worker invalidation matters.
+    
+    Usage:
+        lru = LRUCache(maxsize=1024, ttl=60)
+        lru.set('key', value)
+        lru.get('key') # -> value, or None once expired/evicted
+    """
+    
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (expire_at, value), expire_at is None for no expiry
+        self._data: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()
+        
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expire_at, value = item
+        if expire_at is not None and expire_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+    
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expire_at = time.monotonic() + ttl if ttl is not None else None
+        self._data[key] = (expire_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+        
+    def clear(self) -> None:
+        self._data.clear()
+        
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,79 @@
+"""
+Vectorized cost basis of one position (account + property) from its trade events.
+
+Events are in time order, buys carry the cost including fees, sells the proceeds net of fees.
+Sells never exceed the quantity held (oversold quantity is ignored), so no short positions.
+"""
+from typing import NamedTuple
+import numpy as np
+
+EPS = 1e-9
+
+
+class PositionCostBasis(NamedTuple):
+    quantity: float # quantity held after all events
+    acb: float # adjusted cost base (average cost method) of the quantity held
+    realized_avg: float # realized gain using average cost
+    fifo_cost: float # cost of the remaining FIFO lots
+    realized_fifo: float # realized gain using FIFO
+    remaining: np.ndarray # remaining quantity of each event (FIFO lot), 0 for sells
+
+
+def _segment_cumsum(x: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Cumulative sum restarting at each True of starts (starts[0] must be True)."""
+    total = np.cumsum(x)
+    first = np.maximum.accumulate(np.where(starts, np.arange(len(x)), 0))
+    return total - (total - x)[first]
+
+def compute_cost_basis(is_buy: np.ndarray, qty: np.ndarray, amount: np.ndarray) -> PositionCostBasis:
+    """Cost basis of a single position.
+
+    Args:
+        is_buy (np.ndarray): bool, True for buy events, False for sell events.
+        qty (np.ndarray): positive quantity of each event.
+        amount (np.ndarray): cost of buys (incl. fees) or proceeds of sells (net of fees).
+    """
+    n = len(qty)
+    if n == 0:
+        return PositionCostBasis(0.0, 0.0, 0.0, 0.0, 0.0, np.zeros(0))
+    
+    # held quantity, floored at 0 (reflected cumulative sum)
+    raw = np.cumsum(np.where(is_buy, qty, -qty))
+    held = raw - np.minimum(np.minimum.accumulate(raw), 0)
+    held_before = np.concatenate(([0.0], held[:-1]))
+    sold = np.where(is_buy, 0.0, held_before - held)
+    proceeds = np.where(is_buy, 0.0, amount * np.divide(sold, qty, out=np.zeros(n), where=qty > 0))
+    buy_cost = np.where(is_buy, amount, 0.0)
+    
+    # average cost: acb_i = m_i * acb_{i-1} + cost_i, sells scale acb by held/held_before,
+    # solved per segment between full liquidations as acb = P * cumsum(cost / P), P = cumprod(m)
+    closed = held <= EPS
+    m = np.where(is_buy | closed, 1.0, np.divide(held, held_before, out=np.ones(n), where=held_before > EPS))
+    starts = np.concatenate(([True], closed[:-1]))
+    log_p = _segment_cumsum(np.log(m), starts)
+    acb = np.exp(log_p) * _segment_cumsum(buy_cost * np.exp(-log_p), starts)
+    acb[closed] = 0.0
+    acb_before = np.concatenate(([0.0], acb[:-1]))
+    realized_avg = np.sum(np.where(is_buy, 0.0, proceeds - (acb_before - acb)))
+    
+    # FIFO: cost of the sold units is read off the cumulative lot cost curve
+    lot_qty = np.where(is_buy, qty, 0.0)
+    lot_end = np.cumsum(lot_qty)
+    xp = np.concatenate(([0.0], lot_end[is_buy]))
+    fp = np.concatenate(([0.0], np.cumsum(buy_cost)[is_buy]))
+    sold_end = np.cumsum(sold)
+    sold_start = sold_end - sold
+    sold_cost = np.interp(sold_end, xp, fp) - np.interp(sold_start, xp, fp)
+    realized_fifo = np.sum(np.where(is_buy, 0.0, proceeds - sold_cost))
+    remaining = np.where(is_buy, np.clip(lot_end - sold_end[-1], 0.0, lot_qty), 0.0)
+    unit_cost = np.divide(buy_cost, lot_qty, out=np.zeros(n), where=lot_qty > 0)
+    fifo_cost = np.sum(remaining * unit_cost)
+    
+    return PositionCostBasis(
+        quantity=float(held[-1]),
+        acb=float(acb[-1]),
+        realized_avg=float(realized_avg),
+        fifo_cost=float(fifo_cost),
+        realized_fifo=float(realized_fifo),
+        remaining=remaining
+    )
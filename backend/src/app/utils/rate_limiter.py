@@ -1,24 +1,36 @@
 """
 Rate limiter utility for preventing brute force attacks on login attempts.
-Tracks failed login attempts per username and implements exponential backoff.
+Tracks failed login attempts per username and locks the username out after too many of them.
+
+`RedisRateLimiter` keeps the state in redis, so all workers share the same lockout, and falls back
+to the in-process `RateLimiter` while redis is unavailable.
 """
-import asyncio
+import logging
+import time
 from functools import lru_cache
-from datetime import datetime, timedelta
-from typing import Dict, Tuple
+from heapq import heappop, heappush
+from typing import Callable, Dict, Set, List, Tuple
+from redis.exceptions import RedisError
+from src.app.repository.cache import redis_client
 
 
 class RateLimiter:
     """
-    Async-safe rate limiter for login attempts.
+    In-process rate limiter for login attempts.
     Tracks failed attempts per username and blocks after threshold is reached.
+    
+    Checks never await, so they are atomic on the event loop without any lock. Entries are
+    indexed in buckets by expiry time, each check only drops the buckets already expired,
+    so its cost does not grow with the number of usernames tracked.
     """
     
     def __init__(
         self,
         max_attempts: int = 5,
         lockout_duration_minutes: int = 15,
-        window_minutes: int = 15
+        window_minutes: int = 15,
+        bucket_seconds: float = 60,
+        clock: Callable[[], float] = time.monotonic
     ):
         """
         Initialize rate limiter.
@@ -27,14 +39,20 @@ class RateLimiter:
             max_attempts: Maximum failed attempts before lockout
             lockout_duration_minutes: Duration of lockout in minutes
             window_minutes: Time window for tracking attempts
+            bucket_seconds: Granularity of the expiry buckets
+            clock: Source of the current time in seconds
         """
         self.max_attempts = max_attempts
-        self.lockout_duration = timedelta(minutes=lockout_duration_minutes)
-        self.window = timedelta(minutes=window_minutes)
+        self.lockout_duration = lockout_duration_minutes * 60
+        self.window = window_minutes * 60
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
         
         # Store: username -> (attempt_count, first_attempt_time, lockout_until)
-        self._attempts: Dict[str, Tuple[int, datetime, datetime | None]] = {}
-        self._lock = asyncio.Lock()
+        self._attempts: Dict[str, Tuple[int, float, float | None]] = {}
+        # expiry bucket -> usernames, and heap of the buckets in use
+        self._buckets: Dict[int, Set[str]] = {}
+        self._bucket_heap: List[int] = []
     
     async def is_allowed(self, username: str) -> Tuple[bool, str | None]:
         """
@@ -42,51 +60,39 @@ class RateLimiter:
         
         Args:
             username: Username to check
-            
+        
         Returns:
             Tuple of (is_allowed, error_message)
             If is_allowed is False, error_message contains the reason
         """
-        async with self._lock:
-            now = datetime.utcnow()
-            
-            # Clean up old entries (attempts outside the window)
-            self._cleanup(now)
-            
-            if username not in self._attempts:
-                return True, None
-            
-            attempt_count, first_attempt, lockout_until = self._attempts[username]
-            
-            # Check if account is locked
-            if lockout_until and now < lockout_until:
-                remaining = (lockout_until - now).total_seconds()
-                minutes = int(remaining / 60)
-                seconds = int(remaining % 60)
-                return False, f"Too many failed login attempts. Account locked for {minutes}m {seconds}s"
-            
-            # Reset lockout if it has expired
-            if lockout_until and now >= lockout_until:
-                # Reset the account
-                del self._attempts[username]
-                return True, None
-            
-            # Check if attempts are within the time window
-            if now - first_attempt > self.window:
-                # Reset attempts if outside the window
-                del self._attempts[username]
-                return True, None
-            
-            # Check if max attempts reached
-            if attempt_count >= self.max_attempts:
-                # Lock the account
-                lockout_until = now + self.lockout_duration
-                self._attempts[username] = (attempt_count, first_attempt, lockout_until)
-                remaining = self.lockout_duration.total_seconds()
-                minutes = int(remaining / 60)
-                return False, f"Too many failed login attempts. Account locked for {minutes} minutes"
-            
+        now = self.clock()
+        self._expire(now)
+        
+        if username not in self._attempts:
+            return True, None
+        
+        attempt_count, first_attempt, lockout_until = self._attempts[username]
+        
+        # Check if account is locked
+        if lockout_until is not None:
+            if now < lockout_until:
+                return False, _locked_message(lockout_until - now)
+            # Reset the account, lockout has expired
+            del self._attempts[username]
+            return True, None
+        
+        # Reset attempts if outside the window
+        if now - first_attempt > self.window:
+            del self._attempts[username]
             return True, None
+        
+        # Check if max attempts reached
+        if attempt_count >= self.max_attempts:
+            # Lock the account
+            self._track(username, (attempt_count, first_attempt, now + self.lockout_duration))
+            return False, _lockout_message(self.lockout_duration)
+        
+        return True, None
     
     async def record_failed_attempt(self, username: str) -> None:
         """
@@ -95,21 +101,14 @@ class RateLimiter:
         Args:
             username: Username that failed to login
         """
-        async with self._lock:
-            now = datetime.utcnow()
-            
-            if username not in self._attempts:
-                # First failed attempt
-                self._attempts[username] = (1, now, None)
-            else:
-                attempt_count, first_attempt, lockout_until = self._attempts[username]
-                
-                # Reset if outside the window
-                if now - first_attempt > self.window:
-                    self._attempts[username] = (1, now, None)
-                else:
-                    # Increment attempt count
-                    self._attempts[username] = (attempt_count + 1, first_attempt, lockout_until)
+        now = self.clock()
+        entry = self._attempts.get(username)
+        if entry is None or now - entry[1] > self.window:
+            # First failed attempt, or first one in a new window
+            self._track(username, (1, now, None))
+        else:
+            attempt_count, first_attempt, lockout_until = entry
+            self._attempts[username] = (attempt_count + 1, first_attempt, lockout_until)
     
     async def reset_attempts(self, username: str) -> None:
         """
@@ -118,20 +117,127 @@ class RateLimiter:
         Args:
             username: Username that successfully logged in
         """
-        async with self._lock:
-            if username in self._attempts:
-                del self._attempts[username]
-    
-    def _cleanup(self, now: datetime) -> None:
-        """Remove old entries outside the tracking window."""
-        usernames_to_remove = []
-        for username, (_, first_attempt, lockout_until) in self._attempts.items():
-            # Remove if outside window and not locked
-            if (now - first_attempt > self.window) and (lockout_until is None or now >= lockout_until):
-                usernames_to_remove.append(username)
-        
-        for username in usernames_to_remove:
-            del self._attempts[username]
+        self._attempts.pop(username, None)
+    
+    def _expires_at(self, entry: Tuple[int, float, float | None]) -> float:
+        """Entries are kept while in the window or locked."""
+        _, first_attempt, lockout_until = entry
+        return max(first_attempt + self.window, lockout_until or 0)
+    
+    def _track(self, username: str, entry: Tuple[int, float, float | None]) -> None:
+        self._attempts[username] = entry
+        bucket = int(self._expires_at(entry) // self.bucket_seconds)
+        if bucket not in self._buckets:
+            self._buckets[bucket] = set()
+            heappush(self._bucket_heap, bucket)
+        self._buckets[bucket].add(username)
+    
+    def _expire(self, now: float) -> None:
+        """Remove entries of the buckets ended before now."""
+        current = int(now // self.bucket_seconds)
+        while self._bucket_heap and self._bucket_heap[0] < current:
+            for username in self._buckets.pop(heappop(self._bucket_heap)):
+                entry = self._attempts.get(username)
+                # the entry may have been tracked again with a later expiry
+                if entry is not None and self._expires_at(entry) <= now:
+                    del self._attempts[username]
+
+
+class RedisRateLimiter(RateLimiter):
+    """
+    Rate limiter shared by all workers, each check is one atomic script in redis.
+    
+    Failed attempts are an INCR counter expiring at the end of the window,
+    the lockout is a key expiring at its end. While redis is unavailable,
+    the in-process limiter is used and redis is retried after retry_seconds.
+    """
+    
+    # KEYS: attempts, lockout; ARGV: max_attempts, lockout ms
+    # returns 0 if allowed, else remaining lockout ms (negative if locked by this check)
+    IS_ALLOWED_SCRIPT = """
+    local remaining = redis.call('PTTL', KEYS[2])
+    if remaining > 0 then
+        return remaining
+    end
+    local count = tonumber(redis.call('GET', KEYS[1]) or '0')
+    if count >= tonumber(ARGV[1]) then
+        redis.call('SET', KEYS[2], count, 'PX', ARGV[2])
+        redis.call('DEL', KEYS[1])
+        return -tonumber(ARGV[2])
+    end
+    return 0
+    """
+    # KEYS: attempts; ARGV: window ms
+    RECORD_SCRIPT = """
+    local count = redis.call('INCR', KEYS[1])
+    if count == 1 then
+        redis.call('PEXPIRE', KEYS[1], ARGV[1])
+    end
+    return count
+    """
+    
+    def __init__(self, *args, retry_seconds: float = 30, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retry_seconds = retry_seconds
+        self._redis_down_until = 0.0
+        self._is_allowed = redis_client.register_script(self.IS_ALLOWED_SCRIPT)
+        self._record = redis_client.register_script(self.RECORD_SCRIPT)
+    
+    @staticmethod
+    def _keys(username: str) -> list[str]:
+        # hash tag keeps both keys of a user on the same cluster slot
+        return [f"login_attempts:{{{username}}}", f"login_lockout:{{{username}}}"]
+    
+    def _redis_available(self) -> bool:
+        return self.clock() >= self._redis_down_until
+    
+    def _redis_failed(self, e: RedisError) -> None:
+        logging.warning(f"Rate limiter falls back to in-process state: {e}")
+        self._redis_down_until = self.clock() + self.retry_seconds
+    
+    async def is_allowed(self, username: str) -> Tuple[bool, str | None]:
+        if self._redis_available():
+            try:
+                remaining_ms = int(await self._is_allowed(
+                    keys=self._keys(username),
+                    args=[self.max_attempts, int(self.lockout_duration * 1000)]
+                ))
+            except RedisError as e:
+                self._redis_failed(e)
+            else:
+                if remaining_ms == 0:
+                    return True, None
+                if remaining_ms < 0:
+                    return False, _lockout_message(self.lockout_duration)
+                return False, _locked_message(remaining_ms / 1000)
+        return await super().is_allowed(username)
+    
+    async def record_failed_attempt(self, username: str) -> None:
+        if self._redis_available():
+            try:
+                await self._record(keys=self._keys(username)[:1], args=[int(self.window * 1000)])
+                return
+            except RedisError as e:
+                self._redis_failed(e)
+        await super().record_failed_attempt(username)
+    
+    async def reset_attempts(self, username: str) -> None:
+        await super().reset_attempts(username)
+        if self._redis_available():
+            try:
+                await redis_client.delete(*self._keys(username))
+            except RedisError as e:
+                self._redis_failed(e)
+
+
+def _locked_message(remaining: float) -> str:
+    minutes = int(remaining / 60)
+    seconds = int(remaining % 60)
+    return f"Too many failed login attempts. Account locked for {minutes}m {seconds}s"
+
+def _lockout_message(lockout_duration: float) -> str:
+    minutes = int(lockout_duration / 60)
+    return f"Too many failed login attempts. Account locked for {minutes} minutes"
 
 
 @lru_cache(maxsize=1)
@@ -150,9 +256,8 @@ def get_rate_limiter(
     Returns:
         RateLimiter: A cached rate limiter instance for the given parameters
     """
-    return RateLimiter(
+    return RedisRateLimiter(
         max_attempts=max_attempts,
         lockout_duration_minutes=lockout_duration_minutes,
         window_minutes=window_minutes
     )
-
@@ -0,0 +1,59 @@
+"""
+Vectorized time-weighted and money-weighted (XIRR) returns of many series at once.
+
+Series are the columns of (days x series) matrices of end of day values and cash flows,
+cash flows are from the investor's view (negative = money put into the portfolio).
+"""
+import numpy as np
+
+EPS = 1e-9
+
+
+def time_weighted_returns(values: np.ndarray, cash_flows: np.ndarray) -> np.ndarray:
+    """Cumulative TWR of each series, chaining daily sub-period returns.
+
+    Flows of a day are assumed at its start, days starting with nothing invested return 0.
+    """
+    if values.shape[0] < 2:
+        return np.zeros(values.shape[1])
+    invested = values[:-1] - cash_flows[1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.where(invested > EPS, values[1:] / invested, 1.0)
+    return np.prod(growth, axis=0) - 1
+
+def xirr(cash_flows: np.ndarray, years: np.ndarray, tol: float = 1e-10, max_iter: int = 100) -> np.ndarray:
+    """Annualized IRR of each series, NaN where the flows have no root.
+
+    Solves sum(cf * exp(-g * years)) = 0 for g = log(1 + irr), with Newton steps
+    safeguarded by bisection on a bracket (all series at once).
+
+    Args:
+        cash_flows (np.ndarray): (n x series) flows, including the initial and final values.
+        years (np.ndarray): (n,) time of each row in years from the first.
+    """
+    def _npv(g: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        discounted = cash_flows * np.exp(-np.outer(years, g))
+        return discounted.sum(axis=0), -(discounted * years[:, None]).sum(axis=0)
+
+    n_series = cash_flows.shape[1]
+    # irr from -99.3% to 4.85e8 (short periods annualize to large rates)
+    lo, hi = np.full(n_series, -5.0), np.full(n_series, 20.0)
+    f_lo, _ = _npv(lo)
+    f_hi, _ = _npv(hi)
+    solvable = np.sign(f_lo) * np.sign(f_hi) < 0
+    g = np.zeros(n_series)
+    for _ in range(max_iter):
+        f, df = _npv(g)
+        # keep the root bracketed
+        same = np.sign(f) == np.sign(f_lo)
+        lo, f_lo = np.where(same, g, lo), np.where(same, f, f_lo)
+        hi = np.where(same, hi, g)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = g - f / df
+        # bisect where newton fails or leaves the bracket
+        step = np.where(np.isfinite(step) & (step > lo) & (step < hi), step, (lo + hi) / 2)
+        done = np.abs(step - g) < tol
+        g = step
+        if done[solvable].all():
+            break
+    return np.where(solvable, np.expm1(g), np.nan)
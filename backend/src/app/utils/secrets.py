@@ -1,32 +1,26 @@
 import asyncio
+import logging
 import os
-from functools import lru_cache
 from pathlib import Path
+from typing import Callable
 import tomli
 import hvac
 
 ENV = os.environ.get("ENV", "dev")
 
-def get_vault_resp(mount_point: str, path: str) -> dict:
+def get_vault_resp(mount_point: str, path: str, client: hvac.Client | None = None) -> dict:
     """
     Get response from vault
     Args:
         mount_point: The mount point of the vault
         path: The path of the secret
+        client: An authenticated vault client, created from secrets.toml if not given
     Returns:
         The response from the vault
     Raises:
         PermissionError: If the vault permission is not correct
     """
-    with open((Path(__file__).resolve().parent.parent.parent.parent.parent / "secrets.toml").resolve(), mode="rb") as fp:
-        config = tomli.load(fp)
-        
-    vault_config = config['vault']
-    
-    client = hvac.Client(
-        url = f"{vault_config['endpoint']}:{vault_config['port']}",
-        token = vault_config['token']
-    )
+    client = client or get_vault_client()
     if client.is_authenticated():
         response = client.secrets.kv.read_secret_version(
             mount_point=mount_point,
@@ -37,10 +31,23 @@ def get_vault_resp(mount_point: str, path: str) -> dict:
     else:
         raise PermissionError("Vault Permission Error")
     
-@lru_cache()
-def get_secret() -> dict:
+def get_vault_client() -> hvac.Client:
     """
-    Get all secrets from vault
+    Get vault client from the vault section of secrets.toml
+    """
+    with open((Path(__file__).resolve().parent.parent.parent.parent.parent / "secrets.toml").resolve(), mode="rb") as fp:
+        config = tomli.load(fp)
+        
+    vault_config = config['vault']
+    
+    return hvac.Client(
+        url = f"{vault_config['endpoint']}:{vault_config['port']}",
+        token = vault_config['token']
+    )
+    
+def load_secrets() -> dict:
+    """
+    Load all secrets from vault (blocking IO)
     """
     VAULT_MOUNT_POINT = "investlens"
     VAULT_MOUNT_PATH = {
@@ -49,29 +56,95 @@ def get_secret() -> dict:
         'mailbox': f"{ENV}/mailbox",
     }
     
-    database = get_vault_resp(
-        mount_point = VAULT_MOUNT_POINT,
-        path = VAULT_MOUNT_PATH['database'],
-    )
-    auth = get_vault_resp(
-        mount_point = VAULT_MOUNT_POINT,
-        path = VAULT_MOUNT_PATH['auth'],
-    )
-    mailbox = get_vault_resp(
-        mount_point = VAULT_MOUNT_POINT,
-        path = VAULT_MOUNT_PATH['mailbox'],
-    )
-    
+    client = get_vault_client()
     return {
-        'database' : database,
-        'auth': auth,
-        'mailbox': mailbox
+        name: get_vault_resp(
+            mount_point = VAULT_MOUNT_POINT,
+            path = path,
+            client = client
+        ) for name, path in VAULT_MOUNT_PATH.items()
     }
     
     
+class SecretsProvider:
+    """
+    Secrets held in memory and refreshed from vault in the background every ttl seconds.
+    
+    Reads are synchronous and return the current snapshot, which is swapped as a whole on refresh,
+    so a reader never sees a half updated config. The snapshot before a change is kept 
+    as `get_previous()`, e.g., to still accept tokens signed before a key rotation.
+    """
+    
+    def __init__(self, loader: Callable[[], dict] = load_secrets, ttl: float = 300):
+        self.loader = loader
+        self.ttl = ttl
+        self._secrets: dict | None = None
+        self._previous: dict | None = None
+        self._task: asyncio.Task | None = None
+        
+    def get(self) -> dict:
+        """Current secrets, loaded in place (blocking) on first use if the provider is not started, 
+        e.g., in scripts and migrations."""
+        if self._secrets is None:
+            self._swap(self.loader())
+        return self._secrets # type: ignore
+    
+    def get_previous(self) -> dict | None:
+        """Secrets before the last change, None if they never changed."""
+        return self._previous
+    
+    def _swap(self, secrets: dict):
+        if self._secrets is not None and secrets != self._secrets:
+            self._previous = self._secrets
+        self._secrets = secrets
+        
+    async def load(self) -> dict:
+        """Current secrets, loaded in a thread on first use."""
+        if self._secrets is None:
+            await self.refresh()
+        return self._secrets # type: ignore
+        
+    async def refresh(self):
+        """Reload secrets from vault, in a thread to not block the loop."""
+        self._swap(await asyncio.to_thread(self.loader))
+        
+    async def _refresh_forever(self):
+        while True:
+            await asyncio.sleep(self.ttl)
+            try:
+                await self.refresh()
+            except Exception as e:
+                # keep serving the last known secrets until vault is back
+                logging.warning(f"Failed to refresh secrets: {e}")
+        
+    async def start(self):
+        """Load secrets and refresh them in the background, run once per worker at startup."""
+        await self.refresh()
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_forever())
+            
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            
+            
+secrets_provider = SecretsProvider()
+
+def get_secret() -> dict:
+    """
+    Get all secrets (database, auth, mailbox)
+    """
+    return secrets_provider.get()
+    
+    
 async def get_async_db_url(db: str) -> str:
     
-    config = (await asyncio.to_thread(get_secret))['database']
+    config = (await secrets_provider.load())['database']
     db_url = f"{config['async_driver']}://{config['username']}:{config['password']}@{config['hostname']}:{config['port']}/{db}"
     return db_url
 
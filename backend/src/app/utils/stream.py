@@ -0,0 +1,85 @@
+"""
+Incremental parsing of uploaded CSV/NDJSON files, and formatting of exported ones.
+Records are read lazily from the (spooled) upload in batches, so memory stays bounded by the batch size;
+exports are formatted chunk by chunk in the same way.
+"""
+import asyncio
+import codecs
+import csv
+import io
+import json
+from itertools import islice
+from typing import Any, AsyncIterator, BinaryIO, Iterator, NamedTuple
+from src.app.model.enums import ImportFormat
+
+
+class RawRecord(NamedTuple):
+    row: int # 1-based data row number, header excluded
+    data: dict[str, Any] | None # None if the row cannot be parsed, may be set along an error
+    error: str | None
+    
+
+def _iter_lines(fp: BinaryIO) -> Iterator[str]:
+    """Decode the binary file line by line, the file is neither wrapped nor closed.
+    
+    Upload files are `SpooledTemporaryFile`, which `io.TextIOWrapper` cannot wrap before python 3.11.
+    """
+    return codecs.iterdecode(fp, 'utf-8-sig')
+
+def iter_csv_records(fp: BinaryIO) -> Iterator[RawRecord]:
+    """Parse CSV with header line, empty cells are returned as None."""
+    reader = csv.DictReader(_iter_lines(fp))
+    for row, record in enumerate(reader, start=1):
+        # more values than header columns are kept under the None key
+        error = "Row has more values than header columns" if None in record else None
+        data = {k: (v if v != '' else None) for k, v in record.items() if k is not None}
+        yield RawRecord(row, data, error)
+    
+def iter_ndjson_records(fp: BinaryIO) -> Iterator[RawRecord]:
+    """Parse one JSON object per line, blank lines are ignored."""
+    row = 0
+    for line in _iter_lines(fp):
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield RawRecord(row, None, f"Invalid JSON: {e}")
+            continue
+        if isinstance(record, dict):
+            yield RawRecord(row, record, None)
+        else:
+            yield RawRecord(row, None, "Expect one JSON object per line")
+        
+def iter_records(fp: BinaryIO, fmt: ImportFormat) -> Iterator[RawRecord]:
+    if fmt == ImportFormat.CSV:
+        return iter_csv_records(fp)
+    elif fmt == ImportFormat.NDJSON:
+        return iter_ndjson_records(fp)
+    raise ValueError(f"Unsupported import format {fmt}")
+
+async def iter_record_batches(fp: BinaryIO, fmt: ImportFormat, batch_size: int = 500) -> AsyncIterator[list[RawRecord]]:
+    """Yield batches of parsed records, file reading/parsing runs in a thread to not block the loop."""
+    records = iter_records(fp, fmt)
+    while True:
+        batch = await asyncio.to_thread(lambda: list(islice(records, batch_size)))
+        if not batch:
+            break
+        yield batch
+
+
+def format_records(records: list[dict[str, Any]], fmt: ImportFormat, columns: list[str], 
+                   header: bool = False) -> str:
+    """Format a chunk of records as CSV rows (header line optional) or NDJSON lines, 
+    readable back by `iter_records`."""
+    if fmt == ImportFormat.CSV:
+        text = io.StringIO()
+        writer = csv.DictWriter(text, fieldnames=columns, lineterminator='\n')
+        if header:
+            writer.writeheader()
+        writer.writerows(records)
+        return text.getvalue()
+    elif fmt == ImportFormat.NDJSON:
+        return ''.join(json.dumps(record, default=str) + '\n' for record in records)
+    raise ValueError(f"Unsupported export format {fmt}")
@@ -0,0 +1,58 @@
+"""
+Helpers for daily series: calendar periods, and vectorized daily matrices with dates on the first axis 
+and series (positions, symbols, currencies) on the second.
+"""
+from datetime import date, timedelta
+from typing import Literal
+import numpy as np
+
+
+def date_range(start_dt: date, end_dt: date) -> list[date]:
+    """All days from start_dt to end_dt, both included."""
+    return [start_dt + timedelta(days=i) for i in range((end_dt - start_dt).days + 1)]
+
+def period_of(dt: date, period_type: Literal['month', 'year']) -> str:
+    """Label of the month (YYYY-MM) or year (YYYY) containing dt."""
+    return f"{dt.year:04d}-{dt.month:02d}" if period_type == 'month' else f"{dt.year:04d}"
+
+def period_bounds(period: str) -> tuple[date, date]:
+    """First and last day of a period label from `period_of`."""
+    if len(period) == 4:
+        return date(int(period), 1, 1), date(int(period), 12, 31)
+    year, month = int(period[:4]), int(period[5:7])
+    next_start = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return date(year, month, 1), next_start - timedelta(days=1)
+
+def periods_between(start_dt: date, end_dt: date, period_type: Literal['month', 'year']) -> list[str]:
+    """Labels of all periods overlapping start_dt to end_dt, oldest first."""
+    periods = []
+    dt = period_bounds(period_of(start_dt, period_type))[0]
+    while dt <= end_dt:
+        period = period_of(dt, period_type)
+        periods.append(period)
+        dt = period_bounds(period)[1] + timedelta(days=1)
+    return periods
+
+def day_index(dts: list[date], start_dt: date) -> np.ndarray:
+    """Row of each date in a matrix starting at start_dt, dates before start_dt go to the first row."""
+    ordinals = np.fromiter((dt.toordinal() for dt in dts), dtype=np.int64, count=len(dts))
+    return np.maximum(ordinals - start_dt.toordinal(), 0)
+
+def scatter(n_days: int, n_cols: int, rows: np.ndarray, cols: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Matrix of NaN with values placed at (rows, cols), the last value wins on duplicated cells."""
+    matrix = np.full((n_days, n_cols), np.nan)
+    if len(values) == 0:
+        return matrix
+    flat = np.asarray(rows) * n_cols + np.asarray(cols)
+    _, last = np.unique(flat[::-1], return_index=True)
+    keep = len(flat) - 1 - last
+    matrix.flat[flat[keep]] = np.asarray(values, dtype=float)[keep]
+    return matrix
+
+def ffill(matrix: np.ndarray) -> np.ndarray:
+    """Forward fill NaN along the dates axis, leading NaN stay NaN."""
+    if matrix.size == 0:
+        return matrix
+    idx = np.where(np.isnan(matrix), 0, np.arange(matrix.shape[0])[:, None])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return matrix[idx, np.arange(matrix.shape[1])]
@@ -4,6 +4,17 @@ from passlib.context import CryptContext
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+def hash_password(password: str) -> str:
+    """Hash the password with bcrypt (CPU bounded, about 250ms).
+    
+    Args:
+        password (str): The plain password.
+        
+    Returns:
+        str: The hashed password.
+    """
+    return pwd_context.hash(password)
+
 def id_generator(prefix: str, length: int = 8, existing_list: list[str] | None = None, 
                  only_alpha_numeric: bool = False) -> str:
     """Generate a unique ID with a prefix and optional length.
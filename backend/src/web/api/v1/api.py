@@ -3,9 +3,11 @@ from src.web.api.v1.endpoints.management import router as management_router
 from src.web.api.v1.endpoints.market import router as market_router
 from src.web.api.v1.endpoints.registry import router as registry_router
 from src.web.api.v1.endpoints.transaction import router as transaction_router
+from src.web.api.v1.endpoints.portfolio import router as portfolio_router
 
 api_router = APIRouter()
 api_router.include_router(management_router)
 api_router.include_router(market_router)
 api_router.include_router(registry_router)
-api_router.include_router(transaction_router)
\ No newline at end of file
+api_router.include_router(transaction_router)
+api_router.include_router(portfolio_router)
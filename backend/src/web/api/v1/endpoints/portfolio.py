@@ -0,0 +1,112 @@
+from datetime import date, timedelta
+from typing import Literal
+from fastapi import APIRouter, Depends
+from src.app.model.enums import CurType
+from src.app.model.portfolio import CostBasis, Holding, IncomeExpenseSummary, NetWorthSeries, Performance, Valuation
+from src.app.service.portfolio import PortfolioService
+from src.web.dependency.service import get_portfolio_service
+from src.web.dependency.auth import get_current_user
+from src.app.model.user import User
+
+router = APIRouter(
+    prefix="/portfolio",
+    tags=["portfolio"],
+)
+
+
+@router.get("/holdings")
+async def get_holdings(
+    acct_id: str | None = None,
+    include_closed: bool = False,
+    as_of: date | None = None,
+    portfolio_service: PortfolioService = Depends(get_portfolio_service),
+    current_user: User = Depends(get_current_user)
+) -> list[Holding]:
+    """Positions per account and property, currently or at the end of the `as_of` date."""
+    return await portfolio_service.get_holdings(
+        current_user.user_id, 
+        acct_id=acct_id, 
+        include_closed=include_closed,
+        as_of=as_of
+    )
+    
+@router.get("/cost_basis")
+async def get_cost_basis(
+    acct_id: str | None = None,
+    portfolio_service: PortfolioService = Depends(get_portfolio_service),
+    current_user: User = Depends(get_current_user)
+) -> list[CostBasis]:
+    """Cost basis, realized gains and remaining lots per position, by average cost (ACB) and FIFO."""
+    return await portfolio_service.get_cost_basis(current_user.user_id, acct_id=acct_id)
+    
+@router.get("/valuation")
+async def get_valuation(
+    as_of: date | None = None,
+    report_currency: CurType = CurType.USD,
+    portfolio_service: PortfolioService = Depends(get_portfolio_service),
+    current_user: User = Depends(get_current_user)
+) -> Valuation:
+    """Market value of the portfolio at the end of `as_of` (default today), totals by account, property type and currency."""
+    return await portfolio_service.get_valuation(
+        current_user.user_id,
+        as_of=as_of or date.today(),
+        report_currency=report_currency
+    )
+
+    
+@router.get("/net_worth")
+async def get_net_worth(
+    start_dt: date | None = None,
+    end_dt: date | None = None,
+    report_currency: CurType = CurType.USD,
+    portfolio_service: PortfolioService = Depends(get_portfolio_service),
+    current_user: User = Depends(get_current_user)
+) -> NetWorthSeries:
+    """Daily net worth from `start_dt` (default one year before `end_dt`) to `end_dt` (default today)."""
+    end_dt = end_dt or date.today()
+    return await portfolio_service.get_net_worth(
+        current_user.user_id,
+        start_dt=start_dt or end_dt - timedelta(days=365),
+        end_dt=end_dt,
+        report_currency=report_currency
+    )
+
+    
+@router.get("/performance")
+async def get_performance(
+    start_dt: date | None = None,
+    end_dt: date | None = None,
+    report_currency: CurType = CurType.USD,
+    portfolio_service: PortfolioService = Depends(get_portfolio_service),
+    current_user: User = Depends(get_current_user)
+) -> Performance:
+    """Time-weighted and money-weighted (XIRR) returns from the end of `start_dt` (default one year 
+    before `end_dt`) to `end_dt` (default today), overall, per plan type and per account."""
+    end_dt = end_dt or date.today()
+    return await portfolio_service.get_performance(
+        current_user.user_id,
+        start_dt=start_dt or end_dt - timedelta(days=365),
+        end_dt=end_dt,
+        report_currency=report_currency
+    )
+
+    
+@router.get("/income_expenses")
+async def get_income_expenses(
+    start_dt: date | None = None,
+    end_dt: date | None = None,
+    period_type: Literal['month', 'year'] = 'month',
+    report_currency: CurType = CurType.USD,
+    portfolio_service: PortfolioService = Depends(get_portfolio_service),
+    current_user: User = Depends(get_current_user)
+) -> IncomeExpenseSummary:
+    """Dividend, interest, rent, fee, tax and other totals per month or year, account and leg type, 
+    for whole periods from `start_dt` (default one year before `end_dt`) to `end_dt` (default today)."""
+    end_dt = end_dt or date.today()
+    return await portfolio_service.get_income_expenses(
+        current_user.user_id,
+        start_dt=start_dt or end_dt - timedelta(days=365),
+        end_dt=end_dt,
+        period_type=period_type,
+        report_currency=report_currency
+    )
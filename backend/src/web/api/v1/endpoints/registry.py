@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends
-from src.app.model.registry import Property, Account
+from fastapi import APIRouter, Depends, Query, UploadFile
+from src.app.model.registry import Property, Account, PropertyBrowsePage
 from src.app.service.registry import RegistryService, AccountService
 from src.web.dependency.service import get_registry_service, get_account_service
 from src.web.dependency.auth import get_current_user, get_admin_user
 from src.app.model.user import User
 from src.app.model.market import PublicPropInfo
+from src.app.model.enums import ImportFormat, PropertyType, CurType
+from src.app.model.imports import ImportResult
 
 router = APIRouter(
     prefix="/registry",
@@ -18,6 +20,20 @@ async def get_public_property(
 ) -> Property:
     return await registry_service.get_public_property(property_id)
 
+@router.get("/get_public_property_by_symbol")
+async def get_public_property_by_symbol(
+    symbol: str,
+    registry_service: RegistryService = Depends(get_registry_service)
+) -> Property:
+    return await registry_service.get_public_property_by_symbol(symbol)
+
+@router.get("/get_public_properties")
+async def get_public_properties(
+    property_ids: list[str] = Query(),
+    registry_service: RegistryService = Depends(get_registry_service)
+) -> list[Property]:
+    return await registry_service.get_public_properties(property_ids)
+
 @router.get("/get_private_property")
 async def get_private_property(
     property_id: str,
@@ -49,6 +65,31 @@ async def blurry_search_public(
         limit
     )
     
+@router.get("/browse")
+async def browse(
+    prop_types: list[PropertyType] = Query(default=[]),
+    currencies: list[CurType] = Query(default=[]),
+    exchanges: list[str] = Query(default=[]),
+    sectors: list[str] = Query(default=[]),
+    industries: list[str] = Query(default=[]),
+    countries: list[str] = Query(default=[]),
+    after: str | None = None,
+    limit: int = Query(default=50, ge=1, le=500),
+    registry_service: RegistryService = Depends(get_registry_service)
+) -> PropertyBrowsePage:
+    return await registry_service.browse_public(
+        filters={
+            'prop_type': prop_types,
+            'currency': currencies,
+            'exchange': exchanges,
+            'sector': sectors,
+            'industry': industries,
+            'country': countries,
+        },
+        after=after,
+        limit=limit
+    )
+    
 @router.get("/blurry_search_yfinance")
 async def blurry_search_yfinance(
     keyword: str,
@@ -143,6 +184,33 @@ async def register_yfinance_properties(
         symbols
     )
     
+@router.post("/import_public_properties")
+async def import_public_properties(
+    file: UploadFile,
+    fmt: ImportFormat = ImportFormat.CSV,
+    registry_service: RegistryService = Depends(get_registry_service),
+    admin_user: User = Depends(get_admin_user)
+) -> ImportResult:
+    """Bulk import public property definitions from CSV (with header) or NDJSON, upserted by symbol."""
+    return await registry_service.import_properties(
+        file.file,
+        fmt
+    )
+    
+@router.post("/import_private_properties")
+async def import_private_properties(
+    file: UploadFile,
+    fmt: ImportFormat = ImportFormat.CSV,
+    current_user: User = Depends(get_current_user),
+    registry_service: RegistryService = Depends(get_registry_service)
+) -> ImportResult:
+    """Bulk import private property definitions from CSV (with header) or NDJSON, upserted by symbol."""
+    return await registry_service.import_properties(
+        file.file,
+        fmt,
+        user_id=current_user.user_id
+    )
+    
 @router.post("/register_cash_properties")
 async def register_cash_properties(
     registry_service: RegistryService = Depends(get_registry_service),
@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends
-from src.app.model.transaction import TransactionCreate, Transaction
+from datetime import date
+from fastapi import APIRouter, Depends, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from src.app.model.enums import ImportFormat, LegType
+from src.app.model.imports import ImportResult
+from src.app.model.transaction import TransactionCreate, Transaction, TransactionPage
 from src.app.service.transaction import TransactionService
-from src.web.dependency.service import get_transaction_service
+from src.web.dependency.service import get_transaction_service, open_transaction_service
 from src.web.dependency.auth import get_current_user
 from src.app.model.user import User
 
@@ -19,6 +23,44 @@ async def add_transaction(
 ) -> None:
     await transaction_service.add_transaction(transaction, current_user.user_id)
     
+@router.post("/import_transactions")
+async def import_transactions(
+    file: UploadFile,
+    fmt: ImportFormat = ImportFormat.CSV,
+    transaction_service: TransactionService = Depends(get_transaction_service),
+    current_user: User = Depends(get_current_user)
+) -> ImportResult:
+    """Bulk import broker statement from CSV (with header) or NDJSON, one row per leg."""
+    return await transaction_service.import_transactions(
+        file.file,
+        fmt,
+        user_id=current_user.user_id
+    )
+    
+@router.get("/export")
+async def export_transactions(
+    fmt: ImportFormat = ImportFormat.CSV,
+    start_dt: date | None = None,
+    end_dt: date | None = None,
+    current_user: User = Depends(get_current_user)
+) -> StreamingResponse:
+    """Stream the ledger as CSV (with header) or NDJSON, one row per leg in the import columns."""
+    async def _chunks():
+        async with open_transaction_service() as transaction_service:
+            async for chunk in transaction_service.export_transactions(
+                current_user.user_id,
+                fmt,
+                start_dt=start_dt,
+                end_dt=end_dt
+            ):
+                yield chunk
+                
+    return StreamingResponse(
+        _chunks(),
+        media_type='text/csv' if fmt == ImportFormat.CSV else 'application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename="transactions.{fmt.value}"'}
+    )
+    
 @router.get("/get_transaction")
 async def get_transaction(
     trans_id: str,
@@ -27,6 +69,38 @@ async def get_transaction(
 ) -> Transaction:
     return await transaction_service.get_transaction(trans_id, current_user.user_id)
     
+@router.get("/get_transactions")
+async def get_transactions(
+    trans_ids: list[str] = Query(),
+    transaction_service: TransactionService = Depends(get_transaction_service),
+    current_user: User = Depends(get_current_user)
+) -> list[Transaction]:
+    return await transaction_service.get_transactions(trans_ids, current_user.user_id)
+    
+@router.get("/list_transactions")
+async def list_transactions(
+    start_dt: date | None = None,
+    end_dt: date | None = None,
+    acct_id: str | None = None,
+    prop_id: str | None = None,
+    leg_type: LegType | None = None,
+    after: str | None = None,
+    limit: int = Query(default=100, ge=1, le=500),
+    transaction_service: TransactionService = Depends(get_transaction_service),
+    current_user: User = Depends(get_current_user)
+) -> TransactionPage:
+    """List transactions with legs, latest first, filtered by date range and any leg matching account/property/leg type."""
+    return await transaction_service.list_transactions(
+        current_user.user_id,
+        start_dt=start_dt,
+        end_dt=end_dt,
+        acct_id=acct_id,
+        prop_id=prop_id,
+        leg_type=leg_type,
+        after=after,
+        limit=limit
+    )
+    
 @router.delete("/remove_transaction")
 async def remove_transaction(
     trans_id: str,
@@ -9,6 +9,9 @@ from src.app.repository.market import FxRepository
 from src.app.repository.registry import PropertyRepository, PrivatePropOwnershipRepository, \
     AccountRepository
 from src.app.repository.transaction import TransactionBodyRepository, LegRepository
+from src.app.repository.uow import UnitOfWork
+from src.app.repository.portfolio import PortfolioRepository, PositionSnapshotRepository
+from src.app.repository.ledger import LedgerChangeRepository
 
 # Global state for caching engine and sessionmaker
 _async_engine: AsyncEngine | None = None
@@ -57,14 +60,14 @@ def get_sync_engine(db: str = 'primary') -> Engine:
     return sync_engine
 
 
-async def get_async_session() -> AsyncSession:
+async def get_async_session_maker() -> sessionmaker[AsyncSession]:
     """
-    Get an async session.
+    Get the async sessionmaker (cached globally).
     
-    Creates sessionmaker once and reuses it for all requests.
+    Useful to open sessions outside of a request, e.g., at app startup.
 
     Returns:
-        AsyncSession: The async session.
+        sessionmaker[AsyncSession]: The async sessionmaker.
     """
     global _async_session_maker
     
@@ -73,8 +76,21 @@ async def get_async_session() -> AsyncSession:
         _async_session_maker = sessionmaker(
             bind=async_engine, class_=AsyncSession, expire_on_commit=False
         )
+    return _async_session_maker
+
+
+async def get_async_session() -> AsyncSession:
+    """
+    Get an async session.
     
-    async with _async_session_maker() as session:
+    Creates sessionmaker once and reuses it for all requests.
+
+    Returns:
+        AsyncSession: The async session.
+    """
+    async_session_maker = await get_async_session_maker()
+    
+    async with async_session_maker() as session:
         yield session
         
         
@@ -113,6 +129,26 @@ async def get_leg_repository(
 ) -> LegRepository:
     return LegRepository(db_session=async_session)
 
+async def get_portfolio_repository(
+    async_session: AsyncSession = Depends(get_async_session)
+) -> PortfolioRepository:
+    return PortfolioRepository(db_session=async_session)
+
+async def get_position_snapshot_repository(
+    async_session: AsyncSession = Depends(get_async_session)
+) -> PositionSnapshotRepository:
+    return PositionSnapshotRepository(db_session=async_session)
+
+async def get_ledger_change_repository(
+    async_session: AsyncSession = Depends(get_async_session)
+) -> LedgerChangeRepository:
+    return LedgerChangeRepository(db_session=async_session)
+
+async def get_unit_of_work(
+    async_session: AsyncSession = Depends(get_async_session)
+) -> UnitOfWork:
+    return UnitOfWork(db_session=async_session)
+
 
 if __name__ == "__main__":
     from sqlalchemy_utils import database_exists, create_database, drop_database
@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 from fastapi import Depends
 from src.app.repository.user import UserRepository
 from src.app.service.user import UserService
@@ -12,9 +14,15 @@ from src.app.service.registry import RegistryService, AccountService
 from src.app.service.email import EmailService
 from src.web.dependency.repository import get_property_repository, \
     get_private_prop_ownership_repository, get_account_repository, \
-    get_transaction_body_repository, get_leg_repository
+    get_transaction_body_repository, get_leg_repository, get_unit_of_work, \
+    get_portfolio_repository, get_position_snapshot_repository, get_ledger_change_repository, \
+    get_async_session_maker
 from src.app.service.transaction import TransactionService
 from src.app.repository.transaction import TransactionBodyRepository, LegRepository
+from src.app.repository.uow import UnitOfWork
+from src.app.repository.portfolio import PortfolioRepository, PositionSnapshotRepository
+from src.app.repository.ledger import LedgerChangeRepository
+from src.app.service.portfolio import PortfolioService
 
 async def get_user_service(
     user_repository: UserRepository = Depends(get_user_repository)
@@ -50,9 +58,55 @@ async def get_account_service(
 
 async def get_transaction_service(
     transaction_body_repository: TransactionBodyRepository = Depends(get_transaction_body_repository),
-    leg_repository: LegRepository = Depends(get_leg_repository)
+    leg_repository: LegRepository = Depends(get_leg_repository),
+    account_repository: AccountRepository = Depends(get_account_repository),
+    property_repository: PropertyRepository = Depends(get_property_repository),
+    position_snapshot_repository: PositionSnapshotRepository = Depends(get_position_snapshot_repository),
+    ledger_change_repository: LedgerChangeRepository = Depends(get_ledger_change_repository),
+    unit_of_work: UnitOfWork = Depends(get_unit_of_work)
 ) -> TransactionService:
     return TransactionService(
         transaction_body_repository=transaction_body_repository,
-        leg_repository=leg_repository
-    )
\ No newline at end of file
+        leg_repository=leg_repository,
+        account_repository=account_repository,
+        property_repository=property_repository,
+        position_snapshot_repository=position_snapshot_repository,
+        ledger_change_repository=ledger_change_repository,
+        unit_of_work=unit_of_work
+    )
+    
+@asynccontextmanager
+async def open_transaction_service() -> AsyncIterator[TransactionService]:
+    """Transaction service on its own session, for streaming responses.
+    
+    Request dependencies (and their session) are closed before a streaming body is sent,
+    so the stream has to own its session.
+    """
+    async_session_maker = await get_async_session_maker()
+    async with async_session_maker() as session:
+        yield await get_transaction_service(
+            transaction_body_repository=TransactionBodyRepository(db_session=session),
+            leg_repository=LegRepository(db_session=session),
+            account_repository=AccountRepository(db_session=session),
+            property_repository=PropertyRepository(db_session=session),
+            position_snapshot_repository=PositionSnapshotRepository(db_session=session),
+            ledger_change_repository=LedgerChangeRepository(db_session=session),
+            unit_of_work=UnitOfWork(db_session=session)
+        )
+    
+async def get_portfolio_service(
+    portfolio_repository: PortfolioRepository = Depends(get_portfolio_repository),
+    position_snapshot_repository: PositionSnapshotRepository = Depends(get_position_snapshot_repository),
+    property_repository: PropertyRepository = Depends(get_property_repository),
+    account_repository: AccountRepository = Depends(get_account_repository),
+    fx_repository: FxRepository = Depends(get_fx_repository),
+    yfinance_service: YFinanceService = Depends(get_yfinance_service)
+) -> PortfolioService:
+    return PortfolioService(
+        portfolio_repository=portfolio_repository,
+        position_snapshot_repository=position_snapshot_repository,
+        property_repository=property_repository,
+        account_repository=account_repository,
+        fx_repository=fx_repository,
+        yfinance_service=yfinance_service
+    )
@@ -1,3 +1,5 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import Depends, FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -6,10 +8,47 @@ from src.web.api.v1.api import api_router
 from src.app.model.exceptions import AlreadyExistError, NotExistError, FKNotExistError, \
     FKNoDeleteUpdateError, OpNotPermittedError, NotMatchWithSystemError, PermissionDeniedError, \
     StrongPermissionDeniedError, UnexpectedError
+from src.app.repository.registry import PropertyRepository, PrivatePropOwnershipRepository
+from src.app.service.ledger import ledger_feed_worker
+from src.app.service.market import YFinanceService
+from src.app.service.password import password_hasher
+from src.app.service.registry import RegistryService
+from src.app.utils.secrets import secrets_provider
+from src.web.dependency.repository import get_async_session_maker
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # secrets are loaded once and refreshed in the background, requests read them from memory
+    await secrets_provider.start()
+    # bootstrap reference data once per worker, so requests never hit a missing cash property
+    try:
+        async_session_maker = await get_async_session_maker()
+        async with async_session_maker() as session:
+            registry_service = RegistryService(
+                property_repository=PropertyRepository(db_session=session),
+                private_prop_ownership_repository=PrivatePropOwnershipRepository(db_session=session),
+                yfinance_service=YFinanceService()
+            )
+            await registry_service.register_cash_properties()
+    except Exception as e:
+        # do not block the worker from starting, cash properties can be registered via API later
+        logging.exception(f"Failed to bootstrap cash properties: {e}")
+    # ledger feed consumers (net worth cache invalidation) run in the background, not in the writes
+    try:
+        await ledger_feed_worker.start(await get_async_session_maker())
+    except Exception as e:
+        logging.exception(f"Failed to start the ledger feed worker: {e}")
+    yield
+    await ledger_feed_worker.stop()
+    await secrets_provider.stop()
+    password_hasher.shutdown()
+
 
 app = FastAPI(
     title="FastAPI", 
     version="0.1.0",
+    lifespan=lifespan,
 )
 app.add_middleware(
     CORSMiddleware,
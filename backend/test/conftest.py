@@ -1,2 +1,74 @@
+from datetime import date
+from typing import AsyncIterator
+import pytest
+import pytest_asyncio
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from src.app.model.enums import LegType
+from src.app.repository.cache import redis_url
+from src.app.model.transaction import Leg, TransactionWOLegs
+from src.app.repository.orm import LegORM, TransactionORM, PositionSnapshotORM
+from src.app.repository.transaction import LegRepository, TransactionBodyRepository
 
+# one transaction per leg of user-1 in acct-1, on consecutive days from 2024-01-01
+LEGS = [
+    # leg_type, prop_id, quantity, price
+    (LegType.BUY, 'prop-a', 10, 5),
+    (LegType.SELL, 'prop-a', 4, 6),
+    (LegType.FEE, 'prop-a', 1, 2),
+    (LegType.DIVIDEND, 'prop-a', 1, 3),
+    (LegType.BUY, 'prop-b', 2, 1),
+    (LegType.SELL, 'prop-b', 2, 1.5),
+]
 
+
+@pytest_asyncio.fixture
+async def sqlite_engine(tmp_path) -> AsyncIterator[AsyncEngine]:
+    """Engine on a sqlite file, tables are created by the test (MySQL only DDL cannot be)."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    try:
+        yield engine
+    finally:
+        # the aiosqlite thread keeps the process alive unless disposed
+        await engine.dispose()
+        
+async def create_tables(engine: AsyncEngine, *orms):
+    async with engine.begin() as conn:
+        for orm in orms:
+            await conn.run_sync(orm.__table__.create)
+            
+@pytest_asyncio.fixture
+async def session_with_legs(sqlite_engine: AsyncEngine) -> AsyncIterator[AsyncSession]:
+    """Session on the transaction, leg and position snapshot tables, holding `LEGS`."""
+    await create_tables(sqlite_engine, TransactionORM, LegORM, PositionSnapshotORM)
+    async with AsyncSession(sqlite_engine) as session:
+        await TransactionBodyRepository(session).adds([
+            TransactionWOLegs(
+                trans_id=f'trans-{i}', user_id='user-1', trans_dt=date(2024, 1, i + 1), description='test'
+            ) for i in range(len(LEGS))
+        ])
+        await LegRepository(session).adds([
+            Leg(
+                trans_id=f'trans-{i}', user_id='user-1', leg_type=leg_type, acct_id='acct-1',
+                prop_id=prop_id, quantity=quantity, price=price
+            ) for i, (leg_type, prop_id, quantity, price) in enumerate(LEGS)
+        ])
+        yield session
+        
+@pytest_asyncio.fixture
+async def redis() -> AsyncIterator[Redis]:
+    """Client of the redis at REDIS_HOST on the test's event loop, the test is skipped without one.
+    
+    Tests patch it in as the `redis_client` of the module under test, and clean up their own keys.
+    """
+    client = Redis.from_url(redis_url, decode_responses=True)
+    try:
+        await client.ping()
+    except RedisError:
+        await client.aclose()
+        pytest.skip("Redis not available")
+    try:
+        yield client
+    finally:
+        await client.aclose()
@@ -0,0 +1,34 @@
+import pytest
+from src.app.model.exceptions import PermissionDeniedError
+from src.app.model.user import User
+from src.app.service import auth
+from src.app.service.auth import AuthService, VerifiedTokenCache, create_access_token
+from src.app.utils.secrets import SecretsProvider
+
+USER = User(user_id='user-1', username='alice', is_admin=False, email='alice@example.com')
+
+@pytest.mark.asyncio
+async def test_verify_token_cached_and_rotated(monkeypatch):
+    versions = [{'auth': {'secret_key': 'k1', 'algorithm': 'HS256'}}]
+    provider = SecretsProvider(loader=lambda: versions[-1])
+    monkeypatch.setattr(auth, 'secrets_provider', provider)
+    monkeypatch.setattr(auth, 'verified_token_cache', VerifiedTokenCache(maxsize=2))
+    service = AuthService(user_repository=None, email_service=None) # type: ignore
+    
+    token = create_access_token(USER, secret_key='k1')
+    user = await service.verify_token(token)
+    assert user == USER
+    assert await service.verify_token(token) is user # served from cache
+    
+    # still accepted right after a rotation, rejected after the next one
+    versions.append({'auth': {'secret_key': 'k2', 'algorithm': 'HS256'}})
+    await provider.refresh()
+    assert await service.verify_token(token) is user
+    versions.append({'auth': {'secret_key': 'k3', 'algorithm': 'HS256'}})
+    await provider.refresh()
+    with pytest.raises(PermissionDeniedError):
+        await service.verify_token(token)
+        
+    expired = create_access_token(USER, secret_key='k3', expires_minutes=-1)
+    with pytest.raises(PermissionDeniedError, match='expired'):
+        await service.verify_token(expired)
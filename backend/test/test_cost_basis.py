@@ -0,0 +1,40 @@
+from datetime import date
+import numpy as np
+from src.app.utils.cost_basis import compute_cost_basis
+from src.app.service.portfolio import cost_basis_from_trades
+
+def test_compute_cost_basis():
+    # buy 10 for 100, buy 10 for 200, sell 5 for 100, sell 10 for 300, buy 5 for 150
+    is_buy = np.array([True, True, False, False, True])
+    qty = np.array([10, 10, 5, 10, 5], dtype=float)
+    amount = np.array([100, 200, 100, 300, 150], dtype=float)
+    result = compute_cost_basis(is_buy, qty, amount)
+    assert result.quantity == 10
+    # average cost 15: realized (100 - 75) + (300 - 150), acb 5 * 15 + 150
+    assert np.isclose(result.realized_avg, 175) and np.isclose(result.acb, 225)
+    # FIFO: sells cost 5 * 10 and 5 * 10 + 5 * 20, remaining 5 * 20 + 5 * 30
+    assert np.isclose(result.realized_fifo, 200) and np.isclose(result.fifo_cost, 250)
+    assert result.remaining.tolist() == [0, 5, 0, 0, 5]
+    
+def test_compute_cost_basis_oversold():
+    # selling 8 of 5 held only sells 5, position reopens afterwards
+    is_buy = np.array([True, False, True, False])
+    qty = np.array([5, 8, 2, 1], dtype=float)
+    amount = np.array([50, 80, 40, 30], dtype=float)
+    result = compute_cost_basis(is_buy, qty, amount)
+    assert result.quantity == 1
+    assert np.isclose(result.realized_avg, 10) and np.isclose(result.realized_fifo, 10)
+    assert np.isclose(result.acb, 20) and np.isclose(result.fifo_cost, 20)
+    
+def test_cost_basis_from_trades():
+    trades = [
+        # acct_id, prop_id, trans_dt, buy_qty, buy_amount, sell_qty, sell_amount, fee_amount
+        ('acct-1', 'prop-a', date(2024, 1, 1), 10, 100, 0, 0, 10),
+        ('acct-1', 'prop-a', date(2024, 2, 1), 0, 0, 5, 80, 5),
+        ('acct-1', 'prop-b', date(2024, 1, 1), 1, 50, 0, 0, 0),
+    ]
+    a, b = cost_basis_from_trades(trades)
+    # buy fee into cost (11 per unit), sell fee out of proceeds
+    assert (a.acct_id, a.prop_id, a.quantity, a.acb, a.realized_gain_avg) == ('acct-1', 'prop-a', 5, 55, 20)
+    assert [(lot.trans_dt, lot.quantity, lot.unit_cost) for lot in a.lots] == [(date(2024, 1, 1), 5, 11)]
+    assert (b.prop_id, b.quantity, b.fifo_cost, b.avg_cost) == ('prop-b', 1, 50, 50)
@@ -0,0 +1,129 @@
+import asyncio
+import pytest
+from datetime import date
+from redis.exceptions import ConnectionError
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.app.repository.orm import LedgerChangeORM, LedgerConsumerORM
+from src.app.repository.ledger import LedgerChangeRepository
+from src.app.repository.uow import UnitOfWork
+from src.app.service.ledger import NET_WORTH_CACHE_CONSUMER, LedgerFeedService, LedgerFeedWorker
+from src.app.service.portfolio import net_worth_cache
+from test.conftest import create_tables
+
+@pytest.mark.asyncio
+async def test_ledger_feed_poll_and_ack(sqlite_engine):
+    await create_tables(sqlite_engine, LedgerChangeORM, LedgerConsumerORM)
+    async with AsyncSession(sqlite_engine) as session:
+        repository = LedgerChangeRepository(session)
+        service = LedgerFeedService(repository)
+        assert await service.poll('snapshot') is None
+        
+        async with UnitOfWork(session).begin():
+            await repository.record('user-1', {('acct-1', 'prop-a'): date(2024, 1, 5), ('acct-1', 'prop-b'): date(2024, 1, 3)})
+        await repository.record('user-1', {('acct-1', 'prop-a'): date(2024, 1, 2)})
+        await repository.record('user-2', {('acct-2', 'prop-a'): date(2024, 2, 1)})
+        
+        # changes to the same position are coalesced to the earliest date
+        batch = await service.poll('snapshot')
+        assert batch is not None and batch.last_change_id == 4
+        assert sorted((c.user_id, c.acct_id, c.prop_id, c.from_dt) for c in batch.changes) == [
+            ('user-1', 'acct-1', 'prop-a', date(2024, 1, 2)),
+            ('user-1', 'acct-1', 'prop-b', date(2024, 1, 3)),
+            ('user-2', 'acct-2', 'prop-a', date(2024, 2, 1)),
+        ]
+        assert batch.from_dts() == {'user-1': date(2024, 1, 2), 'user-2': date(2024, 2, 1)}
+        
+        # consumers keep their own offset, and only move forward
+        assert len((await service.poll('report', limit=2)).changes) == 2 # type: ignore
+        await service.ack(batch)
+        assert await service.poll('snapshot') is None
+        await repository.set_offset('snapshot', 1)
+        assert await repository.get_offset('snapshot') == 4
+        
+        await repository.record('user-1', {('acct-1', 'prop-b'): date(2024, 3, 1)})
+        batch = await service.poll('snapshot')
+        assert batch is not None and [c.change_id for c in batch.changes] == [5]
+        
+        
+@pytest.mark.asyncio
+async def test_ledger_feed_prune(sqlite_engine):
+    await create_tables(sqlite_engine, LedgerChangeORM, LedgerConsumerORM)
+    async with AsyncSession(sqlite_engine) as session:
+        repository = LedgerChangeRepository(session)
+        service = LedgerFeedService(repository)
+        for day in (1, 2, 3):
+            await repository.record('user-1', {('acct-1', 'prop-a'): date(2024, 1, day)})
+        
+        async def kept() -> list[int]:
+            return [change.change_id for change in await repository.list_after(0)] # type: ignore
+        
+        # changes are pruned once every consumer has read them
+        await repository.set_offset('report', 0)
+        await service.ack((await service.poll('snapshot', limit=2))) # type: ignore
+        assert await kept() == [1, 2, 3]
+        await service.ack((await service.poll('report', limit=1))) # type: ignore
+        assert await kept() == [2, 3]
+        # the newest change is kept, so its id is not reused
+        await service.ack((await service.poll('report'))) # type: ignore
+        await service.ack((await service.poll('snapshot'))) # type: ignore
+        assert await kept() == [3]
+        await repository.record('user-1', {('acct-1', 'prop-a'): date(2024, 1, 4)})
+        assert await kept() == [3, 4]
+        
+        
+@pytest.mark.asyncio
+async def test_invalidate_net_worth(sqlite_engine, monkeypatch):
+    await create_tables(sqlite_engine, LedgerChangeORM, LedgerConsumerORM)
+    invalidated = []
+    async def _invalidate(user_id: str, from_dt: date):
+        invalidated.append((user_id, from_dt))
+    async def _redis_down(user_id: str, from_dt: date):
+        raise ConnectionError("redis is down")
+        
+    async with AsyncSession(sqlite_engine) as session:
+        repository = LedgerChangeRepository(session)
+        service = LedgerFeedService(repository)
+        await repository.record('user-1', {('acct-1', 'prop-a'): date(2024, 1, 5), ('acct-1', 'prop-b'): date(2024, 1, 3)})
+        await repository.record('user-2', {('acct-2', 'prop-a'): date(2024, 2, 1)})
+        
+        # the batch stays unacknowledged while redis is down
+        monkeypatch.setattr(net_worth_cache, 'invalidate', _redis_down)
+        await service.invalidate_net_worth()
+        assert await repository.get_offset(NET_WORTH_CACHE_CONSUMER) == 0
+        
+        # each user from the earliest day changed, in batches until the feed is consumed
+        monkeypatch.setattr(net_worth_cache, 'invalidate', _invalidate)
+        await service.invalidate_net_worth(limit=2)
+        assert invalidated == [('user-1', date(2024, 1, 3)), ('user-2', date(2024, 2, 1))]
+        assert await repository.get_offset(NET_WORTH_CACHE_CONSUMER) == 3
+        # the only consumer read everything, but the newest change
+        assert [change.change_id for change in await repository.list_after(0)] == [3]
+        
+        
+@pytest.mark.asyncio
+async def test_ledger_feed_worker(sqlite_engine, monkeypatch):
+    await create_tables(sqlite_engine, LedgerChangeORM, LedgerConsumerORM)
+    invalidated = []
+    async def _invalidate(user_id: str, from_dt: date):
+        invalidated.append((user_id, from_dt))
+    monkeypatch.setattr(net_worth_cache, 'invalidate', _invalidate)
+    
+    async def offset() -> int:
+        async with AsyncSession(sqlite_engine) as session:
+            return await LedgerChangeRepository(session).get_offset(NET_WORTH_CACHE_CONSUMER)
+    
+    # the writer only appends and notifies, the worker drains on its own session
+    worker = LedgerFeedWorker(interval=60)
+    await worker.start(lambda: AsyncSession(sqlite_engine))
+    try:
+        async with AsyncSession(sqlite_engine) as session:
+            await LedgerChangeRepository(session).record('user-1', {('acct-1', 'prop-a'): date(2024, 1, 5)})
+        worker.notify()
+        for _ in range(100):
+            if await offset() == 1:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await worker.stop()
+    assert invalidated == [('user-1', date(2024, 1, 5))]
+    assert await offset() == 1
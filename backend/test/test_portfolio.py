@@ -0,0 +1,175 @@
+import uuid
+import pytest
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from sqlalchemy import insert
+from src.app.model.enums import CurType, LegType, PropertyType
+from src.app.model.portfolio import Holding, NetWorthPoint, Performance
+from src.app.model.transaction import Leg
+from src.app.repository.orm import TransactionORM
+from src.app.repository.portfolio import PortfolioRepository, PositionSnapshotRepository
+from src.app.repository.transaction import LegRepository
+from src.app.service import portfolio
+from src.app.service.portfolio import PerformanceCache, PortfolioService, net_worth_cache
+
+@pytest.mark.asyncio
+async def test_get_holdings(session_with_legs):
+    session = session_with_legs
+    repository = PortfolioRepository(session)
+    
+    holdings = await repository.get_holdings('user-1')
+    assert [(h.prop_id, h.quantity, h.invested, h.cash_balance) for h in holdings] == [
+        ('prop-a', 6, 26, -25) # -50 + 24 - 2 + 3
+    ]
+    holdings = await repository.get_holdings('user-1', include_closed=True)
+    assert [(h.prop_id, h.quantity) for h in holdings] == [('prop-a', 6), ('prop-b', 0)]
+    assert await repository.get_holdings('user-2') == []
+    
+@pytest.mark.asyncio
+async def test_position_snapshot_refresh(session_with_legs):
+    session = session_with_legs
+    repository = PositionSnapshotRepository(session)
+    positions = {('acct-1', 'prop-a'), ('acct-1', 'prop-b')}
+    await repository.refresh('user-1', positions, from_dt=date(2024, 1, 1))
+    
+    holdings = await repository.get_holdings_as_of('user-1', date(2024, 1, 2))
+    assert [(h.prop_id, h.quantity, h.invested) for h in holdings] == [('prop-a', 6, 26)]
+    holdings = await repository.get_holdings_as_of('user-1', date(2024, 12, 31), include_closed=True)
+    assert [(h.prop_id, h.quantity, h.cash_balance) for h in holdings] == [('prop-a', 6, -25), ('prop-b', 0, 1)]
+    
+    # drop the sell of prop-a on day 2, only recompute from that day
+    await LegRepository(session).remove_by_trans_id('trans-1')
+    await repository.refresh('user-1', {('acct-1', 'prop-a')}, from_dt=date(2024, 1, 2))
+    holdings = await repository.get_holdings_as_of('user-1', date(2024, 12, 31))
+    assert [(h.prop_id, h.quantity, h.cash_balance) for h in holdings] == [('prop-a', 10, -49)]
+    
+@pytest.mark.asyncio
+async def test_get_last_prices(session_with_legs):
+    session = session_with_legs
+    repository = PortfolioRepository(session)
+    # last buy/sell on or before the date, fee/dividend legs are ignored
+    assert await repository.get_last_prices('user-1', ['prop-a', 'prop-b'], date(2024, 1, 4)) == {'prop-a': 6}
+    assert await repository.get_last_prices('user-1', ['prop-a', 'prop-b'], date(2024, 12, 31)) == {
+        'prop-a': 6, 'prop-b': 1.5
+    }
+    
+@pytest.mark.asyncio
+async def test_get_quantity_series(session_with_legs):
+    session = session_with_legs
+    repository = PositionSnapshotRepository(session)
+    await repository.refresh('user-1', {('acct-1', 'prop-a'), ('acct-1', 'prop-b')}, from_dt=date(2024, 1, 1))
+    
+    # position carried into the start date, then each change in the range
+    rows = await repository.get_quantity_series('user-1', date(2024, 1, 3), date(2024, 1, 5))
+    assert [(prop_id, snap_dt, quantity) for _, prop_id, snap_dt, quantity in rows] == [
+        ('prop-a', date(2024, 1, 3), 6),
+        ('prop-a', date(2024, 1, 4), 6),
+        ('prop-b', date(2024, 1, 5), 2),
+    ]
+    
+@pytest.mark.asyncio
+async def test_get_income_expenses(session_with_legs):
+    session = session_with_legs
+    async with session.bind.begin() as conn: # type: ignore
+        # PropertyORM has MySQL generated columns, only the joined columns are needed
+        await conn.exec_driver_sql("CREATE TABLE property (prop_id VARCHAR PRIMARY KEY, currency INTEGER)")
+        await conn.exec_driver_sql(f"INSERT INTO property VALUES ('prop-a', {CurType.USD.value}), ('prop-b', {CurType.USD.value})")
+    # a second fee of prop-a later on the day of the first one lands in the same daily bucket
+    await session.execute(insert(TransactionORM), [dict(
+        trans_id='trans-fee', user_id='user-1', trans_dt=datetime(2024, 1, 3, 15, 30), description='test'
+    )])
+    await LegRepository(session).adds([Leg(
+        trans_id='trans-fee', user_id='user-1', leg_type=LegType.FEE, acct_id='acct-1',
+        prop_id='prop-a', quantity=1, price=0.5
+    )])
+    
+    rows = await PortfolioRepository(session).get_income_expenses('user-1', date(2024, 1, 1), date(2024, 1, 31))
+    assert sorted((row.leg_type, row.trans_dt, row.amount) for row in rows) == [
+        (LegType.FEE, date(2024, 1, 3), 2.5),
+        (LegType.DIVIDEND, date(2024, 1, 4), 3),
+    ]
+    
+@pytest.mark.asyncio
+async def test_net_worth_cache(redis, monkeypatch):
+    monkeypatch.setattr(portfolio, 'redis_client', redis)
+    # unique user per run, so the test never touches real keys
+    user_id = f"test-{uuid.uuid4().hex}"
+    keys = [net_worth_cache._key(user_id, currency) for currency in CurType]
+    try:
+        # day 2 not priced, so not cached: a gap
+        await net_worth_cache.set_many(user_id, CurType.USD, [
+            NetWorthPoint(cur_dt=date(2024, 1, 1), net_worth=100), NetWorthPoint(cur_dt=date(2024, 1, 3), net_worth=300)
+        ])
+        await net_worth_cache.set_many(user_id, CurType.CAD, [NetWorthPoint(cur_dt=date(2024, 1, 1), net_worth=130)])
+        assert await net_worth_cache.get_range(user_id, CurType.USD, date(2024, 1, 1), date(2024, 1, 3)) == {
+            date(2024, 1, 1): 100, date(2024, 1, 3): 300
+        }
+        
+        # recomputed days replace the cached ones, each day keeps one value
+        await net_worth_cache.set_many(user_id, CurType.USD, [
+            NetWorthPoint(cur_dt=date(2024, 1, 2), net_worth=250), NetWorthPoint(cur_dt=date(2024, 1, 3), net_worth=350)
+        ])
+        assert await redis.zcard(net_worth_cache._key(user_id, CurType.USD)) == 3
+        assert await net_worth_cache.get_range(user_id, CurType.USD, date(2024, 1, 1), date(2024, 1, 3)) == {
+            date(2024, 1, 1): 100, date(2024, 1, 2): 250, date(2024, 1, 3): 350
+        }
+        assert await net_worth_cache.get_range(user_id, CurType.CAD, date(2024, 1, 1), date(2024, 1, 3)) == {
+            date(2024, 1, 1): 130
+        }
+        
+        # invalidation drops the days from the date on, in every currency
+        await net_worth_cache.invalidate(user_id, date(2024, 1, 1))
+        assert await net_worth_cache.get_range(user_id, CurType.CAD, date(2024, 1, 1), date(2024, 1, 3)) == {}
+        assert await net_worth_cache.get_range(user_id, CurType.USD, date(2024, 1, 1), date(2024, 1, 3)) == {}
+    finally:
+        await redis.delete(*keys)
+        
+        
+@pytest.mark.asyncio
+async def test_valuation_reports_missing_prices():
+    """Valuation from stub repositories: a private property never traded has no price at all."""
+    def _property(prop_id: str, symbol: str, is_public: bool) -> SimpleNamespace:
+        return SimpleNamespace(
+            prop_id=prop_id, symbol=symbol, is_public=is_public, is_cash_prop=False,
+            currency=CurType.USD, prop_type=PropertyType.STOCK
+        )
+    properties = [_property('prop-a', 'AAA', True), _property('prop-p', 'PRIV', False)]
+    
+    async def _holdings(user_id: str, as_of: date) -> list[Holding]:
+        return [
+            Holding(acct_id='acct-1', prop_id=prop_id, quantity=10, invested=0, cash_balance=0) 
+            for prop_id in ('prop-a', 'prop-p')
+        ]
+    async def _properties(prop_ids: list[str]) -> list[SimpleNamespace]:
+        return properties
+    async def _closes(symbols: list[str], as_of: date) -> dict[str, float]:
+        return {'AAA': 5.0}
+    async def _last_prices(user_id: str, prop_ids: list[str], as_of: date) -> dict[str, float]:
+        return {}
+    async def _fx(cur_dt: date) -> dict[CurType, float]:
+        return {CurType.USD: 110.0}
+    
+    service = PortfolioService(
+        portfolio_repository=SimpleNamespace(get_last_prices=_last_prices), # type: ignore
+        position_snapshot_repository=SimpleNamespace(get_holdings_as_of=_holdings), # type: ignore
+        property_repository=SimpleNamespace(gets=_properties), # type: ignore
+        account_repository=None, # type: ignore
+        fx_repository=SimpleNamespace(get_fx_as_of=_fx), # type: ignore
+        yfinance_service=SimpleNamespace(get_closes=_closes), # type: ignore
+    )
+    valuation = await service.get_valuation('user-1', date(2024, 1, 5), CurType.USD)
+    assert valuation.total == 50 and valuation.by_account == {'acct-1': 50}
+    assert [(p.symbol, p.price_source) for p in valuation.positions] == [('AAA', 'market'), ('PRIV', 'none')]
+    assert valuation.missing_prices == ['PRIV']
+    
+    
+def test_performance_cache_ttl():
+    cache = PerformanceCache(ttl=86400, open_ttl=900)
+    today = date.today()
+    def _performance(end_dt: date) -> Performance:
+        return Performance(start_dt=date(2024, 1, 1), end_dt=end_dt, report_currency=CurType.USD, returns=[])
+    
+    # prices of a range ending today or later still move, closed ranges are final
+    assert cache.ttl_of(_performance(today)) == 900
+    assert cache.ttl_of(_performance(today + timedelta(days=30))) == 900
+    assert cache.ttl_of(_performance(today - timedelta(days=1))) == 86400
@@ -0,0 +1,107 @@
+import uuid
+import pytest
+from redis.exceptions import ConnectionError
+from src.app.utils import rate_limiter
+from src.app.utils.rate_limiter import RateLimiter, RedisRateLimiter
+
+@pytest.mark.asyncio
+async def test_rate_limiter_lockout_and_expiry():
+    now = [0.0]
+    limiter = RateLimiter(max_attempts=3, lockout_duration_minutes=5, window_minutes=10, clock=lambda: now[0])
+    
+    for _ in range(3):
+        assert (await limiter.is_allowed('alice'))[0]
+        await limiter.record_failed_attempt('alice')
+    await limiter.record_failed_attempt('bob')
+    allowed, message = await limiter.is_allowed('alice')
+    assert not allowed and '5 minutes' in message # type: ignore
+    
+    now[0] = 200
+    allowed, message = await limiter.is_allowed('alice')
+    assert not allowed and '1m 40s' in message # type: ignore
+    assert (await limiter.is_allowed('bob'))[0]
+    
+    # lockout over, and bob's window ended: both entries swept by their expiry bucket
+    now[0] = 700
+    assert (await limiter.is_allowed('carol'))[0]
+    assert limiter._attempts == {}
+    assert (await limiter.is_allowed('alice'))[0]
+    
+    await limiter.record_failed_attempt('alice')
+    await limiter.reset_attempts('alice')
+    assert 'alice' not in limiter._attempts
+    
+    
+@pytest.mark.asyncio
+async def test_redis_rate_limiter_scripts(redis, monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'redis_client', redis)
+    # unique user per run, so the test never touches real keys
+    username = f"test-{uuid.uuid4().hex}"
+    attempts_key, lockout_key = RedisRateLimiter._keys(username)
+    limiter = RedisRateLimiter(max_attempts=3, lockout_duration_minutes=5, window_minutes=10)
+    try:
+        for _ in range(3):
+            assert (await limiter.is_allowed(username))[0]
+            await limiter.record_failed_attempt(username)
+        # counter expires at the end of the window
+        assert await redis.get(attempts_key) == '3'
+        assert 0 < await redis.pttl(attempts_key) <= 600_000
+        
+        # the check reaching max attempts locks, later checks report the remaining time
+        allowed, message = await limiter.is_allowed(username)
+        assert not allowed and '5 minutes' in message # type: ignore
+        assert await redis.exists(attempts_key) == 0
+        assert 0 < await redis.pttl(lockout_key) <= 300_000
+        allowed, message = await limiter.is_allowed(username)
+        assert not allowed and '4m 59s' in message # type: ignore
+        # in-process state is not used while redis is up
+        assert limiter._attempts == {}
+        
+        await limiter.reset_attempts(username)
+        assert await redis.exists(attempts_key, lockout_key) == 0
+        assert (await limiter.is_allowed(username))[0]
+    finally:
+        await redis.delete(attempts_key, lockout_key)
+        
+        
+class _RedisDown:
+    """Client whose every command fails, counting the calls."""
+    
+    def __init__(self):
+        self.calls = 0
+        
+    def register_script(self, script: str):
+        async def _run(keys: list, args: list):
+            self.calls += 1
+            raise ConnectionError("redis is down")
+        return _run
+    
+    async def delete(self, *keys: str):
+        self.calls += 1
+        raise ConnectionError("redis is down")
+
+@pytest.mark.asyncio
+async def test_redis_rate_limiter_fallback(monkeypatch):
+    client = _RedisDown()
+    monkeypatch.setattr(rate_limiter, 'redis_client', client)
+    now = [0.0]
+    limiter = RedisRateLimiter(
+        max_attempts=2, lockout_duration_minutes=5, window_minutes=10, retry_seconds=30, clock=lambda: now[0]
+    )
+    
+    # the first failure falls back to the in-process limiter, redis is left alone until retry_seconds
+    assert (await limiter.is_allowed('alice'))[0]
+    for _ in range(2):
+        await limiter.record_failed_attempt('alice')
+    allowed, message = await limiter.is_allowed('alice')
+    assert not allowed and '5 minutes' in message # type: ignore
+    assert client.calls == 1
+    
+    # retried after retry_seconds, still down: the in-process lockout holds
+    now[0] = 31
+    allowed, message = await limiter.is_allowed('alice')
+    assert not allowed and '4m 29s' in message # type: ignore
+    assert client.calls == 2
+    await limiter.reset_attempts('alice')
+    assert client.calls == 2
+    assert 'alice' not in limiter._attempts
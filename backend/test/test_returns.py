@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+from src.app.utils.returns import time_weighted_returns, xirr
+
+
+def test_time_weighted_returns():
+    # +10%, then 100 put in at the start of day 2, then +5%
+    values = np.array([[100.0], [110.0], [220.0], [231.0]])
+    cash_flows = np.array([[0.0], [0.0], [-100.0], [0.0]])
+    assert time_weighted_returns(values, cash_flows)[0] == pytest.approx(1.1 * 220 / 210 * 1.05 - 1)
+    # nothing invested returns 0
+    assert time_weighted_returns(np.zeros((3, 1)), np.zeros((3, 1)))[0] == 0
+    
+def test_xirr():
+    cash_flows = np.array([
+        [-100.0, -100.0, -100.0], 
+        [0.0, 0.0, 0.0], 
+        [110.0, 121.0, 0.0]
+    ])
+    irr = xirr(cash_flows, np.array([0.0, 0.5, 1.0]))
+    assert irr[:2] == pytest.approx([0.1, 0.21])
+    assert np.isnan(irr[2]) # money never comes back
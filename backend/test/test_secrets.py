@@ -0,0 +1,26 @@
+import asyncio
+import pytest
+from src.app.utils.secrets import SecretsProvider
+
+@pytest.mark.asyncio
+async def test_secrets_provider_refresh_and_rotation():
+    versions = [{'auth': {'secret_key': 'k1'}}, {'auth': {'secret_key': 'k2'}}]
+    calls = []
+    def _loader() -> dict:
+        calls.append(1)
+        return versions[min(len(calls), len(versions)) - 1]
+    
+    provider = SecretsProvider(loader=_loader, ttl=0.01)
+    # lazy load on first sync access, then served from memory
+    assert provider.get()['auth']['secret_key'] == 'k1'
+    assert provider.get() is provider.get()
+    assert len(calls) == 1 and provider.get_previous() is None
+    
+    await provider.start()
+    try:
+        await asyncio.sleep(0.05)
+    finally:
+        await provider.stop()
+    # rotated key, previous one kept for tokens signed before the rotation
+    assert provider.get()['auth']['secret_key'] == 'k2'
+    assert provider.get_previous() == versions[0]
@@ -0,0 +1,98 @@
+import io
+import tempfile
+import pytest
+from starlette.datastructures import UploadFile
+from src.app.model.enums import ImportFormat, PropertyType, CurType
+from src.app.utils.stream import format_records, iter_record_batches, iter_records
+from src.app.service.registry import property_from_record
+
+
+def test_csv_records():
+    fp = io.BytesIO(
+        b'\xef\xbb\xbfsymbol,name,prop_type,currency,custom_props\n'
+        b'AAPL,Apple,STOCK,USD,"{""sector"": ""Technology""}"\n'
+        b'XIU.TO,"iShares, S&P/TSX 60",ETF,CAD,\n'
+        b'BAD,too,many,values,here,extra\n'
+    )
+    records = list(iter_records(fp, ImportFormat.CSV))
+    assert [r.row for r in records] == [1, 2, 3]
+    assert records[0].data['custom_props'] == '{"sector": "Technology"}'
+    assert records[1].data['name'] == 'iShares, S&P/TSX 60'
+    assert records[1].data['custom_props'] is None
+    # header columns are still read, e.g. for the transaction reference of a failed row
+    assert records[2].error is not None and records[2].data['symbol'] == 'BAD' and None not in records[2].data # type: ignore
+    assert not fp.closed
+    
+    
+def test_ndjson_records():
+    fp = io.BytesIO(
+        b'{"symbol": "AAPL", "name": "Apple", "prop_type": 3, "currency": 1}\n'
+        b'\n'
+        b'not json\n'
+        b'[1, 2]\n'
+    )
+    records = list(iter_records(fp, ImportFormat.NDJSON))
+    assert [r.row for r in records] == [1, 2, 3]
+    assert records[0].data['symbol'] == 'AAPL'
+    assert records[1].error is not None
+    assert records[2].error is not None
+    
+
+@pytest.mark.asyncio
+async def test_record_batches():
+    fp = io.BytesIO(b''.join(b'{"row": %d}\n' % i for i in range(1, 8)))
+    batches = [batch async for batch in iter_record_batches(fp, ImportFormat.NDJSON, batch_size=3)]
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert batches[-1][0].data == {'row': 7}
+    
+    
+def test_property_from_record():
+    public = property_from_record(
+        {'symbol': 'AAPL', 'name': 'Apple', 'prop_type': 'stock', 'currency': 'USD',
+         'custom_props': '{"sector": "Technology"}', 'prop_id': 'ignored'},
+        is_public=True
+    )
+    assert public.prop_type == PropertyType.STOCK
+    assert public.currency == CurType.USD
+    assert public.custom_props == {'sector': 'Technology'}
+    assert public.prop_id != 'ignored'
+    
+    private = property_from_record(
+        {'name': 'Lake house', 'prop_type': '8', 'currency': 'CAD'},
+        is_public=False
+    )
+    assert not private.is_public
+    assert private.symbol.startswith('priv-')
+    
+    with pytest.raises(KeyError):
+        property_from_record({'symbol': 'X', 'name': 'X', 'prop_type': 'NOPE', 'currency': 'USD'}, is_public=True)
+    
+    
+@pytest.mark.parametrize('fmt', [ImportFormat.CSV, ImportFormat.NDJSON])
+def test_format_records_round_trip(fmt):
+    columns = ['trans_ref', 'description', 'quantity']
+    records = [
+        {'trans_ref': 't1', 'description': 'Buy, "AAPL"', 'quantity': 1.5},
+        {'trans_ref': 't1', 'description': 'Fee', 'quantity': 2},
+    ]
+    text = format_records([], fmt, columns, header=True) + format_records(records, fmt, columns)
+    parsed = list(iter_records(io.BytesIO(text.encode()), fmt))
+    assert [r.data['description'] for r in parsed] == ['Buy, "AAPL"', 'Fee']
+    assert float(parsed[0].data['quantity']) == 1.5
+    
+    
+@pytest.mark.parametrize('fmt, content', [
+    (ImportFormat.CSV, b'\xef\xbb\xbfsymbol,name\nAAPL,"Apple\nInc."\nXIU.TO,\xc3\xa9t\xc3\xa9\n'),
+    (ImportFormat.NDJSON, b'{"symbol": "AAPL", "name": "Apple\\nInc."}\n{"symbol": "XIU.TO", "name": "\xc3\xa9t\xc3\xa9"}\n'),
+])
+def test_records_from_upload_file(fmt, content):
+    # uploads are spooled temporary files, not BytesIO
+    upload = UploadFile(file=tempfile.SpooledTemporaryFile(), filename=f'upload.{fmt.value}')
+    upload.file.write(content)
+    upload.file.seek(0)
+    records = list(iter_records(upload.file, fmt))
+    assert [r.data for r in records] == [
+        {'symbol': 'AAPL', 'name': 'Apple\nInc.'},
+        {'symbol': 'XIU.TO', 'name': 'été'},
+    ]
+    assert not upload.file.closed
@@ -0,0 +1,21 @@
+import numpy as np
+from datetime import date
+from src.app.utils.timeseries import day_index, ffill, period_bounds, periods_between, scatter
+
+
+def test_scatter_ffill():
+    rows = day_index([date(2023, 12, 1), date(2024, 1, 1), date(2024, 1, 3), date(2024, 1, 3)], date(2024, 1, 1))
+    assert rows.tolist() == [0, 0, 2, 2]
+    
+    # the last value wins on the same cell, values before the start land on the first day
+    matrix = scatter(4, 2, rows, np.array([0, 0, 0, 1]), np.array([1.0, 2.0, 3.0, 4.0]))
+    filled = ffill(matrix)
+    assert filled[:, 0].tolist() == [2.0, 2.0, 3.0, 3.0]
+    assert np.isnan(filled[:2, 1]).all() and filled[2:, 1].tolist() == [4.0, 4.0]
+
+    
+def test_periods():
+    assert periods_between(date(2023, 11, 15), date(2024, 2, 1), 'month') == ['2023-11', '2023-12', '2024-01', '2024-02']
+    assert periods_between(date(2023, 11, 15), date(2024, 2, 1), 'year') == ['2023', '2024']
+    assert period_bounds('2024-02') == (date(2024, 2, 1), date(2024, 2, 29))
+    assert period_bounds('2023-12') == (date(2023, 12, 1), date(2023, 12, 31))
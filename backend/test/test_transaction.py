@@ -0,0 +1,206 @@
+import io
+import httpx
+import pytest
+from datetime import date
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from src.app.model.enums import ImportFormat, LegType, PlanType
+from src.app.model.exceptions import NotExistError, OpNotPermittedError
+from src.app.model.imports import ImportResult
+from src.app.model.transaction import Leg, LegCreate, TransactionCreate
+from src.app.model.user import User
+from src.app.repository.ledger import LedgerChangeRepository
+from src.app.repository.orm import AccountORM, LedgerChangeORM, LedgerConsumerORM, LegORM, \
+    PositionSnapshotORM, PrivatePropOwnershipORM, TransactionORM
+from src.app.repository.portfolio import PositionSnapshotRepository
+from src.app.repository.registry import AccountRepository, PropertyRepository
+from src.app.repository.transaction import LegRepository, TransactionBodyRepository
+from src.app.repository.uow import UnitOfWork
+from src.app.service.transaction import TransactionService, diff_legs, group_leg_records, parse_leg_records
+from src.app.utils.stream import RawRecord
+from src.web.dependency.auth import get_current_user
+from src.web.dependency.service import get_transaction_service
+from src.web.main import app
+from test.conftest import create_tables
+
+def _leg(leg_id: str, quantity: float, price: float = 10.0, leg_type: LegType = LegType.BUY) -> Leg:
+    return Leg(
+        leg_id=leg_id, trans_id='trans-1', user_id='user-1', leg_type=leg_type,
+        acct_id='acct-1', prop_id='prop-1', quantity=quantity, price=price
+    )
+    
+def _create(quantity: float, price: float = 10.0, leg_type: LegType = LegType.BUY) -> LegCreate:
+    return LegCreate(
+        leg_type=leg_type, acct_id='acct-1', prop_id='prop-1', quantity=quantity, price=price
+    )
+
+def test_diff_legs_unchanged():
+    old_legs = [_leg('leg-1', 1), _leg('leg-2', 2)]
+    new_legs, changed_legs, removed = diff_legs(
+        old_legs, [_create(2), _create(1)], trans_id='trans-1', user_id='user-1'
+    )
+    assert new_legs == [] and changed_legs == [] and removed == []
+    
+def test_diff_legs_changed():
+    old_legs = [_leg('leg-1', 1), _leg('leg-2', 2), _leg('leg-3', 3)]
+    # leg-1 kept, leg-2 changed in place, leg-3 removed
+    new_legs, changed_legs, removed = diff_legs(
+        old_legs, [_create(1), _create(5)], trans_id='trans-1', user_id='user-1'
+    )
+    assert new_legs == []
+    assert [(l.leg_id, l.quantity) for l in changed_legs] == [('leg-2', 5)]
+    assert removed == ['leg-3']
+    
+    # one more leg than stored
+    new_legs, changed_legs, removed = diff_legs(
+        old_legs[:1], [_create(1), _create(2, leg_type=LegType.FEE)], 
+        trans_id='trans-1', user_id='user-1'
+    )
+    assert changed_legs == [] and removed == []
+    assert len(new_legs) == 1 and new_legs[0].leg_type == LegType.FEE
+    assert new_legs[0].leg_id not in ('leg-1',)
+    
+def test_group_leg_records():
+    def _record(row: int, trans_ref: str | None, **kws) -> RawRecord:
+        data = dict(
+            trans_ref=trans_ref, trans_dt='2024-01-05', leg_type='buy', 
+            account='TFSA', symbol='AAPL', quantity='10', price='185.5'
+        )
+        data.update(kws)
+        return RawRecord(row, data, None)
+    
+    parsed = parse_leg_records([
+        _record(1, 'a'), 
+        _record(2, 'a', leg_type='FEE', quantity='1', price='4.95'),
+        _record(3, None),
+        _record(4, None, quantity='ten'),
+        _record(5, 'b'),
+    ])
+    assert parsed[0].leg.trans_dt == date(2024, 1, 5) and parsed[1].leg.leg_type == LegType.FEE # type: ignore
+    assert parsed[3].leg is None and parsed[3].error is not None
+    
+    groups = group_leg_records(parsed)
+    assert [[item.row for item in group] for group in groups] == [[1, 2], [3], [4], [5]]
+    # legs of the same transaction split across batches are grouped again with the carry
+    next_batch = parse_leg_records([_record(6, 'b'), _record(7, 'c')])
+    groups = group_leg_records(groups[-1] + next_batch)
+    assert [[item.row for item in group] for group in groups] == [[5, 6], [7]]
+    
+    # a malformed row stays in its transaction, unreadable rows keep the reference they have
+    parsed = parse_leg_records([
+        _record(1, 'd'), 
+        _record(2, 'd', quantity='ten'), 
+        RawRecord(3, {'trans_ref': 'd'}, "Row has more values than header columns"),
+        _record(4, 'd'),
+        _record(5, ' '),
+        _record(6, ' '),
+    ])
+    assert parsed[1].leg is None and parsed[1].trans_ref == 'd'
+    groups = group_leg_records(parsed)
+    assert [[item.row for item in group] for group in groups] == [[1, 2, 3, 4], [5], [6]]
+    
+    
+def _transaction_service(session: AsyncSession) -> TransactionService:
+    return TransactionService(
+        transaction_body_repository=TransactionBodyRepository(session),
+        leg_repository=LegRepository(session),
+        account_repository=AccountRepository(session),
+        property_repository=PropertyRepository(session),
+        position_snapshot_repository=PositionSnapshotRepository(session),
+        ledger_change_repository=LedgerChangeRepository(session),
+        unit_of_work=UnitOfWork(session)
+    )
+    
+async def _create_import_tables(engine: AsyncEngine):
+    """Tables of a transaction import, with account acct-1 (Brokerage) of user-1 and properties AAA, USD."""
+    await create_tables(
+        engine, TransactionORM, LegORM, PositionSnapshotORM, LedgerChangeORM, LedgerConsumerORM,
+        AccountORM, PrivatePropOwnershipORM
+    )
+    async with engine.begin() as conn:
+        # property table has MySQL generated columns, only the looked up columns are needed
+        await conn.exec_driver_sql("CREATE TABLE property (prop_id VARCHAR PRIMARY KEY, symbol VARCHAR, is_public BOOLEAN)")
+        await conn.exec_driver_sql("INSERT INTO property VALUES ('prop-a', 'AAA', 1), ('cash-usd', 'USD', 1)")
+        await conn.execute(insert(AccountORM), [dict(
+            acct_id='acct-1', user_id='user-1', acct_name='Brokerage', plan_type=PlanType.PERS, platform='test'
+        )])
+    
+@pytest.mark.asyncio
+async def test_import_transactions_endpoint_upload(sqlite_engine):
+    await _create_import_tables(sqlite_engine)
+        
+    async with AsyncSession(sqlite_engine, expire_on_commit=False) as session:
+        app.dependency_overrides[get_current_user] = lambda: User(
+            user_id='user-1', username='alice', email='alice@example.com'
+        )
+        app.dependency_overrides[get_transaction_service] = lambda: _transaction_service(session)
+        try:
+            # multipart upload, so the service reads a real (spooled) UploadFile
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+                response = await client.post(
+                    '/api/v1/transaction/import_transactions',
+                    params={'fmt': 'csv'},
+                    files={'file': ('statement.csv', (
+                        b'\xef\xbb\xbftrans_ref,trans_dt,description,leg_type,account,symbol,quantity,price\n'
+                        b'r1,2024-01-02,"Buy, AAA",BUY,Brokerage,AAA,10,5\n'
+                        b'r1,2024-01-02,"Buy, AAA",SELL,acct-1,USD,50,1\n'
+                        b'r2,2024-01-03,Bad,BUY,Brokerage,ZZZ,1,1\n'
+                    ), 'text/csv')}
+                )
+        finally:
+            app.dependency_overrides.clear()
+        assert response.status_code == 200, response.text
+        result = ImportResult.model_validate(response.json())
+        assert (result.total, result.inserted, result.failed) == (3, 2, 1)
+        transactions = await TransactionBodyRepository(session).list_by_user_id('user-1')
+        assert [transaction.description for transaction in transactions] == ['Buy, AAA']
+        legs = await LegRepository(session).get_by_trans_id(transactions[0].trans_id)
+        assert sorted(leg.prop_id for leg in legs) == ['cash-usd', 'prop-a']
+        
+        
+@pytest.mark.asyncio
+async def test_import_transactions_rejects_whole_transactions(sqlite_engine):
+    await _create_import_tables(sqlite_engine)
+    rows = [
+        # r1: one malformed leg rejects the transaction
+        ('r1', 'BUY', 'AAA', '10'), ('r1', 'SELL', 'USD', 'ten'), ('r1', 'SELL', 'USD', '50'),
+        # r2: more than max_legs, across batches
+        *[('r2', 'BUY', 'AAA', '1')] * 6,
+        ('r3', 'BUY', 'AAA', '1'), ('r3', 'SELL', 'USD', '1'),
+    ]
+    content = 'trans_ref,trans_dt,leg_type,account,symbol,quantity,price\n' + ''.join(
+        f"{trans_ref},2024-01-02,{leg_type},acct-1,{symbol},{quantity},1\n" for trans_ref, leg_type, symbol, quantity in rows
+    )
+    async with AsyncSession(sqlite_engine, expire_on_commit=False) as session:
+        result = await _transaction_service(session).import_transactions(
+            io.BytesIO(content.encode()), ImportFormat.CSV, 'user-1', batch_size=2, max_legs=3
+        )
+        assert (result.total, result.inserted, result.failed) == (11, 2, 9)
+        messages = {row_result.row: row_result.message for row_result in result.rows}
+        assert messages[1] == messages[3] == "Other legs of the transaction are invalid"
+        assert messages[2].startswith("Invalid leg") # type: ignore
+        assert all(messages[row] == "Transaction r2 has more than 3 legs" for row in range(4, 10))
+        transactions = await TransactionBodyRepository(session).list_by_user_id('user-1')
+        assert len(transactions) == 1
+        assert len(await LegRepository(session).get_by_trans_id(transactions[0].trans_id)) == 2
+        
+        
+@pytest.mark.asyncio
+async def test_update_transaction(session_with_legs, sqlite_engine):
+    session = session_with_legs
+    await create_tables(sqlite_engine, LedgerChangeORM, LedgerConsumerORM)
+    service = _transaction_service(session)
+    old_leg = (await LegRepository(session).get_by_trans_id('trans-0'))[0]
+    transaction = TransactionCreate(
+        trans_id='trans-0', user_id='user-1', trans_dt=date(2024, 1, 1), description='test',
+        legs=[LegCreate(leg_type=LegType.BUY, acct_id='acct-1', prop_id='prop-a', quantity=12, price=5)]
+    )
+    await service.update_transaction(transaction, user_id='user-1')
+    legs = await LegRepository(session).get_by_trans_id('trans-0')
+    # changed leg is updated in place
+    assert [(leg.leg_id, leg.quantity) for leg in legs] == [(old_leg.leg_id, 12)]
+    
+    with pytest.raises(NotExistError):
+        await service.update_transaction(transaction.model_copy(update={'trans_id': 'trans-x'}), user_id='user-1')
+    with pytest.raises(OpNotPermittedError):
+        await service.update_transaction(transaction.model_copy(update={'user_id': 'user-2'}), user_id='user-2')
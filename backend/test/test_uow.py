@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from src.app.repository.uow import UnitOfWork, commit_or_defer, in_unit_of_work
+
+metadata = MetaData()
+item = Table(
+    'item', metadata, 
+    Column('item_id', Integer, primary_key=True), 
+    Column('name', String(10))
+)
+
+async def _setup(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'uow.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+    return engine
+
+async def _count(engine) -> int:
+    async with AsyncSession(engine) as session:
+        return len((await session.execute(select(item))).all())
+
+@pytest.mark.asyncio
+async def test_unit_of_work_commits_once(tmp_path):
+    engine = await _setup(tmp_path)
+    async with AsyncSession(engine) as session:
+        uow = UnitOfWork(session)
+        async with uow.begin():
+            assert in_unit_of_work(session)
+            assert not await commit_or_defer(session, insert(item).values(item_id=1, name='a'))
+            async with uow.begin(): # nested block does not commit
+                assert not await commit_or_defer(session, insert(item).values(item_id=2, name='b'))
+            assert await _count(engine) == 0
+        assert not in_unit_of_work(session)
+    assert await _count(engine) == 2
+    
+@pytest.mark.asyncio
+async def test_unit_of_work_rollback(tmp_path):
+    engine = await _setup(tmp_path)
+    async with AsyncSession(engine) as session:
+        uow = UnitOfWork(session)
+        with pytest.raises(ValueError):
+            async with uow.begin():
+                await commit_or_defer(session, insert(item).values(item_id=1, name='a'))
+                raise ValueError("fail midway")
+        assert not in_unit_of_work(session)
+        # without unit of work, commit right away
+        assert await commit_or_defer(session, insert(item).values(item_id=3, name='c'))
+    assert await _count(engine) == 1
@@ -4,6 +4,8 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from src.app.utils.secrets import get_secret
 from src.app.service.email import EmailService
+from src.app.service.password import PasswordHasher
+from src.app.model.user import UserCreate, UserInternalRead
 
 @pytest.mark.asyncio
 @pytest.mark.skipif(os.getenv("ENV") == 'dev', reason="Skipping email service test")
@@ -24,3 +26,17 @@ async def test_email_service_send_email():
         subject="Reset Your Password",
         html_body=html
     )
+    
+    
+@pytest.mark.asyncio
+async def test_password_hasher():
+    hasher = PasswordHasher(max_workers=1)
+    user = UserCreate(username='alice', email='alice@example.com', password='password-1')
+    try:
+        hashed = await hasher.hashed(user)
+    finally:
+        hasher.shutdown()
+    assert user.hashed_password is None
+    assert UserInternalRead(**hashed.model_dump(), hashed_password=hashed.hashed_password).verify_password('password-1') # type: ignore
+    # the hash is carried, never dumped
+    assert 'hashed_password' not in hashed.model_dump()